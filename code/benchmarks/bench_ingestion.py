@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from run_pipeline import REPO_ROOT
+from bench_pipeline import BENCHMARKS_DIR, git_commit, run_measured
+
+MOCK_SERVER = os.path.join(REPO_ROOT, "code", "data", "mock_spotify_server.py")
+INGESTION = os.path.join(REPO_ROOT, "code", "data", "get_spotify_data.py")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(port, server_args, log_path, timeout=300):
+    """
+    Starts mock_spotify_server.py and waits until it answers.
+
+    Generating the catalogue takes a while for large track counts, so the
+    server is polled on /stats until it is up or `timeout` seconds passed.
+
+    Returns:
+    - process (Popen): The running server.
+
+    Raises:
+    - Exception: If the server exits or does not answer in time.
+    """
+
+    log = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, MOCK_SERVER, "--port", str(port), *server_args],
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    log.close()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"The mock server exited with {process.returncode}, see {log_path}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    process.kill()
+    raise Exception(f"The mock server did not start within {timeout} seconds")
+
+
+def ingestion_summary(metrics_path, server_stats, rows, seconds):
+    """
+    Condenses the ingestion's metrics and the server's counts into one record.
+    """
+
+    with open(metrics_path, encoding="utf-8") as file:
+        snapshot = json.load(file)
+
+    def total(name, **labels):
+        return sum(
+            counter["value"]
+            for counter in snapshot["counters"]
+            if counter["name"] == name
+            and all(str(counter["labels"].get(k)) == str(v) for k, v in labels.items())
+        )
+
+    latency = [h for h in snapshot["histograms"] if h["name"] == "http_request_duration_seconds"]
+    stages = {}
+    for record in snapshot["stages"]:
+        stages[record["stage"]] = stages.get(record["stage"], 0.0) + record["seconds"]
+    requests_sent = total("http_requests")
+    return {
+        "rows": rows,
+        "tracks_per_second": rows / seconds if seconds else None,
+        "requests": requests_sent,
+        "requests_per_second": requests_sent / seconds if seconds else None,
+        "rate_limited": total("http_rate_limited"),
+        "server_errors": sum(
+            counter["value"]
+            for counter in snapshot["counters"]
+            if counter["name"] == "http_requests" and str(counter["labels"]["status"]).startswith("5")
+        ),
+        "retries": total("http_retries"),
+        "rate_limit_wait_seconds": total("http_rate_limit_wait_seconds"),
+        "retry_sleep_seconds": total("http_retry_sleep_seconds"),
+        "mean_latency_seconds": (
+            sum(h["sum"] for h in latency) / max(1, sum(h["count"] for h in latency))
+        ),
+        "stages": stages,
+        "server": server_stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load-test get_spotify_data.py against the local Spotify API stand-in."
+    )
+    parser.add_argument("--tracks", type=int, default=100_000, help="Distinct tracks served.")
+    parser.add_argument("--playlists", type=int, default=50, help="Playlists served.")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean latency of the server.")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Standard deviation of the latency.")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Server requests per second before 429s.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 5xx answers.")
+    parser.add_argument("--client-rate", type=float, default=100.0, help="Requests per second of the client.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=3600, help="Seconds before the ingestion is stopped.")
+    parser.add_argument("--output", default=None, help="JSON file for the results.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ingestion_")
+    port = free_port()
+    server_args = [
+        "--tracks", str(args.tracks),
+        "--playlists", str(args.playlists),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--seed", str(args.seed),
+    ]
+    if args.rate_limit:
+        server_args += ["--rate-limit", str(args.rate_limit)]
+
+    server = start_mock_server(port, server_args, os.path.join(work_dir, "server.log"))
+    try:
+        env = dict(
+            os.environ,
+            SPOTIFY_AUTH_URL=f"http://127.0.0.1:{port}/api/token",
+            SPOTIFY_API_URL=f"http://127.0.0.1:{port}/v1",
+            SPOTIFY_CLIENT_ID="benchmark",
+            SPOTIFY_CLIENT_SECRET="benchmark",
+            SPOTIFY_METRICS_DIR=work_dir,
+        )
+        csv_path = os.path.join(work_dir, "spotify_data.csv")
+        measurement = run_measured(
+            [sys.executable, INGESTION, "--no-cache", "--output", csv_path, "--rate", str(args.client_rate)],
+            cwd=work_dir,
+            env=env,
+            log_path=os.path.join(work_dir, "ingestion.log"),
+            timeout=args.timeout,
+        )
+        server_stats = requests.get(f"http://127.0.0.1:{port}/stats", timeout=5).json()
+    finally:
+        server.terminate()
+        server.wait()
+
+    if measurement["status"] != "ok":
+        raise Exception(f"The ingestion {measurement['status']}, see {os.path.join(work_dir, 'ingestion.log')}")
+
+    with open(csv_path, encoding="utf-8") as file:
+        rows = sum(1 for _ in file) - 1
+    summary = ingestion_summary(
+        os.path.join(work_dir, "get_spotify_data.json"), server_stats, rows, measurement["seconds"]
+    )
+    shutil.rmtree(work_dir)
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": vars(args),
+        **measurement,
+        **summary,
+    }
+
+    print(
+        f"{rows:,} tracks in {measurement['seconds']:.1f} s ({summary['tracks_per_second']:.0f} tracks/s), "
+        f"{summary['requests']:,} requests, {summary['rate_limited']} rate-limited, "
+        f"{summary['server_errors']} server errors, {summary['retries']} retries"
+    )
+    output = args.output or os.path.join(BENCHMARKS_DIR, f"ingestion_{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+from run_pipeline import REPO_ROOT, STAGES
+from synthetic_data import fit_synthetic_model, write_synthetic_data
+
+BENCHMARKS_DIR = os.path.join(REPO_ROOT, "artifacts", "benchmarks")
+
+# Every stage but the Spotify download, in dependency order
+BENCHMARK_STAGES = [name for name in STAGES if name != "fetch"]
+
+
+def run_measured(command, cwd, env, log_path, timeout=None):
+    """
+    Runs a command and measures its wall time, CPU time and peak memory.
+
+    The CPU time and peak resident memory come from the rusage of the child,
+    which include the worker processes it waited for; the peak is that of the
+    largest single process.
+
+    Returns:
+    - measurement (dict): "status" ("ok", "failed" or "timeout"), "seconds",
+      "cpu_seconds" and "max_rss_mb".
+    """
+
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(
+            command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        timer = threading.Timer(timeout, kill) if timeout else None
+        if timer:
+            timer.start()
+        # Wait for the exit without reaping, so the pid cannot be reused while
+        # the timer may still signal it; reap only once the timer is stopped
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        seconds = time.perf_counter() - start
+        if timer:
+            timer.cancel()
+            timer.join()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    if timed_out.is_set():
+        outcome = "timeout"
+    else:
+        outcome = "ok" if process.returncode == 0 else "failed"
+    return {
+        "status": outcome,
+        "seconds": seconds,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "max_rss_mb": usage.ru_maxrss / 1024,  # kilobytes on Linux
+    }
+
+
+def benchmark_size(model, rows, stages, timeout=None, seed=0, keep=False):
+    """
+    Benchmarks the pipeline stages on a synthetic dataset of `rows` tracks.
+
+    The dataset is written to a scratch directory that the stage scripts
+    use as their artifacts/ (through SPOTIFY_ARTIFACTS_DIR) and their working
+    directory, so the repository's data, models and figures are untouched.
+    Stages run one at a time, in dependency order, from cold caches.
+
+    Returns:
+    - results (list): One dict per stage, plus one for the data generation,
+      with "rows", "stage" and the measurement of `run_measured`.
+    """
+
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{rows}_")
+    artifacts_dir = os.path.join(work_dir, "artifacts")
+    os.makedirs(artifacts_dir)
+    os.makedirs(os.path.join(work_dir, "images"))
+    env = dict(os.environ, SPOTIFY_ARTIFACTS_DIR=artifacts_dir, MPLBACKEND="Agg")
+
+    start = time.perf_counter()
+    write_synthetic_data(model, os.path.join(artifacts_dir, "spotify_data.csv"), rows, seed)
+    results = [
+        {"rows": rows, "stage": "generate", "status": "ok", "seconds": time.perf_counter() - start}
+    ]
+
+    failed = set()
+    for name in stages:
+        inputs = set(STAGES[name]["inputs"])
+        upstream = {other for other in failed if inputs & set(STAGES[other]["outputs"])}
+        if upstream:
+            results.append({"rows": rows, "stage": name, "status": "blocked"})
+            failed.add(name)
+            continue
+
+        measurement = run_measured(
+            [sys.executable, os.path.join(REPO_ROOT, STAGES[name]["script"])],
+            cwd=work_dir,
+            env=env,
+            log_path=os.path.join(work_dir, f"{name}.log"),
+            timeout=timeout,
+        )
+        results.append({"rows": rows, "stage": name, **measurement})
+        print(
+            f"{rows:>11,} {name:<14} {measurement['status']:<8}"
+            f" {measurement['seconds']:9.1f} s {measurement['max_rss_mb']:9.0f} MB",
+            flush=True,
+        )
+        if measurement["status"] != "ok":
+            failed.add(name)
+            print(f"  see {os.path.join(work_dir, name + '.log')}", flush=True)
+
+    if not keep and not failed:
+        shutil.rmtree(work_dir)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline):
+    """
+    Returns the time and memory of every (rows, stage) relative to a baseline run.
+    """
+
+    current = pd.DataFrame(results).set_index(["rows", "stage"])
+    previous = pd.DataFrame(baseline["results"]).set_index(["rows", "stage"])
+    shared = current.index.intersection(previous.index)
+    return pd.DataFrame(
+        {
+            "seconds": current.loc[shared, "seconds"],
+            "baseline_seconds": previous.loc[shared, "seconds"],
+            "time_ratio": current.loc[shared, "seconds"] / previous.loc[shared, "seconds"],
+            "memory_ratio": current.loc[shared, "max_rss_mb"] / previous.loc[shared, "max_rss_mb"],
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile every pipeline stage on synthetic data of several sizes."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+        help="Numbers of synthetic tracks.",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        default=BENCHMARK_STAGES,
+        choices=BENCHMARK_STAGES,
+        help="Stages to benchmark; their upstream stages are always run.",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=1800, help="Seconds before a stage is stopped."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--output", default=None, help="JSON file for the results.")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare with.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directories.")
+    args = parser.parse_args()
+
+    # The requested stages with the stages producing their inputs
+    selected, todo = set(), list(args.stages)
+    while todo:
+        name = todo.pop()
+        if name in selected:
+            continue
+        selected.add(name)
+        todo.extend(
+            other
+            for other in BENCHMARK_STAGES
+            if set(STAGES[name]["inputs"]) & set(STAGES[other]["outputs"])
+        )
+    stages = [name for name in BENCHMARK_STAGES if name in selected]
+
+    model = fit_synthetic_model(pd.read_csv(os.path.join(REPO_ROOT, "artifacts", "spotify_data.csv")))
+    results = []
+    for rows in args.sizes:
+        results.extend(benchmark_size(model, rows, stages, args.timeout, args.seed, args.keep))
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCHMARKS_DIR, f"pipeline_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print(compare(results, json.load(file)).round(3).to_string())
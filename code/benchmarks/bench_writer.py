@@ -0,0 +1,69 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+import artifact_store
+from artifact_store import load_artifact, write_artifact
+
+
+def write_with_dictwriter(df, path):
+    """
+    The previous cleaning output path: one Python dict per row fed to csv.DictWriter.
+    """
+
+    with open(path, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=df.columns)
+        writer.writeheader()
+        writer.writerows(df.to_dict(orient="records"))
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the cleaned_data writers on a scaled-up copy of the data."
+    )
+    parser.add_argument(
+        "--rows", type=int, default=1_000_000, help="Number of rows to write."
+    )
+    args = parser.parse_args()
+
+    # Repeat the cleaned data up to the requested size
+    df = load_artifact("cleaned_data")
+    df = pd.concat([df] * (args.rows // len(df) + 1), ignore_index=True).iloc[
+        : args.rows
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Write into a scratch directory instead of artifacts/
+        artifact_store.ARTIFACTS_DIR = tmp_dir
+
+        results = {
+            "DictWriter(to_dict)": time_call(
+                write_with_dictwriter, df, os.path.join(tmp_dir, "dictwriter.csv")
+            ),
+            "write_artifact csv": time_call(
+                write_artifact, df, "cleaned_data", ("csv",)
+            ),
+            "write_artifact parquet": time_call(
+                write_artifact, df, "cleaned_data", ("parquet",)
+            ),
+        }
+
+    baseline = results["DictWriter(to_dict)"]
+    print(f"Rows written: {len(df)}")
+    for writer_name, seconds in results.items():
+        print(
+            f"{writer_name:<24} {seconds:8.2f} s  {len(df) / seconds:12,.0f} rows/s"
+            f"  {baseline / seconds:5.1f}x"
+        )
@@ -0,0 +1,76 @@
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import load_artifact
+from feature_transform import INPUT_FEATURES
+
+
+def run_client(host, port, tracks, requests, latencies):
+    """
+    Sends `requests` single-track predictions over one keep-alive connection.
+    """
+
+    connection = http.client.HTTPConnection(host, port)
+    headers = {"Content-Type": "application/json"}
+    for i in range(requests):
+        body = json.dumps(tracks[i % len(tracks)])
+        start = time.perf_counter()
+        connection.request("POST", "/predict", body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise Exception(f"Prediction failed with status {response.status}")
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load-test a running prediction_service.py with concurrent single-track requests."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client.")
+    args = parser.parse_args()
+
+    # Real raw tracks as request payloads
+    tracks = load_artifact("spotify_data", columns=INPUT_FEATURES).dropna()
+    tracks = tracks.astype("float64").to_dict(orient="records")
+
+    latencies = []
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(args.host, args.port, tracks[i::args.clients], args.requests, latencies),
+        )
+        for i in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{len(latencies)} requests from {args.clients} clients in {seconds:.1f} s "
+        f"({len(latencies) / seconds:,.0f} requests/s)"
+    )
+    print(
+        f"client latency: p50 {np.percentile(latencies, 50):.1f} ms, "
+        f"p99 {np.percentile(latencies, 99):.1f} ms"
+    )
+
+    connection = http.client.HTTPConnection(args.host, args.port)
+    connection.request("GET", "/metrics")
+    print("server metrics:", connection.getresponse().read().decode("utf-8"))
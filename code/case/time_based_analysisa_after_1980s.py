@@ -1,45 +1,44 @@
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
-
-df = pd.read_csv("artifacts/spotify_data.csv")
-df = df[df["popularity"] >= 5]  # Remove any extremely small values
-
-# Create an empty dataset for cleaned data. Remove energy, valence, and acousticness with multicollinearity from previous correlation analysis
-df_cleaned = pd.DataFrame()
-
-# 1. Log transform of features
-df_cleaned["duration_ms"] = np.log1p(df["duration_ms"])
-df_cleaned["speechiness"] = np.log1p(df["speechiness"])
-df_cleaned["acousticness"] = np.log1p(df["acousticness"])
-df_cleaned["instrumentalness"] = np.log1p(df["instrumentalness"])
-
-# 2. Standard scaling of features
-standard_scaler = StandardScaler()
-df_cleaned[["danceability", "liveness", "tempo", "loudness"]] = (
-    standard_scaler.fit_transform(df[["danceability", "liveness", "tempo", "loudness"]])
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import load_artifact
+from feature_transform import (
+    INPUT_FEATURES,
+    TRANSFORM_PATH,
+    FeatureTransform,
+    load_or_fit_transform,
 )
+from figures import draw_trends, render_figures
+from year_cube import load_or_update_cube, scale_means, scale_stats
 
-# 3. Min Max scaling of features
-min_max_scaler = MinMaxScaler()
-df_cleaned[["key"]] = min_max_scaler.fit_transform(df[["key"]])
-
-# 4. Add other features
-df_cleaned["mode"] = df["mode"]
-df_cleaned["popularity"] = df["popularity"]
-df_cleaned["release_date"] = pd.to_datetime(df["release date"], errors="coerce")
-
-# Extract the year from the 'release_date' and create a new 'release_year' column
-df_cleaned["release_year"] = df_cleaned["release_date"].dt.year
-
-df_cleaned["release_year"] = df_cleaned["release_year"].fillna(0).astype(int)
-
-df_cleaned = df_cleaned.dropna()
-
-df_cleaned = df_cleaned.reset_index(drop=True)
-
-# Step 1: Select audio features and the release year
+parser = argparse.ArgumentParser(description="Trends in audio features over time.")
+parser.add_argument(
+    "--start-year", type=int, default=1981, help="First release year plotted"
+)
+parser.add_argument(
+    "--end-year", type=int, default=None, help="Last release year plotted"
+)
+args = parser.parse_args()
+
+# Per-year counts, sums and squared sums of every feature are kept in
+# artifacts/year_feature_cube.npz. Only tracks added to spotify_data since the
+# cube was built are read, so trends of any era come from the aggregates.
+cube = load_or_update_cube(min_popularity=5)
+
+# The cube holds the features before scaling; the shared transform saved by
+# data_cleaning.py converts the means to the scaled units of the other analyses.
+# The cube keeps the fingerprint of its tracks, so the saved transform is
+# checked without reading them; they are only read to refit an outdated one.
+transform = None
+if os.path.exists(TRANSFORM_PATH):
+    transform = FeatureTransform.load(TRANSFORM_PATH)
+if transform is None or transform.fingerprint != cube.data_fingerprint:
+    df = load_artifact("spotify_data", columns=["popularity"] + INPUT_FEATURES)
+    transform = load_or_fit_transform(df[df["popularity"] >= 5])
+
+# Step 1: Select audio features and the release years
 audio_features = [
     "danceability",
     "tempo",
@@ -51,26 +50,24 @@ audio_features = [
     "mode",
     "acousticness",
 ]
-df_selected = df_cleaned[["release_year"] + audio_features]
-df_selected = df_selected[df_selected["release_year"] > 1980]
-
-df_selected.reset_index(drop=True, inplace=True)
-
-# Step 2: Group the data by 'release_year' and calculate the mean of the audio features for each year
-yearly_trends = df_selected.groupby("release_year")[audio_features].mean()
-
-# Step 3: Plot the trends for each audio feature over time
-plt.figure(figsize=(10, 6))
-
-for feature in audio_features:
-    plt.plot(yearly_trends.index, yearly_trends[feature], label=feature)
-
-# Step 4: Customize the plot
-plt.title("Trends in Audio Features Over Time")
-plt.xlabel("Release Year")
-plt.ylabel("Mean Value")
-plt.legend()
-plt.xticks(rotation=45)
-plt.grid(True)
-plt.savefig("images/time_based_analysis.png", bbox_inches="tight")
-plt.show()
+end_year = args.end_year or int(cube.years[-1])
+
+# Step 2: Mean of the audio features for each year, from the cube
+yearly_trends = scale_means(cube.yearly_means(args.start_year, end_year), transform)
+yearly_trends = yearly_trends[audio_features].dropna()
+
+era = scale_stats(cube.range_stats(args.start_year, end_year), transform)
+print(f"Audio features of tracks released {args.start_year}-{end_year}:")
+print(era.loc[audio_features].round(4))
+
+# Step 3: Plot the trends for each audio feature over time, headlessly;
+# skipped if the trends have not changed
+render_figures(
+    [
+        (
+            "images/time_based_analysis.png",
+            draw_trends,
+            {"trends": yearly_trends, "features": audio_features},
+        )
+    ]
+)
@@ -1,15 +1,25 @@
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
+import os
+import sys
 
-df = pd.read_csv("artifacts/cleaned_data.csv")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import iter_artifact_chunks
+from cohort_stats import CohortStats
+from figures import draw_grouped_bars, render_figures
 
-# Step 1: Calculate the 90th percentile of the popularity score
-top_10_percent_threshold = df["popularity"].quantile(0.90)
+parser = argparse.ArgumentParser(description="Audio features of the top popularity cohorts.")
+parser.add_argument(
+    "--cohorts",
+    type=float,
+    nargs="+",
+    default=[1, 5, 10, 25],
+    help="Sizes of the top cohorts in percent",
+)
+args = parser.parse_args()
+cohorts = sorted(set(args.cohorts) | {10})  # The top 10% is always plotted
 
-# Step 2: Create a new column indicating if the song is in the Top 10% or not
-df["top_10_percent"] = df["popularity"] >= top_10_percent_threshold
-
-# Step 3: Select the audio features to compare
+# Step 1: Select the audio features to compare
 audio_features = [
     "danceability",
     "tempo",
@@ -19,17 +29,57 @@ audio_features = [
     "speechiness",
 ]
 
-# Step 4: Group the data by 'top_10_percent' and calculate the mean of the audio features for each group
-feature_means = df.groupby("top_10_percent")[audio_features].mean()
+# Step 2: One pass over the data: a quantile sketch of the popularity score
+# and the feature sums of every popularity value. The chunks never need to
+# fit in memory together.
+stats = CohortStats(audio_features)
+for chunk in iter_artifact_chunks("cleaned_data", columns=["popularity"] + audio_features):
+    stats.update(chunk["popularity"], chunk)
+
+# Step 3: Mean audio features of every top cohort and of the other songs,
+# from the popularity percentiles estimated by the sketch
+cohort_means = stats.cohort_means(cohorts)
+
+# Step 4: Display the comparison
+print("Average Audio Features - Top Cohorts vs. Other Songs:")
+print(cohort_means)
+
+feature_means = pd.DataFrame(
+    {
+        False: cohort_means.loc["Others 10%", audio_features],
+        True: cohort_means.loc["Top 10%", audio_features],
+    }
+).T.astype(float)
+feature_means.index.name = "top_10_percent"
 
-# Step 5: Display the comparison
 print("Average Audio Features - Top 10% vs. Other Songs:")
 print(feature_means)
 
-feature_means.T.plot(kind="bar", figsize=(10, 6))
-plt.title("Average Audio Features Comparison (Top 10% vs. Others)")
-plt.xlabel("Audio Features")
-plt.ylabel("Mean Value")
-plt.xticks(rotation=45)
-plt.savefig("images/avg_audio_features_comparison_top_10per.png", bbox_inches="tight")
-plt.show()
+# Step 5: Compare all the top cohorts
+top_means = cohort_means.loc[[f"Top {percent:g}%" for percent in cohorts], audio_features]
+
+# Step 6: Draw both comparisons headlessly; unchanged ones are skipped
+render_figures(
+    [
+        (
+            "images/avg_audio_features_comparison_top_10per.png",
+            draw_grouped_bars,
+            {
+                "table": feature_means.T,
+                "title": "Average Audio Features Comparison (Top 10% vs. Others)",
+                "xlabel": "Audio Features",
+                "ylabel": "Mean Value",
+            },
+        ),
+        (
+            "images/avg_audio_features_comparison_top_cohorts.png",
+            draw_grouped_bars,
+            {
+                "table": top_means.T.astype(float),
+                "title": "Average Audio Features Comparison Across Top Popularity Cohorts",
+                "xlabel": "Audio Features",
+                "ylabel": "Mean Value",
+            },
+        ),
+    ]
+)
@@ -1,12 +1,10 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import os
+import sys
 
-# read CSV
-df = pd.read_csv("artifacts/spotify_data.csv")
-print(len(df))
-df["release date"] = pd.to_datetime(df["release date"])
-df["year"] = df["release date"].dt.year
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import iter_artifact_chunks
+from binned_stats import binned_distributions
+from figures import draw_distributions, render_figures
 
 # choose variables to analyze, exclude the non-numeric variable）
 variables = [
@@ -25,23 +23,30 @@ variables = [
     "year",
 ]
 
-# draw the charts
-sns.set_theme(style="whitegrid")
-plt.figure(figsize=(15, 20))
+# read only the columns we plot; the track length is stored as duration_ms
+columns = [var for var in variables if var not in ("duration (ms)", "year")]
+columns += ["duration_ms", "release date"]
 
-for i, var in enumerate(variables, 1):
-    plt.subplot(7, 2, i)  
-    sns.histplot(df[var], kde=True, bins=30) 
-    plt.title(f"Distribution of {var}", fontsize=12) 
-    plt.xlabel(var)  
-    plt.ylabel("Frequency")  
 
-plt.tight_layout()
+def read_chunks():
+    for chunk in iter_artifact_chunks("spotify_data", columns):
+        chunk = chunk.rename(columns={"duration_ms": "duration (ms)"})
+        chunk["year"] = chunk["release date"].dt.year
+        yield chunk
 
-#save image
-plt.savefig(
-    "images/variable_distributions.png",
-    bbox_inches="tight",
-)
 
-plt.show()
+# precompute the histograms (30 bins) and KDE curves in two passes over the
+# chunks, so drawing does not depend on the number of tracks
+distributions = binned_distributions(read_chunks, variables, bins=30)
+print(int(sum(distributions[variables[0]]["counts"])))
+
+# draw the charts headlessly; skipped if the data has not changed
+render_figures(
+    [
+        (
+            "images/variable_distributions.png",
+            draw_distributions,
+            {"variables": variables, "distributions": distributions},
+        )
+    ]
+)
@@ -2,17 +2,28 @@
 # id,name,artists,duration (ms),popularity,url,danceability,energy,key,loudness,mode,speechiness,acousticness,instrumentalness,liveness,valence,tempo,type,uri,track_href,analysis_url,duration_ms,time_signature
 #####choose artists,duration,danceability,energy,key,loudness,mode,speechiness,acousticness,instrumentalness,liveness,valence,tempo,type
 
+import argparse
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import iter_artifact_chunks
+from bootstrap import RowSample, bootstrap_correlation
+from figures import draw_heatmap, render_figures
+from streaming_correlation import streaming_moments
+from vif import vif_from_correlation
+
+parser = argparse.ArgumentParser(description="Pearson correlations of the audio features.")
+parser.add_argument(
+    "--bootstrap-rows",
+    type=int,
+    default=20_000,
+    help="Complete rows sampled for the bootstrap intervals; 0 skips them",
+)
+args = parser.parse_args()
 
-df = pd.read_csv("artifacts/spotify_data.csv")
-#df_unique = df.drop_duplicates(subset=["id"])
 
-# df = pd.read_csv(df)
-df["release date"] = pd.to_datetime(df["release date"])
-df["year"] = df["release date"].dt.year
 variables = [
     "popularity",
     "duration (ms)",
@@ -30,48 +41,75 @@ variables = [
     "year",
 ]
 
-# calculate correlation_matrix
-correlation_matrix = df[variables].corr(method="pearson")
+# read only the columns we need; the track length is stored as duration_ms
+columns = [var for var in variables if var not in ("duration (ms)", "year")]
+columns += ["duration_ms", "release date"]
 
-plt.figure(figsize=(12, 10))
 
-# use seaborn yo draw heat map
+def prepare(df):
+    df = df.rename(columns={"duration_ms": "duration (ms)"})
+    df["year"] = df["release date"].dt.year
+    return df
 
 
-plt.figure(figsize=(12, 10))
+# a uniform sample of the complete rows for the bootstrap, drawn on the way
+sample = RowSample(args.bootstrap_rows)
+
+
+def chunks():
+    for chunk in iter_artifact_chunks("spotify_data", columns):
+        chunk = prepare(chunk)
+        sample.update(chunk[variables].dropna())
+        yield chunk
 
-sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm",cbar=True, fmt=".2f")
-sns.heatmap(
-    correlation_matrix,
-    annot=True,
-    cmap="coolwarm",
-    fmt=".2f",
-    annot_kws={"size": 10},
-    xticklabels=variables,
-    yticklabels=variables,
-    cbar_kws={"shrink": 0.8},
-)
 
-plt.xticks(rotation=45, ha="right", fontsize=10)
-plt.yticks(fontsize=10)
-plt.title("Pearson Correlation Matrix of Music Features")
-plt.savefig(
-    "images/pearson correlation.png",
-    bbox_inches="tight",
+# calculate correlation_matrix in one pass over the data, merging the moments
+# of every chunk computed on all cores (pairwise-complete, like df.corr); the
+# moments of the complete rows are kept too, for the intervals and the VIF
+moments, complete = streaming_moments(
+    chunks(), variables, processes=os.cpu_count(), complete_cases=True
+)
+correlation_matrix = moments.correlation()
+complete_matrix = complete.correlation()
+
+# draw the heat map once, headlessly; skipped if the matrix has not changed
+render_figures(
+    [
+        (
+            "images/pearson correlation.png",
+            draw_heatmap,
+            {
+                "matrix": correlation_matrix,
+                "title": "Pearson Correlation Matrix of Music Features",
+            },
+        )
+    ]
 )
 
 print("missing value:")
-print(df[variables].isnull().sum())
-df_cleaned = df[variables].dropna()
-print("missing value after cleaning:")
-print(df_cleaned.isnull().sum())
-
-import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
+print(moments.missing_counts())
+print(f"complete rows: {complete.rows} of {moments.rows}")
+
+# 95% percentile bootstrap intervals for every cell (2,000 resamples of a
+# sample of the complete rows, all of them if there are fewer); a link is
+# stable when its interval excludes 0. The correlations next to them are
+# over the complete rows too. A sample smaller than the data gives wider,
+# conservative intervals.
+if not sample.rows.empty:
+    lower, upper = bootstrap_correlation(sample.rows, "pearson")
+    popularity_ci = pd.DataFrame(
+        {
+            "correlation": complete_matrix["popularity"],
+            "lower": lower["popularity"],
+            "upper": upper["popularity"],
+        }
+    ).drop(index="popularity")
+    popularity_ci["stable"] = (popularity_ci["lower"] > 0) | (popularity_ci["upper"] < 0)
+    print(f"correlation with popularity (95% bootstrap CI, {len(sample.rows)} rows):")
+    print(popularity_ci)
 
 # Extract features for VIF calculation (excluding name, artists, and popularity)
 
-df_cleaned = df_cleaned.drop(columns=["popularity"])
 variables_new = [
     "duration (ms)",
     "danceability",
@@ -87,15 +125,10 @@ variables_new = [
     "tempo",
     "year",
 ]
-features = df_cleaned[variables_new]
-
-
-X = sm.add_constant(features)
-
 
-vif_data = pd.DataFrame()
-vif_data["Feature"] = X.columns
-vif_data["VIF"] = [variance_inflation_factor(X.values, i) for i in range(X.shape[1])]
+# All VIFs at once from the inverse correlation matrix of the complete rows
+# (with an intercept)
+vif_data = vif_from_correlation(complete_matrix.loc[variables_new, variables_new])
 
 
 print(vif_data)
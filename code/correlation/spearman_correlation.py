@@ -1,15 +1,14 @@
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from statsmodels.stats.outliers_influence import variance_inflation_factor
 import numpy as np
+import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import load_artifact
+from bootstrap import bootstrap_correlation
+from figures import draw_heatmap, render_figures
+from vif import variance_inflation_factors
 
-# read CSV
-df = pd.read_csv("artifacts/spotify_data.csv")
-# If we want to use the 'year' variable, we can use the following lines
-#df['release date'] = pd.to_datetime(df['release date'])
-#df['year'] = df['release date'].dt.year
 
 variables = [
     "popularity",
@@ -27,41 +26,48 @@ variables = [
     "tempo",
 ]
 
+# read only the columns we need; the track length is stored as duration_ms
+# If we want to use the 'year' variable, we can also load "release date" and use
+#df['year'] = df['release date'].dt.year
+columns = [var for var in variables if var != "duration (ms)"]
+df = load_artifact("spotify_data", columns=columns + ["duration_ms"]).rename(
+    columns={"duration_ms": "duration (ms)"}
+)
+
 # Spearman
 spearman_corr = df[variables].corr(method="spearman")
 
 print(spearman_corr)
 
-
-plt.figure(figsize=(12, 10))
-
-sns.heatmap(
-    spearman_corr,
-    annot=True,
-    cmap="coolwarm",
-    fmt=".2f",
-    annot_kws={"size": 10},
-    xticklabels=variables,
-    yticklabels=variables,
-    cbar_kws={"shrink": 0.8},
-)
-
-
-plt.xticks(rotation=45, ha="right", fontsize=10)
-plt.yticks(fontsize=10)
-
-
-plt.title("Spearman Correlation Matrix of Music Features")
-
-
-plt.savefig(
-    "images/spearman_correlation.png",
-    bbox_inches="tight",
+# 95% percentile bootstrap intervals for every cell (2,000 resamples of the
+# complete rows); a link is stable when its interval excludes 0
+lower, upper = bootstrap_correlation(df[variables], "spearman")
+popularity_ci = pd.DataFrame(
+    {
+        "correlation": spearman_corr["popularity"],
+        "lower": lower["popularity"],
+        "upper": upper["popularity"],
+    }
+).drop(index="popularity")
+popularity_ci["stable"] = (popularity_ci["lower"] > 0) | (popularity_ci["upper"] < 0)
+print("correlation with popularity (95% bootstrap CI):")
+print(popularity_ci)
+
+
+# draw the heat map headlessly; skipped if the matrix has not changed
+render_figures(
+    [
+        (
+            "images/spearman_correlation.png",
+            draw_heatmap,
+            {
+                "matrix": spearman_corr,
+                "title": "Spearman Correlation Matrix of Music Features",
+            },
+        )
+    ]
 )
 
-
-plt.show()
-
 variables_vif = [
     "duration (ms)",
     "danceability",
@@ -81,11 +87,8 @@ df_cleaned_vif = df[variables_vif]
 
 df_cleaned_vif = df_cleaned_vif.replace([np.inf, -np.inf], np.nan).dropna()
 
-vif_data = pd.DataFrame()
-vif_data["Feature"] = df_cleaned_vif.columns
-vif_data["VIF"] = [
-    variance_inflation_factor(df_cleaned_vif.values, i)
-    for i in range(df_cleaned_vif.shape[1])
-]
+# All VIFs at once from the inverse correlation matrix, with an intercept as
+# in pearson_correlation.py
+vif_data = variance_inflation_factors(df_cleaned_vif, add_constant=True)
 
 print(vif_data)
@@ -0,0 +1,204 @@
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+
+class PairwiseMoments:
+    """
+    Running moments for a pairwise-complete Pearson correlation matrix.
+
+    For every pair of columns (i, j) it keeps, over the rows where both values
+    are present, the count `n[i, j]`, the mean of column i `mean[i, j]`, the
+    sum of squared deviations of column i `m2[i, j]` and the co-moment
+    `comoment[i, j]`. Chunks are summarised in one vectorised pass and
+    combined with Chan's parallel update, so states built on different chunks
+    or in different processes can be merged in any order. Missing values are
+    handled pairwise like `DataFrame.corr`; `rows` counts every row seen, so
+    `missing_counts` gives each column's missing values.
+
+    Parameters:
+    - columns (list): The column names, in matrix order.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.rows = 0
+        self.n = np.zeros((p, p))
+        self.mean = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.comoment = np.zeros((p, p))
+
+    @classmethod
+    def from_chunk(cls, chunk, columns=None):
+        """
+        Summarises one chunk of data.
+
+        Parameters:
+        - chunk (DataFrame or ndarray): The rows of one chunk; NaN marks a missing value.
+        - columns (list): The column names if `chunk` is an array.
+
+        Returns:
+        - moments (PairwiseMoments): The moments of the chunk.
+        """
+
+        if isinstance(chunk, pd.DataFrame):
+            columns = list(chunk.columns) if columns is None else columns
+            chunk = chunk[columns].to_numpy(dtype="float64", na_value=np.nan)
+
+        moments = cls(columns)
+        values = np.asarray(chunk, dtype="float64")
+        moments.rows = len(values)
+        present = ~np.isnan(values)
+        if not present.any():
+            return moments
+
+        # Shift every column by its chunk mean to avoid cancellation in the
+        # squared sums; central moments do not depend on the shift.
+        counts = present.sum(axis=0)
+        shift = np.where(present, values, 0.0).sum(axis=0) / np.maximum(counts, 1)
+        centered = np.where(present, values - shift, 0.0)
+        weights = present.astype("float64")
+
+        n = weights.T @ weights
+        sums = centered.T @ weights  # sums[i, j]: sum of column i where j is present
+        squares = (centered**2).T @ weights
+        products = centered.T @ centered
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, sums / n, 0.0)
+            m2 = np.where(n > 0, squares - sums * mean, 0.0)
+            comoment = np.where(n > 0, products - sums * sums.T / n, 0.0)
+
+        moments.n = n
+        moments.mean = mean + shift[:, None]
+        moments.m2 = np.maximum(m2, 0.0)
+        moments.comoment = comoment
+        return moments
+
+    def merge(self, other):
+        """
+        Combines the moments of another chunk or process into this state.
+
+        Parameters:
+        - other (PairwiseMoments): Moments over the same columns.
+
+        Returns:
+        - self (PairwiseMoments): The merged state.
+        """
+
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge moments over different columns")
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction = np.where(n > 0, other.n / n, 0.0)
+            weight = np.where(n > 0, self.n * other.n / n, 0.0)
+        self.mean = self.mean + delta * fraction
+        self.m2 = self.m2 + other.m2 + delta**2 * weight
+        self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        self.n = n
+        self.rows += other.rows
+        return self
+
+    def update(self, chunk):
+        """
+        Adds one chunk of data to the running moments.
+        """
+
+        return self.merge(PairwiseMoments.from_chunk(chunk, self.columns))
+
+    def missing_counts(self):
+        """
+        Returns the number of missing values of every column, like
+        `df.isnull().sum()`.
+        """
+
+        return pd.Series(self.rows - np.diag(self.n), index=self.columns).astype("int64")
+
+    def correlation(self, min_periods=1):
+        """
+        Returns the Pearson correlation matrix.
+
+        Parameters:
+        - min_periods (int): Minimum number of complete pairs required (default is 1).
+
+        Returns:
+        - corr (DataFrame): The correlation matrix; NaN where a pair has too few
+          observations or zero variance, as in `DataFrame.corr`.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr[(self.n < max(min_periods, 1)) | ~np.isfinite(corr)] = np.nan
+        corr = np.clip(corr, -1.0, 1.0)
+
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def _chunk_moments(args):
+    chunk, columns, complete_cases = args
+    moments = PairwiseMoments.from_chunk(chunk, columns)
+    if not complete_cases:
+        return moments, None
+    return moments, PairwiseMoments.from_chunk(chunk.dropna(), columns)
+
+
+def streaming_moments(chunks, columns, processes=1, complete_cases=False):
+    """
+    Accumulates the pairwise-complete moments of `columns` in one pass.
+
+    Parameters:
+    - chunks (iterable): DataFrames holding at least `columns`.
+    - columns (list): The columns to summarise.
+    - processes (int): Worker processes summarising chunks in parallel (default is 1).
+    - complete_cases (bool): Also accumulate the moments of the rows where
+      every column is present, as `df.dropna()` would keep (default is False).
+
+    Returns:
+    - moments (PairwiseMoments): The pairwise-complete moments.
+    - complete (PairwiseMoments or None): The complete-case moments, if asked for.
+    """
+
+    moments = PairwiseMoments(columns)
+    complete = PairwiseMoments(columns) if complete_cases else None
+    tasks = ((chunk[columns], columns, complete_cases) for chunk in chunks)
+
+    # Forked workers do not re-run the calling script, which is why the flat
+    # analysis scripts can use them; without fork the chunks are summarised
+    # in this process.
+    if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            results = pool.imap_unordered(_chunk_moments, tasks)
+            for chunk_moments, chunk_complete in results:
+                moments.merge(chunk_moments)
+                if complete is not None:
+                    complete.merge(chunk_complete)
+    else:
+        for task in tasks:
+            chunk_moments, chunk_complete = _chunk_moments(task)
+            moments.merge(chunk_moments)
+            if complete is not None:
+                complete.merge(chunk_complete)
+
+    return moments, complete
+
+
+def streaming_correlation(chunks, columns, processes=1, min_periods=1):
+    """
+    Computes a pairwise-complete Pearson correlation matrix in one pass.
+
+    Parameters:
+    - chunks (iterable): DataFrames holding at least `columns`.
+    - columns (list): The columns to correlate.
+    - processes (int): Worker processes summarising chunks in parallel (default is 1).
+    - min_periods (int): Minimum number of complete pairs required (default is 1).
+
+    Returns:
+    - corr (DataFrame): The same matrix as `df[columns].corr(method="pearson")`.
+    """
+
+    moments, _ = streaming_moments(chunks, columns, processes)
+    return moments.correlation(min_periods)
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+
+def _inverse_diagonal(matrix, tol=1e-10):
+    """
+    Returns the diagonal of the inverse of a symmetric positive semi-definite
+    matrix from one eigendecomposition.
+
+    Directions with an eigenvalue below `tol` times the largest are treated as
+    exactly singular, so a feature that is a linear combination of the others
+    gets an infinite value instead of a huge, noisy one. The matrix should have
+    a unit diagonal, e.g. a correlation matrix, so that the tolerance does not
+    depend on the units of the features.
+    """
+
+    eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+    singular = eigenvalues <= tol * max(eigenvalues.max(), 0.0)
+
+    with np.errstate(divide="ignore"):
+        inverse_diag = (eigenvectors[:, ~singular] ** 2 / eigenvalues[~singular]).sum(
+            axis=1
+        )
+    loads_on_singular = (np.abs(eigenvectors[:, singular]) > np.sqrt(tol)).any(axis=1)
+    inverse_diag[loads_on_singular] = np.inf
+
+    return inverse_diag
+
+
+def variance_inflation_factors(features, add_constant=True):
+    """
+    Computes the variance inflation factor of every feature at once.
+
+    With an intercept, VIF_j = 1 / (1 - R_j^2) is the j-th diagonal element of
+    the inverse correlation matrix of the features, so one eigendecomposition
+    replaces one regression per feature.
+
+    Parameters:
+    - features (DataFrame): The feature columns, without missing values.
+    - add_constant (bool): Regress each feature on the others with an
+      intercept (the usual definition, default). If False, the regressions
+      have no intercept and R^2 is uncentered, like statsmodels 0.14's
+      `variance_inflation_factor` on a design matrix without a constant.
+
+    Returns:
+    - vif_data (DataFrame): The columns "Feature" and "VIF"; constant or exactly
+      collinear features get an infinite VIF.
+    """
+
+    X = features.to_numpy(dtype="float64")
+
+    if add_constant:
+        std = X.std(axis=0)
+        constant = std == 0
+        standardized = (X - X.mean(axis=0)) / np.where(constant, 1.0, std)
+        corr = standardized.T @ standardized / len(X)
+        return vif_from_correlation(
+            pd.DataFrame(corr, index=features.columns, columns=features.columns), constant
+        )
+
+    # VIF_j = (G^-1)_jj G_jj is unchanged by scaling the Gram matrix G to a
+    # unit diagonal, D^-1/2 G D^-1/2, which keeps e.g. duration_ms (~2e5) from
+    # pushing the 0-1 features under the singularity tolerance
+    gram = X.T @ X
+    norms = np.sqrt(np.diag(gram))
+    zero = norms == 0
+    norms[zero] = 1.0
+    scaled = gram / np.outer(norms, norms)
+    scaled[zero, zero] = 1.0
+    vif = _inverse_diagonal(scaled)
+    vif[zero] = np.inf
+    return pd.DataFrame({"Feature": list(features.columns), "VIF": vif})
+
+
+def vif_from_correlation(corr, constant=None):
+    """
+    Computes the variance inflation factors (with an intercept) from the
+    correlation matrix of the features alone, e.g. one accumulated in a
+    streaming pass.
+
+    Parameters:
+    - corr (DataFrame): The correlation matrix of the features, over the
+      rows without missing values.
+    - constant (ndarray): Which features are constant (default is those with
+      a NaN diagonal, as a streamed correlation gives them).
+
+    Returns:
+    - vif_data (DataFrame): The columns "Feature" and "VIF"; constant or exactly
+      collinear features get an infinite VIF.
+    """
+
+    matrix = corr.to_numpy(dtype="float64", copy=True)
+    if constant is None:
+        constant = np.isnan(np.diag(matrix))
+    matrix[constant, :] = 0.0
+    matrix[:, constant] = 0.0
+    matrix[constant, constant] = 1.0
+
+    vif = _inverse_diagonal(matrix)
+    vif[constant] = np.inf
+    return pd.DataFrame({"Feature": list(corr.columns), "VIF": vif})
+
+
+if __name__ == "__main__":
+    # Checks both definitions against statsmodels on the collected tracks
+    import os
+    import sys
+    import warnings
+
+    import statsmodels.api as sm
+    from statsmodels.stats.outliers_influence import variance_inflation_factor
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+    from artifact_store import load_artifact
+
+    columns = [
+        "duration_ms",
+        "danceability",
+        "energy",
+        "key",
+        "loudness",
+        "mode",
+        "speechiness",
+        "acousticness",
+        "instrumentalness",
+        "liveness",
+        "valence",
+        "tempo",
+    ]
+    features = load_artifact("spotify_data", columns=columns)
+    features = features.replace([np.inf, -np.inf], np.nan).dropna()
+
+    failed = False
+    for add_constant in (False, True):
+        design = sm.add_constant(features) if add_constant else features
+        design = design.to_numpy(dtype="float64")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                # statsmodels >= 0.15 standardizes by default; 0.14 does not
+                reference = [
+                    variance_inflation_factor(design, i, standardize=False)
+                    for i in range(design.shape[1])
+                ]
+            except TypeError:
+                reference = [
+                    variance_inflation_factor(design, i) for i in range(design.shape[1])
+                ]
+        reference = np.asarray(reference[1:] if add_constant else reference)
+        vif = variance_inflation_factors(features, add_constant)["VIF"].to_numpy()
+        difference = np.max(np.abs(vif - reference) / reference)
+        print(f"add_constant={add_constant}: max relative VIF difference {difference:.2e}")
+        failed |= not difference < 1e-6
+
+    if failed:
+        raise Exception("The VIFs differ from statsmodels")
@@ -1,28 +1,19 @@
-import requests
-
-
-def get_playlists(query, access_token, limit=10):
+def get_playlists(query, client, limit=10):
     """
     Fetches a list of playlist IDs from the Spotify API based on a search query.
 
     Parameters:
     - query (str): The search term used to find playlists.
-    - access_token (str): The Spotify API access token required for authorization.
+    - client (SpotifyClient): The shared Spotify API client.
     - limit (int): The number of playlists to return (default is 10).
 
     Returns:
     - playlists_id (list): A list of playlist IDs that match the search query.
     """
 
-    search_url = (
-        f"https://api.spotify.com/v1/search?q={query}&type=playlist&limit={limit}"
-    )
-
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-    }
+    params = {"q": query, "type": "playlist", "limit": limit}
 
-    response = requests.get(search_url, headers=headers)
+    response = client.get("/search", params=params)
 
     # Check if the request was successful
     if response.status_code == 200:
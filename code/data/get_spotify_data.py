@@ -1,116 +1,267 @@
 from get_playlists import get_playlists
-from get_tracks import get_multiple_playlists_tracks, get_tracks_audio_features
-import requests
-import base64
+from get_tracks import iter_playlists_tracks, get_tracks_audio_features
+from spotify_client import SPOTIFY_API_URL, SpotifyClient
+from response_cache import ResponseCache, default_cache_path
+from rate_limiter import TokenBucket
 from dotenv import load_dotenv
+import argparse
 import os
 import csv
+import sys
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from instrumentation import metrics
 
-def get_access_token(client_id, client_secret):
+# Columns of spotify_data.csv: the track details from the playlists followed by
+# the audio features. The playlists' "duration (ms)" duplicates the features'
+# "duration_ms" and is not stored.
+TRACK_FIELDS = ["id", "name", "release date", "artists", "popularity", "preview url"]
+FEATURE_FIELDS = [
+    "danceability",
+    "energy",
+    "key",
+    "loudness",
+    "mode",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "type",
+    "uri",
+    "track_href",
+    "analysis_url",
+    "duration_ms",
+    "time_signature",
+]
+FIELDNAMES = TRACK_FIELDS + FEATURE_FIELDS
+
+
+def load_known_track_ids(csv_path):
     """
-    Retrieves the access token from Spotify using the Client Credentials Flow.
+    Loads the IDs of the tracks already stored in the artifact.
 
     Parameters:
-    - client_id (str): Your Spotify application's client ID.
-    - client_secret (str): Your Spotify application's client secret.
+    - csv_path (str): Path to an existing `spotify_data.csv`.
 
     Returns:
-    - access_token (str): The Spotify access token.
+    - known_ids (set): Track IDs already collected, empty if the file does not exist.
+    """
+
+    if not os.path.exists(csv_path):
+        return set()
+
+    return set(pd.read_csv(csv_path, usecols=["id"])["id"])
 
-    Raises:
-    - Exception: If the request fails or the token cannot be retrieved.
+
+def select_new_tracks(tracks_info, seen):
     """
+    Removes repeated and already collected tracks before requesting features.
 
-    # Spotify authentication URL for retrieving the token
-    auth_url = "https://accounts.spotify.com/api/token"
-    # Encode client_id and client_secret to base64
-    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode(
-        "utf-8"
-    )
+    The same track often appears in several playlists, and an incremental run
+    also sees every track of previous runs again.
+
+    Parameters:
+    - tracks_info (list): Track dictionaries of one or more playlists.
+    - seen (set): Track IDs already handled; updated in place.
+
+    Returns:
+    - new_tracks (list): The first occurrence of every unseen track, in crawl order.
+    """
+
+    new_tracks = []
+    for track in tracks_info:
+        if track["id"] not in seen:
+            seen.add(track["id"])
+            new_tracks.append(track)
+
+    return new_tracks
+
+
+def merge_audio_features(tracks_info, audio_features):
+    """
+    Joins track details to their audio features by track ID.
 
-    headers = {
-        "Authorization": f"Basic {auth_header}",
+    Tracks without audio features, or with a missing value in any stored
+    column, are dropped.
+
+    Parameters:
+    - tracks_info (list): Track dictionaries of one batch.
+    - audio_features (list): The audio features returned for that batch.
+
+    Returns:
+    - rows (list): Complete rows ready to be written to the artifact.
+    """
+
+    features_by_id = {
+        features["id"]: features for features in audio_features if features is not None
     }
 
-    data = {"grant_type": "client_credentials"}
+    rows = []
+    for track in tracks_info:
+        features = features_by_id.get(track["id"])
+        if features is None:
+            continue  # Skip track if features are missing
 
-    # Make the POST request to get the access token
-    response = requests.post(auth_url, headers=headers, data=data)
+        row = {field: track.get(field) for field in TRACK_FIELDS}
+        row.update({field: features.get(field) for field in FEATURE_FIELDS})
+        if any(value is None or value == "" for value in row.values()):
+            continue  # Skip incomplete rows
 
-    # Check if the request is successful (status code 200)
-    if response.status_code == 200:
-        token_info = response.json()
-        return token_info["access_token"]
-    else:
-        raise Exception(
-            f"Failed to get access token: {response.status_code}, {response.text}"
-        )
+        rows.append(row)
+
+    return rows
+
+
+def _write_batch(writer, tracks_info, client):
+    """
+    Fetches the audio features of one batch of tracks and appends the joined rows.
+
+    Returns:
+    - written (int): Number of complete rows written.
+    """
+
+    audio_features = get_tracks_audio_features(
+        [track["id"] for track in tracks_info], client
+    )
+    rows = merge_audio_features(tracks_info, audio_features)
+    writer.writerows(rows)
+
+    return len(rows)
+
+
+def write_tracks_with_features(
+    client, playlists_id, csv_path, known_ids=(), batch_size=50, max_workers=8
+):
+    """
+    Streams playlist tracks through feature lookup straight into the artifact.
+
+    As each playlist arrives its unseen tracks are queued; every `batch_size`
+    tracks one audio-features request is made, the batch is joined by ID and
+    appended to the CSV. Only the set of seen IDs and one batch are kept in
+    memory, and every row is written exactly once.
+
+    When `known_ids` is empty a fresh file is written next to `csv_path` and
+    moved into place at the end, so a failed run leaves the old data intact.
+    Otherwise the new rows are appended to the existing file.
+
+    Parameters:
+    - client (SpotifyClient): The shared Spotify API client.
+    - playlists_id (list): The playlists to crawl.
+    - csv_path (str): Path to `spotify_data.csv`.
+    - known_ids (set): IDs already stored; their tracks are skipped.
+    - batch_size (int): Tracks per audio-features request (default is 50).
+    - max_workers (int): Number of playlists fetched at once (default is 8).
+
+    Returns:
+    - written (int): Number of rows added to the artifact.
+    """
+
+    append = bool(known_ids) and os.path.exists(csv_path)
+    out_path = csv_path if append else f"{csv_path}.tmp"
+
+    seen = set(known_ids)
+    pending = []
+    written = 0
+
+    with open(out_path, "a" if append else "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if not append:
+            writer.writeheader()
+
+        for tracks_info in iter_playlists_tracks(client, playlists_id, max_workers):
+            pending.extend(select_new_tracks(tracks_info, seen))
+            while len(pending) >= batch_size:
+                written += _write_batch(writer, pending[:batch_size], client)
+                del pending[:batch_size]
+
+        if pending:
+            written += _write_batch(writer, pending, client)
+
+    if not append:
+        os.replace(out_path, csv_path)
+
+    return written
 
 
 if __name__ == "__main__":
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(
+        description="Collect Spotify tracks and their audio features."
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=default_cache_path(current_dir, SPOTIFY_API_URL),
+        help="SQLite file used to cache API responses between runs "
+        "(default is one file per API host).",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always call the live API."
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Serve every request from the cache and never touch the network.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch audio features for tracks missing from spotify_data.csv "
+        "and add them to the existing file.",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(current_dir, "..", "..", "artifacts", "spotify_data.csv"),
+        help="Path of the CSV to write.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=10.0,
+        help="Requests per second the client allows itself before any 429.",
+    )
+    args = parser.parse_args()
+
     load_dotenv()  # Load environment variables from the .env file
 
     # Retrieve Spotify client credentials from environment variables
     client_id = os.getenv("SPOTIFY_CLIENT_ID")
     client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
 
-    # Get an access token
-    access_token = get_access_token(client_id, client_secret)
+    # One client for the whole run: pooled connections and an auto-refreshing token
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            args.cache_path, replay_only=args.replay, api_url=SPOTIFY_API_URL
+        )
+    rate_limiter = TokenBucket(rate=args.rate, capacity=max(10, int(args.rate)))
+    client = SpotifyClient(client_id, client_secret, rate_limiter=rate_limiter, cache=cache)
 
     # Search for playlists related to the query 'English songs' retrieve their IDs
     query = "English songs"
-    playlists_id = get_playlists(query, access_token, 50)  # Retrieve their IDs
-
-    # Fetch all tracks information from the retrieved playlists and collect tracks' IDs
-    all_tracks_info = get_multiple_playlists_tracks(access_token, playlists_id)
-    all_tracks_id = []
-    for track in all_tracks_info:
-        all_tracks_id.append(track["id"])
-
-    # Retrieve audio features for the tracks using their IDs
-    all_tracks_features = get_tracks_audio_features(all_tracks_id, access_token)
-
-    # Update the track info with the corresponding audio features
-    for i in range(0, len(all_tracks_info)):
-        try:
-            print(all_tracks_info[i])
-        except IndexError:
-            break  # Exit the loop if the index is out of range
-
-        if all_tracks_features[i] is not None:
-            all_tracks_info[i].update(all_tracks_features[i])
-        else:
-            all_tracks_info.remove(
-                all_tracks_info[i]
-            )  # Remove track if features are missing
-
-    # Define the directory for storing the CSV output
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    artifacts_dir = os.path.join(current_dir, "..", "..", "artifacts")
+    with metrics.stage("search_playlists") as stage:
+        playlists_id = get_playlists(query, client, 50)  # Retrieve their IDs
+        stage.add_rows(len(playlists_id))
 
     # Define the path to the CSV file
-    CSV_PATH = os.path.join(artifacts_dir, "spotify_data.csv")
+    CSV_PATH = args.output
 
     # Create the directory if it doesn't exist
-    os.makedirs(artifacts_dir, exist_ok=True)
-
-    # Write the collected track information to a CSV file
-    with open(CSV_PATH, "w", newline="") as csvfile:
-        fieldnames = all_tracks_info[0].keys()
-
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-        writer.writeheader()
-
-        for track in all_tracks_info:
-            writer.writerow(track)
+    os.makedirs(os.path.dirname(os.path.abspath(CSV_PATH)), exist_ok=True)
 
-    df = pd.read_csv(CSV_PATH)
+    # Tracks already stored by a previous run are skipped in incremental mode
+    with metrics.stage("load_known_ids") as stage:
+        known_ids = load_known_track_ids(CSV_PATH) if args.incremental else set()
+        stage.add_rows(len(known_ids))
 
-    df.dropna(inplace=True)  # Drop nan values
-    df = df.drop_duplicates()  # Remove duplicates
-    df = df.drop(columns=["duration (ms)"])  # Remove the duplicated column
+    # Fetch the tracks of every playlist, look up the audio features of the
+    # unseen ones in batches and write the complete rows as they arrive
+    with metrics.stage("fetch_tracks") as stage:
+        written = write_tracks_with_features(client, playlists_id, CSV_PATH, known_ids)
+        stage.add_rows(written)
+    client.close()
 
-    df.to_csv(CSV_PATH, index=False)  # Store the new data in the original file
+    print(f"Wrote {written} new tracks ({len(known_ids)} already stored)")
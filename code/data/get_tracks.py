@@ -1,14 +1,128 @@
-import requests
-import time
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from instrumentation import metrics
 
-def get_multiple_playlists_tracks(access_token, playlist_ids):
+
+def _parse_track(item):
+    """
+    Converts one playlist item into a track_info dictionary.
+
+    Parameters:
+    - item (dict): One entry of the `items` list of a playlist tracks page.
+
+    Returns:
+    - track_info (dict or None): The track details, or None if key fields are missing.
+    """
+
+    track = item["track"]
+
+    # Skip tracks that have None values in key fields
+    if (
+        track is None
+        or track.get("id") is None
+        or track.get("name") is None
+        or not track.get("artists")
+        or track[  # Check if artists list exists and is non-empty
+            "artists"
+        ][0].get("name")
+        is None
+        # or track.get('release_date') is None
+        or track.get("duration_ms") is None
+        or track.get("popularity") is None
+        or track.get("preview_url") is None
+    ):
+        return None
+
+    return {
+        "id": track["id"],
+        "name": track["name"],
+        "release date": track["album"]["release_date"],
+        "artists": track["artists"][0]["name"],
+        "duration (ms)": track["duration_ms"],
+        "popularity": track["popularity"],
+        "preview url": track["preview_url"],
+    }
+
+
+def _get_playlist_tracks(client, playlist_id):
+    """
+    Pages through a single playlist and collects its track information.
+
+    Parameters:
+    - client (SpotifyClient): The shared Spotify API client.
+    - playlist_id (str): The playlist ID.
+
+    Returns:
+    - tracks_info (list): A list of dictionaries containing track details.
+    """
+
+    tracks_info = []
+    playlist_url = f"/playlists/{playlist_id}/tracks"
+    params = {
+        "limit": 100,  # Retrieve up to 100 tracks per page
+    }
+
+    while playlist_url:
+        response = client.get(playlist_url, params=params)
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get playlist tracks for playlist {playlist_id}: {response.status_code}, {response.text}"
+            )
+
+        data = response.json()
+
+        # Loop through all items in the current page of results
+        for item in data["items"]:
+            track_info = _parse_track(item)
+            if track_info is not None:
+                tracks_info.append(track_info)
+
+        # Check if there is a next page (pagination). The next URL already
+        # carries the query string, so the params are only sent once.
+        playlist_url = data["next"]
+        params = None
+
+    return tracks_info
+
+
+def iter_playlists_tracks(client, playlist_ids, max_workers=8):
+    """
+    Pages playlists concurrently and yields each playlist's tracks in turn.
+
+    Playlists are fetched on a bounded thread pool. All workers share the
+    client's connection pool and token-bucket rate limiter, which replaces a
+    fixed sleep after every page and backs off whenever the API answers 429
+    with a `Retry-After` header.
+
+    Parameters:
+    - client (SpotifyClient): The shared Spotify API client.
+    - playlist_ids (list): A list of playlist IDs to retrieve tracks from.
+    - max_workers (int): Number of playlists fetched at once (default is 8).
+
+    Yields:
+    - tracks_info (list): The track dictionaries of one playlist, in the same
+      playlist order as `playlist_ids`.
+    """
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        yield from executor.map(
+            lambda playlist_id: _get_playlist_tracks(client, playlist_id),
+            playlist_ids,
+        )
+
+
+def get_multiple_playlists_tracks(client, playlist_ids, max_workers=8):
     """
     Fetches track information from multiple playlists using the Spotify API.
 
     Parameters:
-    - access_token (str): The Spotify API access token.
+    - client (SpotifyClient): The shared Spotify API client.
     - playlist_ids (list): A list of playlist IDs to retrieve tracks from.
+    - max_workers (int): Number of playlists fetched at once (default is 8).
 
     Returns:
     - all_tracks_info (list): A list of dictionaries containing track details.
@@ -16,109 +130,82 @@ def get_multiple_playlists_tracks(access_token, playlist_ids):
 
     all_tracks_info = []  # Store all tracks info
 
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-    }
-
-    for playlist_id in playlist_ids:
-        playlist_url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-        params = {
-            "limit": 100,  # Retrieve up to 100 tracks per page
-        }
-
-        while playlist_url:
-            response = requests.get(playlist_url, headers=headers, params=params)
-
-            if response.status_code != 200:
-                raise Exception(
-                    f"Failed to get playlist tracks for playlist {playlist_id}: {response.status_code}, {response.text}"
-                )
-
-            data = response.json()
-
-            # Loop through all items in the current page of results
-            for item in data["items"]:
-                track = item["track"]
-
-                # Skip tracks that have None values in key fields
-                if (
-                    track is None
-                    or track.get("id") is None
-                    or track.get("name") is None
-                    or not track.get("artists")
-                    or track[  # Check if artists list exists and is non-empty
-                        "artists"
-                    ][0].get("name")
-                    is None
-                    # or track.get('release_date') is None
-                    or track.get("duration_ms") is None
-                    or track.get("popularity") is None
-                    or track.get("preview_url") is None
-                ):
-                    continue  # Skip this track if any of the fields is None
-
-                # If all required data is present, create track_info dictionary
-                track_info = {
-                    "id": track["id"],
-                    "name": track["name"],
-                    "release date": track["album"]["release_date"],
-                    "artists": track["artists"][0]["name"],
-                    "duration (ms)": track["duration_ms"],
-                    "popularity": track["popularity"],
-                    "preview url": track["preview_url"],
-                }
-
-                # Add track_info to all_tracks_info list
-                all_tracks_info.append(track_info)
-
-            # Check if there is a next page (pagination)
-            playlist_url = data["next"]
-
-            # Add a delay to prevent rate-limiting
-            time.sleep(5)
+    for tracks_info in iter_playlists_tracks(client, playlist_ids, max_workers):
+        all_tracks_info.extend(tracks_info)
 
     return all_tracks_info
 
 
-def get_tracks_audio_features(track_ids, access_token, retries=3):
+def iter_tracks_audio_features(track_ids, client, batch_size=50):
+    """
+    Fetch audio features for multiple tracks from Spotify API, one batch at a time.
+
+    With a response cache on the client, the features are looked up per
+    track ID first and only the missing IDs are requested, in full batches.
+    The fetched features are stored per track ID, so they are found again
+    however later runs group their requests.
+
+    Parameters:
+    - track_ids (list): List of track IDs.
+    - client (SpotifyClient): The shared Spotify API client, which retries
+      server errors and rate-limited requests.
+    - batch_size (int): Number of IDs per request (the API allows up to 100, default is 50).
+
+    Yields:
+    - audio_features (list): Audio feature data for some of the tracks, the
+      cached ones first; missing tracks are None.
+    """
+
+    cache = client.cache
+    missing = list(track_ids)
+    if cache is not None:
+        cached = cache.get_audio_features(track_ids)
+        # Counted per track, unlike the per-request http_cache_lookups
+        metrics.inc("audio_features_cache_lookups", len(cached), result="hit")
+        metrics.inc(
+            "audio_features_cache_lookups", len(track_ids) - len(cached), result="miss"
+        )
+        missing = [track_id for track_id in track_ids if track_id not in cached]
+        if cached:
+            yield list(cached.values())
+
+    # Process track IDs in batches of 50
+    for i in range(0, len(missing), batch_size):
+        batch_ids = missing[i : i + batch_size]
+        response = client.get(
+            "/audio-features", params={"ids": ",".join(batch_ids)}, use_cache=False
+        )
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get audio features: {response.status_code}, {response.text}"
+            )
+
+        audio_features = response.json().get("audio_features", [])
+        if cache is not None:
+            fetched = dict.fromkeys(batch_ids)
+            fetched.update(
+                (features["id"], features) for features in audio_features if features is not None
+            )
+            cache.put_audio_features(fetched)
+        yield audio_features
+
+
+def get_tracks_audio_features(track_ids, client):
     """
     Fetch audio features for multiple tracks from Spotify API in batches of 50.
 
     Parameters:
     - track_ids (list): List of track IDs.
-    - access_token (str): Spotify access token.
-    - retries (int): Number of retries for each request in case of server errors.
+    - client (SpotifyClient): The shared Spotify API client.
 
     Returns:
     - all_audio_features (list): Audio feature data for the tracks.
     """
 
-    batch_size = 50
     all_audio_features = []
 
-    # Process track IDs in batches of 50
-    for i in range(0, len(track_ids), batch_size):
-        batch_ids = track_ids[i : i + batch_size]
-        ids = ",".join(batch_ids)
-        url = f"https://api.spotify.com/v1/audio-features?ids={ids}"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-        }
-
-        # Retry logic in case of server errors
-        for attempt in range(retries):
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                if "audio_features" in data:
-                    all_audio_features.extend(data["audio_features"])
-                break
-            elif response.status_code >= 500:
-                print(f"Server error {response.status_code}, retrying in 5 seconds...")
-                time.sleep(5)  # Wait before retrying
-            else:
-                raise Exception(
-                    f"Failed to get audio features: {response.status_code}, {response.text}"
-                )
+    for audio_features in iter_tracks_audio_features(track_ids, client):
+        all_audio_features.extend(audio_features)
 
     return all_audio_features
@@ -0,0 +1,517 @@
+import argparse
+import base64
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import fit_synthetic_model, sample_tracks
+
+# Fields of a track's audio-features object, as returned by the Web API
+AUDIO_FEATURE_FIELDS = [
+    "danceability",
+    "energy",
+    "key",
+    "loudness",
+    "mode",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "type",
+    "id",
+    "uri",
+    "track_href",
+    "analysis_url",
+    "duration_ms",
+    "time_signature",
+]
+
+
+class MockSpotifyData:
+    """
+    A seeded catalogue of synthetic tracks spread over playlists.
+
+    Tracks are drawn from the synthetic generator fitted on the real
+    spotify_data.csv. Every playlist holds its own slice of the tracks plus
+    `overlap` times as many tracks from other playlists, so the crawl sees
+    repeated tracks like on the real API. A fraction `missing_rate` of the
+    tracks has no preview URL and another has no audio features, which the
+    ingestion code has to skip.
+
+    Parameters:
+    - source (str): The real spotify_data.csv the generator is fitted on.
+    - tracks (int): Number of distinct tracks (default is 100,000).
+    - playlists (int): Number of playlists (default is 50).
+    - overlap (float): Extra share of repeated tracks per playlist (default is 0.1).
+    - missing_rate (float): Share of tracks without preview or features
+      (default is 0.02).
+    - seed (int): Seed of the catalogue (default is 0).
+    """
+
+    def __init__(
+        self,
+        source,
+        tracks=100_000,
+        playlists=50,
+        overlap=0.1,
+        missing_rate=0.02,
+        seed=0,
+    ):
+        rng = np.random.default_rng(seed)
+        model = fit_synthetic_model(pd.read_csv(source))
+        df = sample_tracks(model, tracks, rng)
+
+        self.columns = {column: df[column].tolist() for column in df.columns}
+        for column in ["duration_ms", "key", "mode", "time_signature"]:
+            self.columns[column] = df[column].round().astype("int64").tolist()
+        self.index = {track_id: i for i, track_id in enumerate(self.columns["id"])}
+        self.no_preview = set(
+            np.flatnonzero(rng.random(tracks) < missing_rate).tolist()
+        )
+        self.no_features = set(
+            np.flatnonzero(rng.random(tracks) < missing_rate).tolist()
+        )
+
+        self.playlists = {}
+        for i, own in enumerate(np.array_split(rng.permutation(tracks), playlists)):
+            repeated = rng.choice(tracks, size=int(len(own) * overlap))
+            playlist_id = "".join(
+                rng.choice(list("0123456789abcdefghijklmnopqrstuvwxyz"), 22)
+            )
+            self.playlists[playlist_id] = {
+                "name": f"Synthetic playlist {i + 1}",
+                "tracks": rng.permutation(np.concatenate([own, repeated])).tolist(),
+            }
+
+    def playlist_item(self, i):
+        """
+        Returns the playlist item of track `i`, shaped like the Web API's.
+        """
+
+        c = self.columns
+        return {
+            "added_at": "2024-01-01T00:00:00Z",
+            "track": {
+                "id": c["id"][i],
+                "name": c["name"][i],
+                "album": {"release_date": c["release date"][i]},
+                "artists": [{"name": c["artists"][i]}],
+                "duration_ms": c["duration_ms"][i],
+                "popularity": c["popularity"][i],
+                "preview_url": None if i in self.no_preview else c["preview url"][i],
+            },
+        }
+
+    def audio_features(self, track_id):
+        i = self.index.get(track_id)
+        if i is None or i in self.no_features:
+            return None
+        return {field: self.columns[field][i] for field in AUDIO_FEATURE_FIELDS}
+
+
+class FaultInjector:
+    """
+    Decides the latency and failures of every request, like a busy API would.
+
+    1. Every request sleeps for a normally distributed latency.
+    2. A server-side token bucket allows `rate_limit` requests per second
+       (bursts of up to `burst`); above it, requests get 429 with a
+       `Retry-After` header in whole seconds.
+    3. Of the remaining requests, a share `error_rate` fails with 500, 502
+       or 503.
+
+    Parameters:
+    - latency_ms (float): Mean latency (default is 0).
+    - jitter_ms (float): Standard deviation of the latency (default is 0).
+    - rate_limit (float): Requests per second before 429s; None for no limit.
+    - burst (int): Capacity of the token bucket (default is the rate limit).
+    - error_rate (float): Share of server errors (default is 0).
+    - seed (int): Seed of the random faults (default is 0).
+    """
+
+    def __init__(
+        self,
+        latency_ms=0.0,
+        jitter_ms=0.0,
+        rate_limit=None,
+        burst=None,
+        error_rate=0.0,
+        seed=0,
+    ):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit = rate_limit
+        self.capacity = float(burst or rate_limit or 0)
+        self.error_rate = error_rate
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def decide(self):
+        """
+        Returns the latency in seconds, and the error status and Retry-After
+        of the request (None, None when it succeeds).
+        """
+
+        with self._lock:
+            delay = (
+                max(0.0, self._rng.normal(self.latency, self.jitter))
+                if self.jitter
+                else self.latency
+            )
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._last_refill) * self.rate_limit,
+                )
+                self._last_refill = now
+                if self._tokens < 1:
+                    retry_after = max(
+                        1, math.ceil((1 - self._tokens) / self.rate_limit)
+                    )
+                    return delay, 429, retry_after
+                self._tokens -= 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return delay, int(self._rng.choice([500, 502, 503])), None
+        return delay, None, None
+
+
+class MockSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # A crawl opens a keep-alive connection per worker
+
+
+def make_handler(data, faults, token_ttl=3600, page_limit=100):
+    """
+    Builds the request handler of the stand-in API.
+
+    Endpoints, under the same paths as the real services:
+    - POST /api/token: Client Credentials Flow with a Basic Authorization header.
+    - GET /v1/search?type=playlist&limit=&offset=: the catalogue's playlists.
+    - GET /v1/playlists/{id}/tracks?limit=&offset=: pages of at most 100
+      items with an absolute `next` URL.
+    - GET /v1/audio-features?ids=: up to 100 comma-separated IDs; unknown
+      tracks are null.
+    - GET /stats: request counts by endpoint and by status, for benchmarks.
+
+    API endpoints answer 401 without a valid, unexpired token. Every request
+    goes through the `FaultInjector`, except /stats.
+    """
+
+    tokens = {}
+    stats = {"endpoints": {}, "statuses": {}}
+    lock = threading.Lock()
+
+    class MockSpotifyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                stats["statuses"][str(status)] = (
+                    stats["statuses"].get(str(status), 0) + 1
+                )
+
+        def _count(self, endpoint):
+            with lock:
+                stats["endpoints"][endpoint] = stats["endpoints"].get(endpoint, 0) + 1
+
+        def _inject_faults(self):
+            """
+            Applies latency and failures; returns True if an error was sent.
+            """
+
+            delay, status, retry_after = faults.decide()
+            if delay:
+                time.sleep(delay)
+            if status == 429:
+                self._send_json(
+                    429,
+                    {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                    {"Retry-After": str(retry_after)},
+                )
+                return True
+            if status is not None:
+                self._send_json(
+                    status, {"error": {"status": status, "message": "Server error"}}
+                )
+                return True
+            return False
+
+        def _authorized(self):
+            header = self.headers.get("Authorization", "")
+            expiry = (
+                tokens.get(header[len("Bearer ") :])
+                if header.startswith("Bearer ")
+                else None
+            )
+            if expiry is None or time.monotonic() >= expiry:
+                self._send_json(
+                    401,
+                    {"error": {"status": 401, "message": "The access token expired"}},
+                )
+                return False
+            return True
+
+        def _page(self, query, default_limit, max_limit):
+            limit = min(int(query.get("limit", [default_limit])[0]), max_limit)
+            offset = int(query.get("offset", [0])[0])
+            return limit, offset
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if urlparse(self.path).path != "/api/token":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            self._count("token")
+            if self._inject_faults():
+                return
+
+            header = self.headers.get("Authorization", "")
+            try:
+                credentials = base64.b64decode(header[len("Basic ") :]).decode("utf-8")
+            except ValueError:
+                credentials = ""
+            if not header.startswith("Basic ") or ":" not in credentials:
+                self._send_json(400, {"error": "invalid_client"})
+                return
+
+            token = secrets.token_urlsafe(24)
+            with lock:
+                tokens[token] = time.monotonic() + token_ttl
+            self._send_json(
+                200,
+                {
+                    "access_token": token,
+                    "token_type": "Bearer",
+                    "expires_in": token_ttl,
+                },
+            )
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            parts = url.path.strip("/").split("/")
+
+            if url.path == "/stats":
+                with lock:
+                    snapshot = json.loads(json.dumps(stats))
+                self._send_json(200, snapshot)
+                return
+            if parts[0] != "v1" or len(parts) < 2:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+
+            self._count(parts[1])
+            if self._inject_faults() or not self._authorized():
+                return
+
+            try:
+                if parts[1] == "search":
+                    self._search(query)
+                elif (
+                    parts[1] == "playlists" and len(parts) == 4 and parts[3] == "tracks"
+                ):
+                    self._playlist_tracks(parts[2], query)
+                elif parts[1] == "audio-features":
+                    self._audio_features(query)
+                else:
+                    self._send_json(404, {"error": f"Unknown path {self.path}"})
+            except ValueError as error:
+                self._send_json(400, {"error": {"status": 400, "message": str(error)}})
+
+        def _search(self, query):
+            limit, offset = self._page(query, 20, 50)
+            ids = list(data.playlists)[offset : offset + limit]
+            items = [
+                {
+                    "id": playlist_id,
+                    "name": data.playlists[playlist_id]["name"],
+                    "tracks": {"total": len(data.playlists[playlist_id]["tracks"])},
+                }
+                for playlist_id in ids
+            ]
+            self._send_json(
+                200,
+                {
+                    "playlists": {
+                        "items": items,
+                        "limit": limit,
+                        "offset": offset,
+                        "total": len(data.playlists),
+                        "next": None,
+                    }
+                },
+            )
+
+        def _playlist_tracks(self, playlist_id, query):
+            playlist = data.playlists.get(playlist_id)
+            if playlist is None:
+                self._send_json(
+                    404, {"error": {"status": 404, "message": "Not found."}}
+                )
+                return
+
+            limit, offset = self._page(query, page_limit, page_limit)
+            tracks = playlist["tracks"]
+            next_url = None
+            if offset + limit < len(tracks):
+                host = self.headers.get(
+                    "Host",
+                    f"{self.server.server_address[0]}:{self.server.server_address[1]}",
+                )
+                next_url = (
+                    f"http://{host}/v1/playlists/{playlist_id}/tracks"
+                    f"?offset={offset + limit}&limit={limit}"
+                )
+            self._send_json(
+                200,
+                {
+                    "items": [
+                        data.playlist_item(i) for i in tracks[offset : offset + limit]
+                    ],
+                    "limit": limit,
+                    "offset": offset,
+                    "total": len(tracks),
+                    "next": next_url,
+                },
+            )
+
+        def _audio_features(self, query):
+            ids = [
+                track_id
+                for track_id in query.get("ids", [""])[0].split(",")
+                if track_id
+            ]
+            if not ids or len(ids) > 100:
+                raise ValueError("ids must hold between 1 and 100 track IDs")
+            self._send_json(
+                200, {"audio_features": [data.audio_features(i) for i in ids]}
+            )
+
+        def log_message(self, format, *args):
+            pass  # One line per request would dominate the latency under load
+
+    return MockSpotifyHandler
+
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in of the Spotify Web API from synthetic "
+        "tracks."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument(
+        "--tracks", type=int, default=100_000, help="Distinct tracks in the catalogue."
+    )
+    parser.add_argument(
+        "--playlists", type=int, default=50, help="Playlists in the catalogue."
+    )
+    parser.add_argument(
+        "--overlap",
+        type=float,
+        default=0.1,
+        help="Share of repeated tracks per playlist.",
+    )
+    parser.add_argument(
+        "--missing-rate",
+        type=float,
+        default=0.02,
+        help="Share of tracks without preview or features.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="Mean latency of every request."
+    )
+    parser.add_argument(
+        "--jitter-ms",
+        type=float,
+        default=0.0,
+        help="Standard deviation of the latency.",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Requests per second before 429s.",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=None,
+        help="Requests allowed at once (default is the rate limit).",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of 5xx answers."
+    )
+    parser.add_argument(
+        "--token-ttl",
+        type=int,
+        default=3600,
+        help="Lifetime of access tokens in seconds.",
+    )
+    parser.add_argument(
+        "--source",
+        default=os.path.join(current_dir, "..", "..", "artifacts", "spotify_data.csv"),
+        help="The real data the synthetic tracks are fitted on.",
+    )
+    args = parser.parse_args()
+
+    data = MockSpotifyData(
+        args.source,
+        args.tracks,
+        args.playlists,
+        args.overlap,
+        args.missing_rate,
+        args.seed,
+    )
+    faults = FaultInjector(
+        args.latency_ms,
+        args.jitter_ms,
+        args.rate_limit,
+        args.burst,
+        args.error_rate,
+        args.seed,
+    )
+    server = MockSpotifyServer(
+        (args.host, args.port), make_handler(data, faults, args.token_ttl)
+    )
+    host, port = server.server_address[:2]
+    print(
+        f"Serving {args.tracks} tracks in {args.playlists} playlists "
+        f"on http://{host}:{port}",
+        flush=True,
+    )
+    print(
+        f"SPOTIFY_AUTH_URL=http://{host}:{port}/api/token "
+        f"SPOTIFY_API_URL=http://{host}:{port}/v1",
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
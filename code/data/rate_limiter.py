@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket shared by every worker that calls the Spotify API.
+
+    Each request takes one token. Tokens refill at `rate` per second up to
+    `capacity`, so short bursts are allowed while the long-run request rate
+    stays at `rate`. When the API answers 429 or a server error, `pause` blocks
+    all workers until the `Retry-After` or backoff delay has passed and halves
+    the refill rate, so the crawl settles at the throughput the API actually
+    allows.
+
+    Parameters:
+    - rate (float): Tokens added per second (default is 10).
+    - capacity (int): Maximum number of tokens in the bucket (default is 10).
+    - min_rate (float): Lower bound for the refill rate after 429s (default is 0.5).
+    """
+
+    def __init__(self, rate=10.0, capacity=10, min_rate=0.5):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.min_rate = float(min_rate)
+        self._max_rate = float(rate)
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+
+        Returns:
+        - waited (float): Seconds spent waiting for the token.
+        """
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """
+        Stops every worker for `seconds` after a 429 or a server error and
+        slows the refill rate.
+
+        Parameters:
+        - seconds (float): The `Retry-After` delay, or one from `backoff_delay`.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            # Several workers usually hit the same bad window; slow down once.
+            if now >= self._paused_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._last_refill = self._paused_until
+
+    def reward(self):
+        """
+        Slowly raises the refill rate back towards its initial value after a
+        successful request.
+        """
+
+        with self._lock:
+            self.rate = min(self._max_rate, self.rate + self._max_rate / 20)
+
+
+def parse_retry_after(response, default=1.0):
+    """
+    Reads the `Retry-After` header of a 429 response.
+
+    Parameters:
+    - response (requests.Response): The rate-limited response.
+    - default (float): Delay to use if the header is missing or invalid (default is 1).
+
+    Returns:
+    - delay (float): Number of seconds to wait before retrying.
+    """
+
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """
+    Returns the delay before retrying a failed request: exponential in the
+    attempt number, with full jitter so workers that failed together do not
+    retry together.
+
+    Parameters:
+    - attempt (int): Number of earlier retries of this request (0 for the first).
+    - base (float): Upper bound of the first delay in seconds (default is 0.5).
+    - cap (float): Upper bound of any delay in seconds (default is 30).
+
+    Returns:
+    - delay (float): Number of seconds to wait before retrying.
+    """
+
+    return random.uniform(0, min(cap, base * 2**attempt))
@@ -0,0 +1,357 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Time-to-live in seconds for each endpoint. Audio features of a track never
+# change, while playlist contents and search results do; they are stored per
+# track ID in their own table (see `get_audio_features`), not per request.
+# A track without features may get them later, so that answer expires.
+DEFAULT_TTLS = {
+    "audio-features": None,  # never expires
+    "audio-features-missing": 7 * 24 * 3600,
+    "playlists": 24 * 3600,
+    "search": 3600,
+}
+DEFAULT_TTL = 3600
+
+
+def default_cache_path(directory, api_url):
+    """
+    Cache file for responses of `api_url` in `directory`.
+
+    The real Spotify API gets spotify_cache.sqlite; any other host, e.g. a
+    local mock server, gets its own file named after the host and port, so
+    its answers never mix with real ones.
+    """
+
+    host = urlparse(api_url).netloc
+    if host == "api.spotify.com":
+        return os.path.join(directory, "spotify_cache.sqlite")
+    return os.path.join(directory, f"spotify_cache_{re.sub(r'[^A-Za-z0-9.]+', '_', host)}.sqlite")
+
+
+class CachedResponse:
+    """
+    A minimal stand-in for `requests.Response` built from a cached body.
+    """
+
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.text = body
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ResponseCache:
+    """
+    A SQLite-backed cache of Spotify API responses.
+
+    Entries are keyed by endpoint path and sorted query parameters, expire after
+    a TTL that depends on the endpoint, and are evicted least-recently-used
+    first once the total body size exceeds `max_bytes`. Audio features are
+    kept one row per track ID, so they survive any change of the request
+    batches; they count against the same size bound and are evicted in the
+    same least-recently-used order. In replay-only mode a cache miss
+    raises instead of going to the network, so the whole pipeline can be
+    served offline from a previous run.
+
+    Keys leave the host out, so one file must only ever hold the answers of
+    one API. The file records the `api_url` it was filled from and refuses
+    to open for another one, e.g. a local mock server.
+
+    Parameters:
+    - path (str): Location of the SQLite database file.
+    - ttls (dict): Endpoint name to TTL in seconds (None means no expiry).
+    - max_bytes (int): Size bound for the stored response bodies (default is 512 MB).
+    - replay_only (bool): Never fall back to the network (default is False).
+    - api_url (str): Base URL of the API the responses come from (default is None,
+      which skips the check).
+
+    Raises:
+    - Exception: If the file was filled from another `api_url`.
+    """
+
+    def __init__(
+        self, path, ttls=None, max_bytes=512 * 1024**2, replay_only=False, api_url=None
+    ):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audio_features (
+                id TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                created REAL NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(audio_features)")
+        ]
+        if "size" not in columns:
+            # Files written before the features were evicted
+            self._conn.execute(
+                "ALTER TABLE audio_features ADD COLUMN size INTEGER NOT NULL DEFAULT 0"
+            )
+            self._conn.execute(
+                "ALTER TABLE audio_features"
+                " ADD COLUMN last_access REAL NOT NULL DEFAULT 0"
+            )
+            self._conn.execute(
+                "UPDATE audio_features SET size = length(CAST(body AS BLOB)), "
+                "last_access = created"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS audio_features_last_access "
+            "ON audio_features (last_access)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        if api_url is not None:
+            api_url = api_url.rstrip("/")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('api_url', ?)", (api_url,)
+            )
+            (cached_url,) = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'api_url'"
+            ).fetchone()
+            if cached_url != api_url:
+                self._conn.close()
+                raise Exception(
+                    f"{path} caches responses of {cached_url}, not {api_url}; "
+                    "pass another --cache-path or --no-cache"
+                )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url, params=None):
+        """
+        Builds the cache key from the endpoint path and its query parameters.
+
+        The host is left out, so a `next` link and the equivalent path plus
+        params map to the same entry; each cache file is tied to one API
+        URL instead.
+
+        Parameters:
+        - url (str): A full URL or an API path.
+        - params (dict): The query parameters sent with the request.
+
+        Returns:
+        - key (str): The normalised "path?query" key.
+        - endpoint (str): The endpoint name used to pick the TTL.
+        """
+
+        parsed = urlparse(url)
+        query = parse_qsl(parsed.query)
+        query.extend((k, str(v)) for k, v in (params or {}).items())
+        path = parsed.path
+        if path.startswith("/v1/"):
+            path = path[3:]
+
+        endpoint = path.strip("/").split("/")[0]
+        return f"{path}?{urlencode(sorted(query))}", endpoint
+
+    def _ttl(self, endpoint):
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def get(self, url, params=None):
+        """
+        Looks up a cached response.
+
+        Parameters:
+        - url (str): A full URL or an API path.
+        - params (dict): The query parameters.
+
+        Returns:
+        - response (CachedResponse or None): The cached response, or None on a miss
+          or an expired entry.
+
+        Raises:
+        - Exception: On a miss in replay-only mode.
+        """
+
+        key, endpoint = self.make_key(url, params)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            ttl = self._ttl(endpoint)
+            if row is not None and (ttl is None or now - row[1] <= ttl):
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+                return CachedResponse(row[0])
+
+        # Expired entries are still served when replaying, since there is no
+        # other source for them.
+        if self.replay_only:
+            if row is not None:
+                return CachedResponse(row[0])
+            raise Exception(f"Replay-only cache miss for {key}")
+
+        return None
+
+    def put(self, url, params, body):
+        """
+        Stores a successful response body and evicts old entries if needed.
+
+        Parameters:
+        - url (str): A full URL or an API path.
+        - params (dict): The query parameters.
+        - body (str): The response text.
+        """
+
+        key, endpoint = self.make_key(url, params)
+        now = time.time()
+        size = len(body.encode("utf-8"))
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, body, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def get_audio_features(self, track_ids):
+        """
+        Looks up the cached audio features of individual tracks.
+
+        Parameters:
+        - track_ids (list): The track IDs.
+
+        Returns:
+        - features (dict): Track ID to its audio features, for the cached IDs
+          only; None for tracks the API had no features for, until that
+          answer expires.
+
+        Raises:
+        - Exception: If any ID is missing in replay-only mode.
+        """
+
+        track_ids = list(dict.fromkeys(track_ids))
+        missing_ttl = self._ttl("audio-features-missing")
+        now = time.time()
+        features = {}
+        with self._lock:
+            # Stay below SQLite's limit on the number of bound parameters
+            for i in range(0, len(track_ids), 500):
+                chunk = track_ids[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT id, body, created FROM audio_features WHERE id IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for track_id, body, created in rows:
+                    value = json.loads(body)
+                    # Expired "no features" answers are still served when replaying
+                    expired = (
+                        value is None
+                        and missing_ttl is not None
+                        and now - created > missing_ttl
+                    )
+                    if not expired or self.replay_only:
+                        features[track_id] = value
+            self._conn.executemany(
+                "UPDATE audio_features SET last_access = ? WHERE id = ?",
+                [(now, track_id) for track_id in features],
+            )
+            self._conn.commit()
+
+        if self.replay_only and len(features) < len(track_ids):
+            missing = [track_id for track_id in track_ids if track_id not in features]
+            raise Exception(
+                f"Replay-only cache miss for the audio features of {len(missing)} tracks, "
+                f"e.g. {missing[0]}"
+            )
+
+        return features
+
+    def put_audio_features(self, features):
+        """
+        Stores the audio features of individual tracks.
+
+        Parameters:
+        - features (dict): Track ID to its audio features, or None if the API
+          had none.
+        """
+
+        now = time.time()
+        rows = []
+        for track_id, value in features.items():
+            body = json.dumps(value)
+            rows.append((track_id, body, now, len(body.encode("utf-8")), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO audio_features "
+                "(id, body, created, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """
+        Deletes the least recently used responses and audio features until
+        their total size is within `max_bytes`.
+        """
+
+        total = self._conn.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM responses)"
+            " + (SELECT COALESCE(SUM(size), 0) FROM audio_features)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT 'responses', key, size, last_access FROM responses"
+            " UNION ALL"
+            " SELECT 'audio_features', id, size, last_access FROM audio_features"
+            " ORDER BY last_access"
+        ).fetchall()
+        stale = {"responses": [], "audio_features": []}
+        for table, key, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            stale[table].append((key,))
+            total -= size
+        self._conn.executemany(
+            "DELETE FROM responses WHERE key = ?", stale["responses"]
+        )
+        self._conn.executemany(
+            "DELETE FROM audio_features WHERE id = ?", stale["audio_features"]
+        )
+
+    def close(self):
+        self._conn.close()
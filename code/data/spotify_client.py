@@ -0,0 +1,253 @@
+import base64
+import os
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import TokenBucket, backoff_delay, parse_retry_after
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from instrumentation import metrics
+
+# Both can point at a local stand-in such as mock_spotify_server.py
+SPOTIFY_AUTH_URL = os.environ.get(
+    "SPOTIFY_AUTH_URL", "https://accounts.spotify.com/api/token"
+)
+SPOTIFY_API_URL = os.environ.get("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+
+
+class SpotifyClient:
+    """
+    A Spotify Web API client shared by every ingestion call.
+
+    The client keeps one `requests.Session` with a connection pool sized for the
+    crawl workers, so each request reuses an open TCP/TLS connection. It caches
+    the access token from the Client Credentials Flow together with its expiry,
+    refreshes it shortly before it expires and once more if the API answers 401.
+    All requests go through a shared token-bucket rate limiter.
+
+    Parameters:
+    - client_id (str): Your Spotify application's client ID.
+    - client_secret (str): Your Spotify application's client secret.
+    - auth_url (str): URL of the token endpoint.
+    - api_url (str): Base URL of the Web API.
+    - pool_size (int): Number of keep-alive connections per host (default is 16).
+    - rate_limiter (TokenBucket): A shared limiter; a new one is created if None.
+    - retries (int): Number of retries on 429, server errors, timeouts and
+      dropped connections (default is 3).
+    - refresh_margin (float): Seconds before expiry at which the token is renewed
+      (default is 60).
+    - cache (ResponseCache): An optional on-disk cache of successful GET responses.
+    - timeout (tuple): (connect, read) timeouts in seconds of every request
+      (default is (5, 30)).
+    """
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        auth_url=SPOTIFY_AUTH_URL,
+        api_url=SPOTIFY_API_URL,
+        pool_size=16,
+        rate_limiter=None,
+        retries=3,
+        refresh_margin=60,
+        cache=None,
+        timeout=(5, 30),
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.auth_url = auth_url
+        self.api_url = api_url.rstrip("/")
+        self.retries = retries
+        self.refresh_margin = refresh_margin
+        self.cache = cache
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._token = None
+        self._token_expiry = 0.0
+        self._token_lock = threading.Lock()
+
+    def _request_token(self):
+        """
+        Retrieves a new access token using the Client Credentials Flow.
+
+        Raises:
+        - Exception: If the request fails or the token cannot be retrieved.
+        """
+
+        # Encode client_id and client_secret to base64
+        auth_header = base64.b64encode(
+            f"{self.client_id}:{self.client_secret}".encode()
+        ).decode("utf-8")
+
+        headers = {
+            "Authorization": f"Basic {auth_header}",
+        }
+
+        data = {"grant_type": "client_credentials"}
+
+        start = time.perf_counter()
+        response = self.session.post(
+            self.auth_url, headers=headers, data=data, timeout=self.timeout
+        )
+        metrics.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            endpoint="token",
+        )
+        metrics.inc("http_requests", endpoint="token", status=str(response.status_code))
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get access token: {response.status_code}, {response.text}"
+            )
+
+        token_info = response.json()
+        self._token = token_info["access_token"]
+        self._token_expiry = time.monotonic() + token_info.get("expires_in", 3600)
+
+    def get_access_token(self, force_refresh=False):
+        """
+        Returns the cached access token, fetching a new one if it is missing,
+        about to expire or `force_refresh` is set.
+
+        Parameters:
+        - force_refresh (bool): Discard the cached token (default is False).
+
+        Returns:
+        - access_token (str): The Spotify access token.
+        """
+
+        with self._token_lock:
+            if (
+                force_refresh
+                or self._token is None
+                or time.monotonic() >= self._token_expiry - self.refresh_margin
+            ):
+                self._request_token()
+            return self._token
+
+    def get(self, url, params=None, use_cache=True):
+        """
+        Sends an authorized GET request to the Web API.
+
+        Responses found in the cache are returned without touching the network
+        (or fetching a token). Otherwise the request waits for the rate limiter
+        before every attempt, refreshes the token once on 401, honours
+        `Retry-After` on 429 and retries server errors, timeouts and dropped
+        connections after an exponential, jittered backoff. Successful
+        responses are written back to the cache.
+
+        Parameters:
+        - url (str): A full URL (e.g. a `next` link) or a path such as "/search".
+        - params (dict): The query parameters.
+        - use_cache (bool): Look the response up in, and store it to, the
+          response cache (default is True).
+
+        Returns:
+        - response (requests.Response or CachedResponse): The final response.
+
+        Raises:
+        - requests.RequestException: If the last attempt still times out or
+          loses its connection.
+        """
+
+        if not url.startswith("http"):
+            url = f"{self.api_url}{url}"
+
+        if self.cache is None or not use_cache:
+            return self._send(url, params)
+
+        response = self.cache.get(url, params)
+        metrics.inc("http_cache_lookups", result="miss" if response is None else "hit")
+        if response is None:
+            response = self._send(url, params)
+            if response.status_code == 200:
+                self.cache.put(url, params, response.text)
+
+        return response
+
+    def _endpoint(self, url):
+        """
+        Returns the first path segment of an API URL, e.g. "playlists", as a
+        metrics label that does not grow with the number of IDs.
+        """
+
+        path = url[len(self.api_url) :] if url.startswith(self.api_url) else url
+        return path.split("?")[0].strip("/").split("/")[0] or "/"
+
+    def _send(self, url, params):
+        token = self.get_access_token()
+        refreshed = False
+        attempt = 0
+        endpoint = self._endpoint(url)
+
+        while True:
+            metrics.inc("http_rate_limit_wait_seconds", self.rate_limiter.acquire())
+            start = time.perf_counter()
+            try:
+                response = self.session.get(
+                    url,
+                    headers={"Authorization": f"Bearer {token}"},
+                    params=params,
+                    timeout=self.timeout,
+                )
+            except (requests.Timeout, requests.ConnectionError) as error:
+                # A stalled or dropped connection is retried like a server error
+                metrics.inc(
+                    "http_requests", endpoint=endpoint, status=type(error).__name__
+                )
+                if attempt >= self.retries:
+                    raise
+                response = None
+            else:
+                metrics.observe(
+                    "http_request_duration_seconds",
+                    time.perf_counter() - start,
+                    endpoint=endpoint,
+                )
+                metrics.inc(
+                    "http_requests", endpoint=endpoint, status=str(response.status_code)
+                )
+
+                if response.status_code == 401 and not refreshed:
+                    token = self.get_access_token(force_refresh=True)
+                    refreshed = True
+                    continue
+
+                if attempt >= self.retries:
+                    return response
+
+            if response is not None and response.status_code == 429:
+                metrics.inc("http_rate_limited", endpoint=endpoint)
+                self.rate_limiter.pause(parse_retry_after(response))
+            elif response is None or response.status_code >= 500:
+                # Back off every worker, not just this one: the API is struggling
+                delay = backoff_delay(attempt)
+                self.rate_limiter.pause(delay)
+                metrics.inc("http_retry_sleep_seconds", delay)
+            else:
+                self.rate_limiter.reward()
+                return response
+
+            attempt += 1
+            metrics.inc("http_retries", endpoint=endpoint)
+
+    def close(self):
+        """
+        Closes the pooled connections and the cache.
+        """
+
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,181 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from get_spotify_data import FIELDNAMES
+
+# Numeric columns sampled jointly from the Gaussian copula. The discrete ones
+# only take values seen in the real data.
+CONTINUOUS_COLUMNS = [
+    "danceability",
+    "energy",
+    "loudness",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "duration_ms",
+    "release year",
+]
+DISCRETE_COLUMNS = ["popularity", "key", "mode", "time_signature"]
+COPULA_COLUMNS = CONTINUOUS_COLUMNS + DISCRETE_COLUMNS
+
+ID_ALPHABET = np.array(list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"))
+HEX_ALPHABET = np.array(list("0123456789abcdef"))
+
+
+def _release_years(dates):
+    """
+    Converts Spotify release dates ("YYYY", "YYYY-MM" or "YYYY-MM-DD") to decimal years.
+    """
+
+    parsed = pd.to_datetime(dates, format="ISO8601", errors="coerce")
+    return parsed.dt.year + (parsed.dt.dayofyear - 1) / 365.25
+
+
+def fit_synthetic_model(df):
+    """
+    Fits a Gaussian copula to the real tracks.
+
+    Every numeric column keeps its own empirical distribution, and their
+    dependence is the correlation matrix of the normal scores of their ranks.
+    Release dates are modelled as decimal years, with the observed mix of
+    day, month and year precision. Names and artists are drawn from the real
+    values.
+
+    Parameters:
+    - df (DataFrame): The real spotify_data.
+
+    Returns:
+    - model (dict): "columns", "sorted" (the sorted values of every column),
+      "cholesky", "date_precision", "names" and "artists".
+    """
+
+    values = df.assign(**{"release year": _release_years(df["release date"])})[COPULA_COLUMNS]
+    values = values.dropna()
+
+    scores = ndtri((values.rank().to_numpy() - 0.5) / len(values))
+    corr = np.corrcoef(scores, rowvar=False)
+    # Clip tiny negative eigenvalues so the Cholesky factor exists
+    eigenvalues, eigenvectors = np.linalg.eigh(corr)
+    corr = eigenvectors @ np.diag(np.maximum(eigenvalues, 1e-8)) @ eigenvectors.T
+    corr /= np.sqrt(np.outer(np.diag(corr), np.diag(corr)))
+
+    precision = df["release date"].astype(str).str.len().value_counts(normalize=True)
+    return {
+        "columns": COPULA_COLUMNS,
+        "sorted": {column: np.sort(values[column].to_numpy()) for column in COPULA_COLUMNS},
+        "cholesky": np.linalg.cholesky(corr),
+        "date_precision": precision.to_dict(),
+        "names": df["name"].dropna().to_numpy(),
+        "artists": df["artists"].dropna().to_numpy(),
+    }
+
+
+def _random_strings(rng, alphabet, n, length):
+    chars = alphabet[rng.integers(0, len(alphabet), size=(n, length))]
+    return chars.view(f"<U{length}").ravel()
+
+
+def sample_tracks(model, n, rng):
+    """
+    Draws synthetic tracks with the columns and formats of spotify_data.
+
+    Parameters:
+    - model (dict): From `fit_synthetic_model`.
+    - n (int): Number of tracks.
+    - rng (Generator): The random generator.
+
+    Returns:
+    - tracks (DataFrame): The tracks, in the column order of spotify_data.csv.
+    """
+
+    uniform = ndtr(rng.standard_normal((n, len(model["columns"]))) @ model["cholesky"].T)
+    tracks = {}
+    for j, column in enumerate(model["columns"]):
+        method = "inverted_cdf" if column in DISCRETE_COLUMNS else "linear"
+        tracks[column] = np.quantile(model["sorted"][column], uniform[:, j], method=method)
+
+    # Release dates at the real mix of precisions
+    years = tracks.pop("release year")
+    dates = pd.Timestamp("1970-01-01") + pd.to_timedelta(
+        (years - 1970) * 365.25, unit="D"
+    )
+    lengths = rng.choice(
+        list(model["date_precision"]), size=n, p=list(model["date_precision"].values())
+    )
+    release_dates = dates.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    for length in np.unique(lengths):
+        mask = lengths == length
+        release_dates[mask] = [date[:length] for date in release_dates[mask]]
+
+    ids = _random_strings(rng, ID_ALPHABET, n, 22)
+    tracks.update(
+        {
+            "id": ids,
+            "name": rng.choice(model["names"], size=n),
+            "release date": release_dates,
+            "artists": rng.choice(model["artists"], size=n),
+            "preview url": np.char.add(
+                "https://p.scdn.co/mp3-preview/", _random_strings(rng, HEX_ALPHABET, n, 40)
+            ),
+            "type": "audio_features",
+            "uri": np.char.add("spotify:track:", ids),
+            "track_href": np.char.add("https://api.spotify.com/v1/tracks/", ids),
+            "analysis_url": np.char.add("https://api.spotify.com/v1/audio-analysis/", ids),
+        }
+    )
+    tracks["popularity"] = tracks["popularity"].astype("int64")
+    return pd.DataFrame(tracks)[FIELDNAMES]
+
+
+def write_synthetic_data(model, path, rows, seed=0, chunksize=500_000):
+    """
+    Writes a synthetic spotify_data.csv chunk by chunk.
+
+    Parameters:
+    - model (dict): From `fit_synthetic_model`.
+    - path (str): The CSV to write.
+    - rows (int): Number of tracks.
+    - seed (int): Seed of the generator (default is 0).
+    - chunksize (int): Tracks generated at once (default is 500,000).
+    """
+
+    rng = np.random.default_rng(seed)
+    tmp_path = f"{path}.tmp"
+    for start in range(0, rows, chunksize):
+        chunk = sample_tracks(model, min(chunksize, rows - start), rng)
+        chunk.to_csv(tmp_path, mode="a" if start else "w", header=start == 0, index=False)
+    if rows == 0:
+        pd.DataFrame(columns=FIELDNAMES).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    artifacts_dir = os.path.join(current_dir, "..", "..", "artifacts")
+
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic tracks fitted from the real spotify_data.csv."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of tracks.")
+    parser.add_argument("--output", required=True, help="Path of the CSV to write.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator.")
+    parser.add_argument(
+        "--source",
+        default=os.path.join(artifacts_dir, "spotify_data.csv"),
+        help="The real data the generator is fitted on.",
+    )
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output) == os.path.abspath(args.source):
+        raise Exception("The synthetic data must not overwrite the real data")
+
+    model = fit_synthetic_model(pd.read_csv(args.source))
+    write_synthetic_data(model, args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} synthetic tracks to {args.output}")
@@ -0,0 +1,344 @@
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import KFold, ParameterGrid
+
+from artifact_store import ARTIFACTS_DIR
+from instrumentation import metrics
+
+CV_CACHE_DIR = os.path.join(ARTIFACTS_DIR, "cv_cache")
+
+# Arrays of the current worker, attached to shared memory by `_attach_worker`
+_shared = {}
+
+
+def dataset_hash(X, y):
+    """
+    Returns a hash of the training data, used to key folds and results.
+    """
+
+    return joblib.hash(
+        (np.asarray(X, dtype="float64"), np.asarray(y, dtype="float64"))
+    )
+
+
+def estimator_config(estimator):
+    """
+    Returns a hashable description of an estimator: its class and all its parameters.
+    """
+
+    params = estimator.get_params(deep=False)
+    params.pop("n_jobs", None)  # Parallelism does not change the result
+    return (type(estimator).__module__, type(estimator).__qualname__, sorted(params.items()))
+
+
+class ResultCache:
+    """
+    A directory of memoized results, one joblib file per key.
+
+    Reading a result marks it as recently used; once the directory exceeds
+    `max_bytes` the least recently used files are evicted.
+
+    Parameters:
+    - directory (str): Where the results are stored (default is artifacts/cv_cache).
+    - max_bytes (int): Size limit of the directory (default is 256 MB).
+    """
+
+    def __init__(self, directory=CV_CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = None  # Size of the directory, scanned on the first write
+
+    @staticmethod
+    def key(*parts):
+        return joblib.hash(parts)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.joblib")
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            value = joblib.load(path)
+        except (FileNotFoundError, EOFError):
+            return default
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(value, tmp_path)
+        try:
+            replaced = os.path.getsize(path)  # Counted already if the key existed
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        if self._bytes is None:
+            self._bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._bytes += os.path.getsize(path) - replaced
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue  # Removed by another process meanwhile
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used results until the directory fits in `max_bytes`.
+        """
+
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+        self._bytes = total
+
+
+def _attach_worker(specs):
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _shared[f"_{name}_shm"] = shm  # Keep the mapping alive
+
+
+def _run_task(args):
+    func, task = args
+    return func(_shared, task)
+
+
+def _fit_score(data, task):
+    estimator, fold = task
+    train = data["fold_of"] != fold
+    valid = ~train
+    estimator.fit(data["X"][train], data["y"][train])
+    return -mean_squared_error(data["y"][valid], estimator.predict(data["X"][valid]))
+
+
+class CVEngine:
+    """
+    Cross-validation shared by all the models trained on the same data.
+
+    1. The fold indices are built once per dataset hash and stored next to
+       the results, so every model sees the same folds.
+    2. Each (estimator config, fold) score is memoized on disk, so a rerun
+       only fits what has not been fitted before, e.g. one new grid point.
+    3. Missing fits run on a process pool. The training matrix, labels and
+       fold labels are copied once into shared memory and the workers read
+       them in place instead of receiving a pickled copy per task.
+
+    Workers are forked so that the flat training scripts are not re-run;
+    without fork the tasks run in this process.
+
+    Parameters:
+    - X (DataFrame or ndarray): Training features.
+    - y (Series or ndarray): Training labels.
+    - cv (int): Number of folds (default is 5).
+    - cache (ResultCache): Where results are memoized (default is artifacts/cv_cache).
+    - processes (int): Worker processes (default is the number of CPUs).
+    """
+
+    def __init__(self, X, y, cv=5, cache=None, processes=None):
+        self.X = np.ascontiguousarray(X, dtype="float64")
+        self.y = np.ascontiguousarray(y, dtype="float64")
+        self.cv = cv
+        self.cache = cache if cache is not None else ResultCache()
+        self.processes = processes or os.cpu_count()
+        self.parallel = (
+            self.processes > 1 and "fork" in multiprocessing.get_all_start_methods()
+        )
+        self.hash = dataset_hash(self.X, self.y)
+        self.fold_of = self._load_folds()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_folds(self):
+        key = ResultCache.key("folds", self.hash, self.cv)
+        fold_of = self.cache.get(key)
+        if fold_of is None:
+            fold_of = np.empty(len(self.y), dtype="int64")
+            for fold, (_, valid_idx) in enumerate(KFold(n_splits=self.cv).split(self.X)):
+                fold_of[valid_idx] = fold
+            self.cache.put(key, fold_of)
+        return fold_of
+
+    @property
+    def folds(self):
+        """
+        The (train indices, validation indices) of every fold, as from `KFold`.
+        """
+
+        return [
+            (np.flatnonzero(self.fold_of != fold), np.flatnonzero(self.fold_of == fold))
+            for fold in range(self.cv)
+        ]
+
+    def task_key(self, *parts):
+        """
+        Returns the cache key of a result computed on this engine's data and folds.
+        """
+
+        return ResultCache.key(self.hash, self.cv, *parts)
+
+    def count(self, hits, misses):
+        """
+        Counts results found in the cache and results that had to be computed.
+        """
+
+        self.hits += hits
+        self.misses += misses
+        metrics.inc("cv_results", hits, result="memoized")
+        metrics.inc("cv_results", misses, result="computed")
+
+    def run(self, func, tasks):
+        """
+        Runs `func(data, task)` for every task, on the pool when possible.
+
+        `data` is a dict with the arrays "X", "y" and "fold_of"; `func` must be
+        a module-level function so it can be sent to the workers.
+
+        Returns:
+        - results (list): One result per task, in order.
+        """
+
+        tasks = list(tasks)
+        if not self.parallel or len(tasks) < 2:
+            data = {"X": self.X, "y": self.y, "fold_of": self.fold_of}
+            return [func(data, task) for task in tasks]
+
+        arrays = {"X": self.X, "y": self.y, "fold_of": self.fold_of}
+        blocks, specs = [], {}
+        try:
+            for name, array in arrays.items():
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                blocks.append(shm)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                specs[name] = (shm.name, array.shape, array.dtype.str)
+
+            with multiprocessing.get_context("fork").Pool(
+                min(self.processes, len(tasks)),
+                initializer=_attach_worker,
+                initargs=(specs,),
+            ) as pool:
+                return pool.map(_run_task, [(func, task) for task in tasks])
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    def memoized_run(self, func, tasks, keys):
+        """
+        Like `run`, but returns memoized results for keys already in the cache
+        and stores the new ones.
+        """
+
+        tasks, keys = list(tasks), list(keys)
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        self.count(len(tasks) - len(missing), len(missing))
+
+        for i, result in zip(missing, self.run(func, [tasks[i] for i in missing])):
+            results[i] = result
+            self.cache.put(keys[i], result)
+        return results
+
+    def fold_scores(self, estimators):
+        """
+        Cross-validates estimators on the engine's folds.
+
+        Parameters:
+        - estimators (list): Unfitted estimators.
+
+        Returns:
+        - scores (ndarray): Negative MSE, one row per estimator and one column per fold.
+        """
+
+        n_jobs = 1 if self.parallel else None
+        tasks, keys = [], []
+        for estimator in estimators:
+            for fold in range(self.cv):
+                task_estimator = clone(estimator)
+                if n_jobs is not None and "n_jobs" in task_estimator.get_params():
+                    task_estimator.set_params(n_jobs=n_jobs)
+                tasks.append((task_estimator, fold))
+                keys.append(self.task_key("fit_score", estimator_config(estimator), fold))
+
+        scores = self.memoized_run(_fit_score, tasks, keys)
+        return np.array(scores).reshape(len(estimators), self.cv)
+
+    def fit(self, estimator, X=None, y=None):
+        """
+        Fits an estimator on all training rows, or returns the memoized fit.
+
+        Parameters:
+        - estimator (object): An unfitted estimator.
+        - X (DataFrame): The training features to fit on, e.g. to keep the
+          column names (default is the engine's matrix).
+        - y (Series): The matching labels (default is the engine's labels).
+
+        Returns:
+        - estimator (object): The fitted estimator.
+        """
+
+        key = self.task_key("fit", estimator_config(estimator))
+        fitted = self.cache.get(key)
+        if fitted is None:
+            self.count(0, 1)
+            fitted = clone(estimator).fit(
+                self.X if X is None else X, self.y if y is None else y
+            )
+            self.cache.put(key, fitted)
+        else:
+            self.count(1, 0)
+        return fitted
+
+    def grid_search(self, estimator, param_grid, X=None, y=None):
+        """
+        Exhaustive grid search with memoized fold scores, like `GridSearchCV`.
+
+        Parameters:
+        - estimator (object): The base estimator.
+        - param_grid (dict): Lists of values per parameter.
+        - X (DataFrame), y (Series): Passed to `fit` for the final refit.
+
+        Returns:
+        - result (dict): "best_params", "best_score" (negative MSE), "best_estimator"
+          (refitted on all training rows), "cv_results" and "seconds".
+        """
+
+        start = time.perf_counter()
+        candidates = list(ParameterGrid(param_grid))
+        scores = self.fold_scores(
+            [clone(estimator).set_params(**params) for params in candidates]
+        )
+        mean_scores = scores.mean(axis=1)
+        best = int(np.argmax(mean_scores))
+
+        return {
+            "best_params": candidates[best],
+            "best_score": mean_scores[best],
+            "best_estimator": self.fit(
+                clone(estimator).set_params(**candidates[best]), X, y
+            ),
+            "cv_results": {"params": candidates, "mean_test_score": mean_scores},
+            "seconds": time.perf_counter() - start,
+        }
@@ -0,0 +1,205 @@
+import itertools
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+
+from cv_engine import CVEngine, estimator_config
+
+
+def _subsample_score(data, task):
+    """
+    Scores a forest trained on a share of one fold's training rows.
+
+    The subsample only depends on the seed, fold and rung, so every candidate
+    of a rung is trained on the same rows and adding a candidate does not
+    change the others' subsamples.
+    """
+
+    params, fold, rung, fraction, random_state, n_jobs = task
+    train_idx = np.flatnonzero(data["fold_of"] != fold)
+    valid_idx = np.flatnonzero(data["fold_of"] == fold)
+    rng = np.random.default_rng([random_state, fold, rung])
+    size = max(int(len(train_idx) * fraction), 2)
+    subsample = rng.choice(train_idx, size=size, replace=False)
+
+    forest = RandomForestRegressor(**params, random_state=random_state, n_jobs=n_jobs)
+    forest.fit(data["X"][subsample], data["y"][subsample])
+    return -mean_squared_error(data["y"][valid_idx], forest.predict(data["X"][valid_idx]))
+
+
+def _grow_forest_scores(data, task):
+    """
+    Grows one warm-started forest on one fold through increasing tree counts
+    and scores it at each of them.
+
+    A warm-started forest grown to n trees has the same trees as a forest
+    fitted from scratch with n trees, so counts whose score is already known
+    can be skipped.
+    """
+
+    params, fold, n_estimators_list, random_state, n_jobs = task
+    train = data["fold_of"] != fold
+    valid = ~train
+    forest = RandomForestRegressor(
+        **params, warm_start=True, random_state=random_state, n_jobs=n_jobs
+    )
+
+    scores = []
+    for n_estimators in n_estimators_list:
+        forest.set_params(n_estimators=n_estimators)
+        # Only the trees beyond the previous n_estimators are grown
+        forest.fit(data["X"][train], data["y"][train])
+        scores.append(
+            -mean_squared_error(data["y"][valid], forest.predict(data["X"][valid]))
+        )
+    return scores
+
+
+def successive_halving_forest_search(
+    X,
+    y,
+    param_grid,
+    factor=3,
+    min_sample_fraction=1 / 9,
+    cv=5,
+    random_state=42,
+    n_jobs=-1,
+    engine=None,
+):
+    """
+    Searches random forest hyperparameters with successive halving.
+
+    The search has two phases:
+
+    1. Data halving. Every combination of the tree-shape parameters is scored
+       with the smallest `n_estimators` on a growing share of each training
+       fold (starting at `min_sample_fraction`, times `factor` per rung), and
+       only the best 1/`factor` survive each rung.
+    2. Tree growth. The survivors are scored on the full folds. Each fold keeps
+       one warm-started forest per survivor, and every larger `n_estimators`
+       value only grows the missing trees instead of rebuilding the forest.
+
+    Every score is memoized by the CV engine, and the full-fold scores share
+    their keys with `CVEngine.grid_search`, so reruns and the grid search reuse
+    each other's fits. The winner is refitted once on all of `X` (or taken from
+    the memo) and returned, so the caller does not need to train it again.
+
+    Parameters:
+    - X (DataFrame): Training features.
+    - y (Series): Training labels.
+    - param_grid (dict): The same grid as for `GridSearchCV`; it must contain
+      "n_estimators".
+    - factor (int): Share of candidates kept per rung is 1/factor (default is 3).
+    - min_sample_fraction (float): Share of each fold used in the first rung (default is 1/9).
+    - cv (int): Number of folds if no engine is given (default is 5).
+    - random_state (int): Seed of every forest and subsample (default is 42).
+    - n_jobs (int): Parallel jobs used to grow each forest outside the pool (default is -1).
+    - engine (CVEngine): The shared CV engine on `X` and `y` (default is a new one).
+
+    Returns:
+    - result (dict): "best_params", "best_score" (negative MSE), "best_estimator",
+      "history" (one row per evaluated configuration and rung) and "seconds".
+    """
+
+    start = time.perf_counter()
+    engine = engine if engine is not None else CVEngine(X, y, cv=cv)
+    task_n_jobs = 1 if engine.parallel else n_jobs
+
+    param_grid = dict(param_grid)
+    n_estimators_grid = sorted(param_grid.pop("n_estimators"))
+    names = sorted(param_grid)
+    candidates = [
+        dict(zip(names, values))
+        for values in itertools.product(*(param_grid[name] for name in names))
+    ]
+    history = []
+
+    # Phase 1: prune the tree-shape parameters on growing subsamples
+    fraction, rung = min_sample_fraction, 0
+    while len(candidates) > 1 and fraction < 1:
+        rung_params = [dict(c, n_estimators=n_estimators_grid[0]) for c in candidates]
+        tasks = [
+            (params, fold, rung, fraction, random_state, task_n_jobs)
+            for params in rung_params
+            for fold in range(engine.cv)
+        ]
+        keys = [
+            engine.task_key(
+                "halving", sorted(params.items()), fold, rung, fraction, random_state
+            )
+            for params, fold, *_ in tasks
+        ]
+        fold_scores = engine.memoized_run(_subsample_score, tasks, keys)
+        scores = np.array(fold_scores).reshape(len(candidates), engine.cv).mean(axis=1)
+        for params, score in zip(rung_params, scores):
+            history.append({**params, "sample_fraction": fraction, "score": score})
+
+        keep = max(1, len(candidates) // factor)
+        order = np.argsort(scores, kind="stable")[::-1][:keep]
+        candidates = [candidates[i] for i in order]
+        fraction *= factor
+        rung += 1
+
+    # Phase 2: grow the survivors' forests tree count by tree count. Scores
+    # use the same keys as a forest fitted from scratch in the grid search.
+    def key(params, n_estimators, fold):
+        forest = RandomForestRegressor(
+            **params, n_estimators=n_estimators, random_state=random_state
+        )
+        return engine.task_key("fit_score", estimator_config(forest), fold)
+
+    scores = {}
+    tasks = []
+    for c, params in enumerate(candidates):
+        for fold in range(engine.cv):
+            missing = []
+            for n_estimators in n_estimators_grid:
+                score = engine.cache.get(key(params, n_estimators, fold))
+                if score is None:
+                    missing.append(n_estimators)
+                else:
+                    scores[(c, fold, n_estimators)] = score
+            engine.count(len(n_estimators_grid) - len(missing), len(missing))
+            if missing:
+                tasks.append((params, fold, missing, random_state, task_n_jobs))
+
+    for (params, fold, missing, _, _), chain in zip(
+        tasks, engine.run(_grow_forest_scores, tasks)
+    ):
+        c = candidates.index(params)
+        for n_estimators, score in zip(missing, chain):
+            scores[(c, fold, n_estimators)] = score
+            engine.cache.put(key(params, n_estimators, fold), score)
+
+    best_score, best_params = -np.inf, None
+    for n_estimators in n_estimators_grid:
+        for c, params in enumerate(candidates):
+            score = np.mean([scores[(c, f, n_estimators)] for f in range(engine.cv)])
+            history.append(
+                {
+                    **params,
+                    "n_estimators": n_estimators,
+                    "sample_fraction": 1.0,
+                    "score": score,
+                }
+            )
+            if score > best_score:
+                best_score = score
+                best_params = dict(params, n_estimators=n_estimators)
+
+    # Refit the winner once on all training data
+    best_estimator = engine.fit(
+        RandomForestRegressor(**best_params, random_state=random_state, n_jobs=n_jobs),
+        X,
+        y,
+    )
+
+    return {
+        "best_params": best_params,
+        "best_score": best_score,
+        "best_estimator": best_estimator,
+        "history": history,
+        "seconds": time.perf_counter() - start,
+    }
@@ -1,44 +1,104 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import Lasso, LassoCV
 from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import train_test_split
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import load_artifact
+from cv_engine import CVEngine
+from figures import draw_barh, draw_lasso_path, render_figures
+from instrumentation import metrics
+from lasso_path_engine import lasso_path_cv
+from model_store import save_model
+from permutation_importance import permutation_importance
 
 
 # Read cleaned data csv and create X features and y label
-df = pd.read_csv("artifacts/cleaned_data.csv")
+with metrics.stage("load") as stage:
+    df = load_artifact("cleaned_data")
+    stage.add_rows(len(df))
 X = df.loc[:, df.columns != "popularity"]
 y = df["popularity"]
 
 # Train test split
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0)
 
-# Fit a lasso regression with 5 fold cross validation
-lasso_cv = LassoCV(alphas=[0.2, 0.4, 0.6, 0.8], cv=5)
-lasso_cv.fit(X_train, y_train)
+# Cross validate lasso over a dense alpha grid with 5 folds. Each fold computes
+# the whole regularization path once (warm starts, precomputed Gram matrix); the
+# shared CV engine memoizes the fold scores, so reruns skip the paths.
+engine = CVEngine(X_train, y_train, cv=5)
+with metrics.stage("cross_validation", rows=len(X_train)):
+    lasso_cv = lasso_path_cv(
+        X_train, y_train, alphas=np.linspace(0.2, 0.8, 61), engine=engine
+    )
+print(f"CV results: {engine.hits} memoized, {engine.misses} computed")
 
 # Obtain optimal alpha
-optimal_alpha = lasso_cv.alpha_
+optimal_alpha = lasso_cv["alpha"]
+print(f"Optimal alpha: {optimal_alpha:.3f}")
 
-# Fit a lasso regression on trainning data with optimal alpha value
-lasso = Lasso(alpha=optimal_alpha)
-lasso.fit(X_train, y_train)
+# Take the lasso at the optimal alpha from the path on the trainning data
+lasso = lasso_cv["model"]
 coef = lasso.coef_
 features = X.columns
 feature_importance = pd.DataFrame(
     {"Feature": features, "Coefficient": coef}
 ).sort_values(by="Coefficient", ascending=True)
 
-# Plot feature coefficients
-plt.figure(figsize=(10, 5))
-plt.barh(feature_importance["Feature"], feature_importance["Coefficient"])
-plt.xlabel("Coefficient")
-plt.ylabel("Feature")
-plt.title("Lasso Feature Selection")
-plt.savefig("images/lasso_feature_selection.png", bbox_inches="tight")
-plt.show()
-
 # Get mse on testing data
 y_pred = lasso.predict(X_test)
 mse = mean_squared_error(y_test, y_pred)
 print(f"Mean Squared Error (MSE): {mse:.4f}")
+
+# Coefficients depend on the scale of each feature; permutation importance
+# measures every feature by the testing MSE it is worth, like for the forest
+with metrics.stage("permutation_importance", rows=len(X_test)):
+    permutation = permutation_importance(lasso, X_test, y_test, n_repeats=30)
+permutation_table = permutation["table"].sort_values(by="Importance", ascending=True)
+
+# Plot the coefficients, their whole regularization path and the permutation
+# importances headlessly; figures whose data did not change are skipped
+render_figures(
+    [
+        (
+            "images/lasso_feature_selection.png",
+            draw_barh,
+            {
+                "labels": list(feature_importance["Feature"]),
+                "values": list(feature_importance["Coefficient"]),
+                "xlabel": "Coefficient",
+                "ylabel": "Feature",
+                "title": "Lasso Feature Selection",
+                "figsize": (10, 5),
+            },
+        ),
+        (
+            "images/lasso_regularization_path.png",
+            draw_lasso_path,
+            {
+                "features": list(features),
+                "alphas": lasso_cv["alphas"],
+                "coef_path": lasso_cv["coef_path"],
+                "optimal_alpha": optimal_alpha,
+            },
+        ),
+        (
+            "images/lasso_permutation_importance.png",
+            draw_barh,
+            {
+                "labels": list(permutation_table["Feature"]),
+                "values": list(permutation_table["Importance"]),
+                "errors": list(permutation_table["Std"]),
+                "xlabel": "Increase in testing MSE when permuted",
+                "ylabel": "Feature",
+                "title": "Lasso Permutation Importance",
+                "figsize": (10, 5),
+            },
+        ),
+    ]
+)
+
+# Save the model with the feature transform for scoring new tracks
+save_model(lasso, "lasso", metrics={"alpha": optimal_alpha, "test_mse": mse})
@@ -0,0 +1,140 @@
+import numpy as np
+from sklearn.linear_model import lasso_path
+
+from cv_engine import CVEngine
+
+
+class PathLasso:
+    """
+    A Lasso model read off a regularization path instead of being refitted.
+
+    Parameters:
+    - alpha (float): The regularization strength of this point of the path.
+    - coef (ndarray): The coefficients at `alpha`.
+    - intercept (float): The intercept at `alpha`.
+    """
+
+    def __init__(self, alpha, coef, intercept):
+        self.alpha = alpha
+        self.coef_ = np.asarray(coef)
+        self.intercept_ = float(intercept)
+
+    def predict(self, X):
+        return np.asarray(X, dtype="float64") @ self.coef_ + self.intercept_
+
+
+def _path(X, y, alphas):
+    """
+    Computes the Lasso coefficients for every alpha with one warm-started pass.
+
+    The data is centred so the intercept can be recovered afterwards, and the
+    Gram matrix X'X (features x features) is computed once and shared by all
+    alphas.
+
+    Returns:
+    - coefs (ndarray): Coefficients, one column per alpha.
+    - intercepts (ndarray): The matching intercepts.
+    """
+
+    X_mean = X.mean(axis=0)
+    y_mean = y.mean()
+    X_centered = X - X_mean
+    y_centered = y - y_mean
+
+    gram = X_centered.T @ X_centered
+    Xy = X_centered.T @ y_centered
+    _, coefs, _ = lasso_path(
+        X_centered, y_centered, alphas=alphas, precompute=gram, Xy=Xy
+    )
+
+    return coefs, y_mean - X_mean @ coefs
+
+
+def default_alphas(X, y, n_alphas=100, eps=1e-3):
+    """
+    Returns a descending geometric grid from the smallest alpha that zeroes
+    every coefficient down to `eps` times that value, like `LassoCV`.
+    """
+
+    X_centered = X - X.mean(axis=0)
+    alpha_max = np.abs(X_centered.T @ (y - y.mean())).max() / len(y)
+    return np.geomspace(alpha_max, alpha_max * eps, n_alphas)
+
+
+def _fold_path_mse(data, task):
+    """
+    Computes the path of one fold over `alphas` and scores it on the fold's validation rows.
+    """
+
+    fold, alphas = task
+    train = data["fold_of"] != fold
+    valid = ~train
+    coefs, intercepts = _path(data["X"][train], data["y"][train], alphas)
+    predictions = data["X"][valid] @ coefs + intercepts
+    return ((predictions - data["y"][valid, None]) ** 2).mean(axis=0)
+
+
+def lasso_path_cv(X, y, alphas=None, n_alphas=100, cv=5, engine=None):
+    """
+    Cross-validates Lasso over a whole regularization path.
+
+    Every fold computes the full path once, warm-starting each alpha from the
+    previous one and using a precomputed Gram matrix, and scores all alphas on
+    its validation rows. The folds run on the CV engine's pool, and the
+    validation MSEs of each fold are memoized as one entry mapping alpha to
+    MSE, so a rerun costs no path and new alphas only compute the path over
+    the new values. The path on all
+    training data gives the coefficients for every alpha, and the final model
+    is taken from it at the best alpha instead of being refitted.
+
+    Parameters:
+    - X (DataFrame): Training features.
+    - y (Series): Training labels.
+    - alphas (list): Alphas to evaluate (default is a grid of `n_alphas` values).
+    - n_alphas (int): Size of the default grid (default is 100).
+    - cv (int): Number of folds if no engine is given (default is 5).
+    - engine (CVEngine): The shared CV engine on `X` and `y` (default is a new one).
+
+    Returns:
+    - result (dict): "alphas" (descending), "mse_path" (alphas x folds),
+      "coef_path" (features x alphas), "alpha" (the best alpha) and "model"
+      (a `PathLasso` at that alpha).
+    """
+
+    engine = engine if engine is not None else CVEngine(X, y, cv=cv)
+    X = np.asarray(X, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    if alphas is None:
+        alphas = default_alphas(X, y, n_alphas)
+    alphas = np.sort(np.asarray(alphas, dtype="float64"))[::-1]
+
+    def key(fold):
+        return engine.task_key("lasso_path_mse", fold)
+
+    mse_path = np.full((len(alphas), engine.cv), np.nan)
+    fold_mse, tasks = {}, []
+    for fold in range(engine.cv):
+        fold_mse[fold] = engine.cache.get(key(fold), {})
+        for a, alpha in enumerate(alphas):
+            mse_path[a, fold] = fold_mse[fold].get(float(alpha), np.nan)
+        missing = np.isnan(mse_path[:, fold])
+        engine.count(int((~missing).sum()), int(missing.sum()))
+        if missing.any():
+            tasks.append((fold, alphas[missing]))
+
+    for (fold, fold_alphas), mse in zip(tasks, engine.run(_fold_path_mse, tasks)):
+        for alpha, value in zip(fold_alphas, mse):
+            mse_path[alphas == alpha, fold] = value
+            fold_mse[fold][float(alpha)] = float(value)
+        engine.cache.put(key(fold), fold_mse[fold])
+
+    best = int(np.argmin(mse_path.mean(axis=1)))
+    coef_path, intercepts = _path(X, y, alphas)
+
+    return {
+        "alphas": alphas,
+        "mse_path": mse_path,
+        "coef_path": coef_path,
+        "alpha": alphas[best],
+        "model": PathLasso(alphas[best], coef_path[:, best], intercepts[best]),
+    }
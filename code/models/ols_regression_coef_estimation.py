@@ -1,21 +1,109 @@
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import statsmodels.api as sm
-
-
-# Read cleaned data csv and create X features and y label
-df = pd.read_csv("artifacts/cleaned_data.csv")
-X = df.loc[:, df.columns != "popularity"]
-y = df["popularity"]
-
-# Fit a OLS regression for coef estimation and check p values for coefs
-model = sm.OLS(y, X)
-results = model.fit()
-print(results.summary())
-
-# plot the OLS regression summary
-summary_str = results.summary().as_text()
-fig, ax = plt.subplots(figsize=(10, 6))
-ax.axis("off")
-ax.text(0.01, 1, summary_str, fontsize=12, va="top", ha="left", family="monospace")
-plt.savefig("images/ols_regression_summary.png", bbox_inches="tight", dpi=300)
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import ARTIFACTS_DIR, iter_artifact_chunks, load_artifact
+from bootstrap import bootstrap_ols
+from feature_transform import TRANSFORM_PATH, FeatureTransform
+from figures import draw_text, render_figures
+from instrumentation import metrics
+from model_store import save_model
+from streaming_ols import OLSAccumulator, OLSModel, format_summary
+
+STATE_PATH = os.path.join(ARTIFACTS_DIR, "ols_state.npz")
+
+parser = argparse.ArgumentParser(
+    description="Estimate OLS coefficients from accumulated sufficient statistics."
+)
+parser.add_argument(
+    "--update",
+    metavar="CSV",
+    help="add the rows of a cleaned CSV to the saved statistics instead of rebuilding them",
+)
+parser.add_argument(
+    "--bootstrap",
+    type=int,
+    default=2000,
+    metavar="N",
+    help="resamples for the bootstrap confidence intervals of the coefficients (0 to skip)",
+)
+parser.add_argument(
+    "--compare-statsmodels",
+    action="store_true",
+    help="also fit statsmodels on the full data and print the largest coefficient difference",
+)
+args = parser.parse_args()
+
+# 1. Accumulate X'X, X'y and y'y over the cleaned data chunk by chunk, or add new rows.
+# The cleaned rows are scaled by the saved feature transform; statistics built
+# behind one transform only take new rows cleaned by the same one.
+fingerprint = FeatureTransform.load(TRANSFORM_PATH).fingerprint
+with metrics.stage("accumulate") as stage:
+    if args.update:
+        accumulator = OLSAccumulator.load(STATE_PATH)
+        if accumulator.transform_fingerprint != fingerprint:
+            raise Exception(
+                f"{STATE_PATH} was built behind another feature transform than "
+                f"{TRANSFORM_PATH}, so the rows of {args.update} are scaled "
+                "differently; rerun without --update to rebuild it"
+            )
+        chunks = pd.read_csv(args.update, chunksize=100_000)
+    else:
+        accumulator = None
+        chunks = iter_artifact_chunks("cleaned_data")
+    for chunk in chunks:
+        if accumulator is None:
+            accumulator = OLSAccumulator(
+                [c for c in chunk.columns if c != "popularity"], fingerprint
+            )
+        accumulator.update(chunk[accumulator.columns], chunk["popularity"])
+        stage.add_rows(len(chunk))
+    accumulator.save(STATE_PATH)
+
+# 2. Fit the OLS regression (no constant, as before) and check p values for coefs
+results = accumulator.fit()
+summary_str = format_summary(results, "popularity")
+print(summary_str)
+
+# Percentile bootstrap intervals need the rows, which an update does not read again
+if args.bootstrap and not args.update:
+    with metrics.stage("bootstrap") as stage:
+        df = load_artifact("cleaned_data")
+        intervals = bootstrap_ols(
+            df[accumulator.columns], df["popularity"], n_boot=args.bootstrap
+        )
+        stage.add_rows(len(df) * args.bootstrap)
+    print(f"95% bootstrap CI of the coefficients ({args.bootstrap} resamples):")
+    print(results["params"][["coef"]].join(intervals))
+
+if args.compare_statsmodels:
+    import statsmodels.api as sm
+
+    df = load_artifact("cleaned_data")
+    X = df[accumulator.columns].astype("float64")
+    y = df["popularity"].astype("float64")
+    reference = sm.OLS(y, X).fit()
+    print(
+        "Max |coef difference| vs statsmodels:",
+        (results["params"]["coef"] - reference.params).abs().max(),
+    )
+
+# 3. Save the fitted coefficients with the feature transform for scoring
+save_model(
+    OLSModel(results["params"]),
+    "ols",
+    metrics={"rsquared": results["rsquared"], "nobs": results["nobs"]},
+)
+
+# 4. plot the OLS regression summary; skipped if the summary has not changed
+render_figures(
+    [
+        (
+            "images/ols_regression_summary.png",
+            draw_text,
+            {"text": summary_str, "dpi": 300},
+        )
+    ]
+)
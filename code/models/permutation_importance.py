@@ -0,0 +1,194 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+# State of the current worker, set up by `_init_worker`
+_worker = {}
+
+
+def _init_worker(model, columns, specs, batch_repeats, parallel):
+    shms = [shared_memory.SharedMemory(name=spec[0]) for spec in specs] if parallel else []
+    if parallel:
+        X, y = (
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for shm, (_, shape, dtype) in zip(shms, specs)
+        )
+        # The pool parallelises over features; trees are predicted in one thread
+        if hasattr(model, "n_jobs"):
+            model.n_jobs = 1
+    else:
+        X, y = specs
+
+    # One buffer of `batch_repeats` stacked copies of X per worker. A task
+    # overwrites a single column with its permutations and restores it after,
+    # so no full copy of X is made per repeat.
+    _worker.update(
+        model=model,
+        columns=columns,
+        X=X,
+        y=y,
+        buffer=np.tile(X, (batch_repeats, 1)),
+        batch_repeats=batch_repeats,
+        shms=shms,
+    )
+
+
+def _predict(rows):
+    return _worker["model"].predict(
+        pd.DataFrame(rows, columns=_worker["columns"], copy=False)
+    )
+
+
+def _permuted_mse(task):
+    """
+    Returns the MSE of the model with feature `j` permuted, for each repeat.
+    """
+
+    j, repeats, random_state = task
+    X, y, buffer = _worker["X"], _worker["y"], _worker["buffer"]
+    n = len(y)
+
+    scores = []
+    for start in range(0, len(repeats), _worker["batch_repeats"]):
+        batch = repeats[start : start + _worker["batch_repeats"]]
+        for i, repeat in enumerate(batch):
+            # Seeded per (feature, repeat) so results do not depend on scheduling
+            rng = np.random.default_rng([random_state, j, repeat])
+            buffer[i * n : (i + 1) * n, j] = X[rng.permutation(n), j]
+
+        predictions = _predict(buffer[: len(batch) * n]).reshape(len(batch), n)
+        scores.extend(((predictions - y) ** 2).mean(axis=1))
+    buffer[:, j] = np.tile(X[:, j], _worker["batch_repeats"])
+    return scores
+
+
+def permutation_importance(
+    model, X, y, n_repeats=30, random_state=0, processes=None, max_batch_rows=200_000
+):
+    """
+    Computes permutation importances: how much the MSE grows when one feature
+    is shuffled.
+
+    The test matrix is copied once into shared memory and every worker reads
+    it in place. Each worker keeps one buffer of stacked copies of it and
+    predicts several repeats of a feature with a single `predict` call on that
+    buffer. Only the permuted column changes between calls. Features are
+    spread over a forked process pool; without fork they run in this process.
+
+    Parameters:
+    - model (object): A fitted model taking features in the columns of `X`,
+      e.g. the "model" of a saved bundle.
+    - X (DataFrame): Transformed test features.
+    - y (Series): Test labels.
+    - n_repeats (int): Permutations per feature (default is 30).
+    - random_state (int): Seed of the permutations (default is 0).
+    - processes (int): Worker processes (default is the number of CPUs).
+    - max_batch_rows (int): Maximum rows per `predict` call (default is 200,000).
+
+    Returns:
+    - result (dict): "baseline_mse", "importances" (features x repeats, the MSE
+      increase) and "table" (a DataFrame with Feature, Importance and Std).
+
+    Raises:
+    - ValueError: If there are no rows, no features or no repeats.
+    """
+
+    if len(y) == 0 or len(X.columns) == 0:
+        raise ValueError(
+            f"Permutation importance needs test rows and features, got {len(y)} rows "
+            f"and {len(X.columns)} features"
+        )
+    if n_repeats < 1:
+        raise ValueError(f"n_repeats must be at least 1, got {n_repeats}")
+
+    columns = list(X.columns)
+    X_values = np.ascontiguousarray(X, dtype="float64")
+    y_values = np.ascontiguousarray(y, dtype="float64")
+    processes = processes or os.cpu_count()
+    batch_repeats = max(1, min(n_repeats, max_batch_rows // len(y_values)))
+    tasks = [(j, list(range(n_repeats)), random_state) for j in range(len(columns))]
+
+    parallel = (
+        processes > 1
+        and len(columns) > 1
+        and "fork" in multiprocessing.get_all_start_methods()
+    )
+    if parallel:
+        blocks, specs = [], []
+        try:
+            for array in (X_values, y_values):
+                shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+                blocks.append(shm)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                specs.append((shm.name, array.shape, array.dtype.str))
+
+            with multiprocessing.get_context("fork").Pool(
+                min(processes, len(columns)),
+                initializer=_init_worker,
+                initargs=(model, columns, specs, batch_repeats, True),
+            ) as pool:
+                permuted = pool.map(_permuted_mse, tasks, chunksize=1)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+    else:
+        _init_worker(model, columns, (X_values, y_values), batch_repeats, False)
+        permuted = [_permuted_mse(task) for task in tasks]
+        _worker.clear()
+
+    baseline = float(((model.predict(X) - y_values) ** 2).mean())
+    importances = np.array(permuted) - baseline
+    table = pd.DataFrame(
+        {
+            "Feature": columns,
+            "Importance": importances.mean(axis=1),
+            "Std": importances.std(axis=1),
+        }
+    )
+
+    return {"baseline_mse": baseline, "importances": importances, "table": table}
+
+
+if __name__ == "__main__":
+    from sklearn.model_selection import train_test_split
+
+    from artifact_store import load_artifact
+    from model_store import load_model
+
+    parser = argparse.ArgumentParser(
+        description="Permutation importance of a saved model on the test split of cleaned_data."
+    )
+    parser.add_argument(
+        "--model", choices=["lasso", "random_forest", "ols"], default="random_forest"
+    )
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    # The same test split as the training scripts
+    df = load_artifact("cleaned_data")
+    X = df.loc[:, df.columns != "popularity"]
+    y = df["popularity"]
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=0)
+
+    bundle = load_model(args.model)
+    start = time.perf_counter()
+    result = permutation_importance(
+        bundle["model"],
+        X_test[bundle["features"]],
+        y_test,
+        n_repeats=args.repeats,
+        processes=args.processes,
+    )
+    print(f"Baseline test MSE: {result['baseline_mse']:.4f}")
+    print(result["table"].sort_values("Importance", ascending=False).to_string(index=False))
+    print(f"{args.repeats} repeats in {time.perf_counter() - start:.1f} s")
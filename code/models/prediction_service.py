@@ -0,0 +1,250 @@
+import argparse
+import collections
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from model_store import load_model, predict_tracks
+
+
+class MicroBatcher:
+    """
+    Groups concurrent prediction requests into vectorised `predict` calls.
+
+    Request threads `submit` their tracks and wait. A single worker thread
+    takes the first waiting request, keeps collecting requests until
+    `max_wait_ms` has passed or `max_batch_size` tracks are queued, then scores
+    them all with one `predict_tracks` call and hands each request its slice.
+    Requests that queued up while the previous batch was scored always join
+    the next one. A lone request therefore waits at most `max_wait_ms` longer,
+    while a burst of requests costs one model call instead of one per request.
+    If the batch call fails, every request is scored again on its own, so
+    only the requests that fail by themselves get the error.
+
+    Parameters:
+    - bundle (dict): A saved model bundle from `load_model`.
+    - max_wait_ms (float): How long the first request of a batch waits for others (default is 5).
+    - max_batch_size (int): Tracks that close a batch early (default is 256).
+    - history (int): Recent requests and batches kept for the metrics (default is 10,000).
+    """
+
+    def __init__(self, bundle, max_wait_ms=5.0, max_batch_size=256, history=10_000):
+        self.bundle = bundle
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.latencies = collections.deque(maxlen=history)
+        self.batch_sizes = collections.deque(maxlen=history)
+        self.requests = 0
+        self.tracks = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, tracks):
+        """
+        Queues tracks for scoring.
+
+        Parameters:
+        - tracks (DataFrame): Raw tracks with the model's feature columns.
+
+        Returns:
+        - future (Future): Resolves to an ndarray with one prediction per track.
+        """
+
+        future = Future()
+        self._queue.put((tracks, future, time.perf_counter()))
+        return future
+
+    def predict(self, tracks):
+        return self.submit(tracks).result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                # Requests already waiting join the batch even once the window is over
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        try:
+            predictions = predict_tracks(
+                self.bundle, pd.concat([tracks for tracks, _, _ in batch], ignore_index=True)
+            )
+        except Exception as error:
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+                return
+            for item in batch:
+                self._score([item])
+            return
+
+        done = time.perf_counter()
+        start = 0
+        with self._lock:
+            self.batch_sizes.append(len(predictions))
+            for tracks, future, submitted in batch:
+                future.set_result(predictions[start : start + len(tracks)])
+                start += len(tracks)
+                self.latencies.append(done - submitted)
+                self.requests += 1
+                self.tracks += len(tracks)
+
+    def metrics(self):
+        """
+        Returns the request latency and batch size statistics.
+
+        Returns:
+        - metrics (dict): Request and track counts, p50/p99/max latency in
+          milliseconds and the mean/p50/p99/max batch size over the recent history.
+        """
+
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            metrics = {"requests": self.requests, "tracks": self.tracks, "batches": len(batch_sizes)}
+
+        if len(latencies):
+            metrics["latency_ms"] = {
+                "p50": float(np.percentile(latencies, 50)),
+                "p99": float(np.percentile(latencies, 99)),
+                "max": float(latencies.max()),
+            }
+            metrics["batch_size"] = {
+                "mean": float(batch_sizes.mean()),
+                "p50": float(np.percentile(batch_sizes, 50)),
+                "p99": float(np.percentile(batch_sizes, 99)),
+                "max": int(batch_sizes.max()),
+            }
+        return metrics
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections when many clients connect at once
+    request_queue_size = 128
+
+
+def make_handler(batcher, model_name):
+    """
+    Builds the request handler of the service.
+
+    Endpoints:
+    - POST /predict: a JSON track object or list of track objects with the
+      audio feature columns; answers {"predictions": [...]}.
+    - GET /metrics: the `MicroBatcher.metrics` as JSON.
+    - GET /health: the model name and its saved metrics.
+    """
+
+    features = batcher.bundle["features"]
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send_json(200, batcher.metrics())
+            elif self.path == "/health":
+                self._send_json(
+                    200,
+                    {"model": model_name, "metrics": batcher.bundle["metrics"]},
+                )
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                tracks = pd.DataFrame([payload] if isinstance(payload, dict) else payload)
+                missing = [feature for feature in features if feature not in tracks]
+                if missing or tracks.empty:
+                    raise ValueError(f"Tracks need the features {features}; missing {missing}")
+                tracks = tracks[features].astype("float64")
+                if np.isinf(tracks.to_numpy()).any():
+                    raise ValueError("Feature values must be finite; send null for a missing value")
+            except (ValueError, TypeError) as error:
+                self._send_json(400, {"error": str(error)})
+                return
+
+            try:
+                predictions = batcher.predict(tracks)
+            except Exception as error:
+                self._send_json(500, {"error": f"Prediction failed: {error}"})
+                return
+            self._send_json(
+                200,
+                {"predictions": [None if np.isnan(p) else float(p) for p in predictions]},
+            )
+
+        def log_message(self, format, *args):
+            pass  # One line per request would dominate the latency under load
+
+    return PredictionHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve popularity predictions of a saved model over HTTP."
+    )
+    parser.add_argument(
+        "--model", choices=["lasso", "random_forest", "ols"], default="random_forest"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="how long a request waits for others to share its batch",
+    )
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    # Load the model and its transform once; the forest predicts single batches,
+    # where starting a thread pool per call costs more than it saves.
+    bundle = load_model(args.model)
+    if hasattr(bundle["model"], "n_jobs"):
+        bundle["model"].n_jobs = 1
+    batcher = MicroBatcher(bundle, args.max_wait_ms, args.max_batch_size)
+
+    server = PredictionServer((args.host, args.port), make_handler(batcher, args.model))
+    print(f"Serving {args.model} on http://{args.host}:{args.port} (POST /predict, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,151 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from artifact_store import ARTIFACTS_DIR
+from feature_transform import INPUT_FEATURES
+from model_store import load_model, predict_tracks
+
+# The bundle of the current worker, loaded once by `_init_worker`
+_bundle = None
+
+
+def iter_track_chunks(path, columns, chunksize):
+    """
+    Reads a CSV or Parquet track file chunk by chunk.
+
+    Parameters:
+    - path (str): The track file.
+    - columns (list): Columns to read; columns absent from the file are skipped.
+    - chunksize (int): Maximum rows per chunk.
+
+    Yields:
+    - chunk (DataFrame): The requested columns of one chunk.
+    """
+
+    if path.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(path)
+        available = set(parquet_file.schema_arrow.names)
+        columns = [column for column in columns if column in available]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        wanted = set(columns)
+        yield from pd.read_csv(
+            path, usecols=lambda column: column in wanted, chunksize=chunksize
+        )
+
+
+def _init_worker(model_name):
+    global _bundle
+    _bundle = load_model(model_name)
+    # Parallelism comes from the worker processes; a forest predicting with
+    # all cores in every worker would oversubscribe the machine.
+    model = _bundle["model"]
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+
+
+def _score_chunk(chunk, id_column):
+    scored = pd.DataFrame(index=chunk.index)
+    if id_column in chunk:
+        scored[id_column] = chunk[id_column]
+    scored["predicted_popularity"] = predict_tracks(_bundle, chunk)
+    return scored
+
+
+def score_tracks(
+    input_path,
+    output_path,
+    model_name="random_forest",
+    id_column="id",
+    chunksize=50_000,
+    processes=None,
+):
+    """
+    Scores a track file of any size with a saved model.
+
+    Chunks are read lazily and scored on a process pool. At most two chunks per
+    worker are in flight, so memory stays bounded by the chunk size instead of
+    the file size. Predictions are appended to the output in input order as
+    soon as their chunk is done. The output is written to a temporary file and
+    renamed at the end, so an interrupted run leaves no partial file.
+
+    Parameters:
+    - input_path (str): Raw tracks as CSV or Parquet with the `INPUT_FEATURES` columns.
+    - output_path (str): The CSV file to write the predictions to.
+    - model_name (str): The saved model, "lasso", "random_forest" or "ols" (default is "random_forest").
+    - id_column (str): Column copied next to each prediction if present (default is "id").
+    - chunksize (int): Rows per chunk (default is 50,000).
+    - processes (int): Worker processes (default is the number of CPUs).
+
+    Returns:
+    - rows (int): The number of rows scored.
+    """
+
+    processes = processes or os.cpu_count()
+    chunks = iter_track_chunks(input_path, [id_column] + INPUT_FEATURES, chunksize)
+
+    tmp_path = output_path + ".tmp"
+    rows = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as file, multiprocessing.Pool(
+        processes, initializer=_init_worker, initargs=(model_name,)
+    ) as pool:
+        pending = collections.deque()
+
+        def write_oldest():
+            nonlocal rows
+            scored = pending.popleft().get()
+            scored.to_csv(file, header=rows == 0, index=False)
+            rows += len(scored)
+
+        for chunk in chunks:
+            pending.append(pool.apply_async(_score_chunk, (chunk, id_column)))
+            if len(pending) >= 2 * processes:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Predict the popularity of raw tracks with a saved model."
+    )
+    parser.add_argument("input", help="CSV or Parquet file of raw tracks")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(ARTIFACTS_DIR, "predictions.csv"),
+        help="CSV file for the predictions (default: artifacts/predictions.csv)",
+    )
+    parser.add_argument(
+        "--model", choices=["lasso", "random_forest", "ols"], default="random_forest"
+    )
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = score_tracks(
+        args.input,
+        args.output,
+        model_name=args.model,
+        id_column=args.id_column,
+        chunksize=args.chunksize,
+        processes=args.processes,
+    )
+    seconds = time.perf_counter() - start
+    print(
+        f"Scored {rows} tracks with {args.model} in {seconds:.1f} s "
+        f"({rows / seconds:,.0f} tracks/s) -> {args.output}"
+    )
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+class OLSAccumulator:
+    """
+    Sufficient statistics of an OLS regression, accumulated chunk by chunk.
+
+    Only X'X, X'y, y'y, the column sums and the row count are kept, so a fit
+    costs O(p^2) memory whatever the number of rows. Accumulators built on
+    different files or processes can be merged, saved and loaded, and adding
+    new rows only costs time proportional to those rows. `fit` gives the
+    same coefficients, standard errors, t statistics and p-values as
+    `sm.OLS(y, X).fit()` on all rows.
+
+    Parameters:
+    - columns (list): The feature names, in coefficient order.
+    - transform_fingerprint (str): Fingerprint of the feature transform the
+      rows were cleaned with, if any (default is None). Statistics of rows
+      scaled by different transforms are never merged.
+    """
+
+    def __init__(self, columns, transform_fingerprint=None):
+        self.columns = list(columns)
+        self.transform_fingerprint = transform_fingerprint
+        p = len(self.columns)
+        self.xtx = np.zeros((p, p))
+        self.xty = np.zeros(p)
+        self.x_sum = np.zeros(p)
+        self.yty = 0.0
+        self.y_sum = 0.0
+        self.n = 0
+
+    def update(self, X, y):
+        """
+        Adds a chunk of rows.
+
+        Parameters:
+        - X (DataFrame or ndarray): Features of the chunk, in `columns` order.
+        - y (Series or ndarray): Labels of the chunk.
+
+        Returns:
+        - self (OLSAccumulator): The updated accumulator.
+        """
+
+        if isinstance(X, pd.DataFrame):
+            X = X[self.columns]
+        X = np.asarray(X, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.x_sum += X.sum(axis=0)
+        self.yty += y @ y
+        self.y_sum += y.sum()
+        self.n += len(y)
+        return self
+
+    def merge(self, other):
+        """
+        Adds the statistics of another accumulator over the same columns.
+        """
+
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge accumulators over different columns")
+        if other.transform_fingerprint != self.transform_fingerprint:
+            raise ValueError(
+                "Cannot merge accumulators built behind different feature transforms"
+            )
+
+        self.xtx += other.xtx
+        self.xty += other.xty
+        self.x_sum += other.x_sum
+        self.yty += other.yty
+        self.y_sum += other.y_sum
+        self.n += other.n
+        return self
+
+    def save(self, path):
+        np.savez(
+            path,
+            columns=np.array(self.columns),
+            xtx=self.xtx,
+            xty=self.xty,
+            x_sum=self.x_sum,
+            scalars=np.array([self.yty, self.y_sum, self.n]),
+            transform_fingerprint=self.transform_fingerprint or "",
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            accumulator = cls(data["columns"].tolist())
+            accumulator.xtx = data["xtx"]
+            accumulator.xty = data["xty"]
+            accumulator.x_sum = data["x_sum"]
+            accumulator.yty, accumulator.y_sum, n = data["scalars"]
+            accumulator.n = int(n)
+            if "transform_fingerprint" in data:
+                accumulator.transform_fingerprint = (
+                    str(data["transform_fingerprint"]) or None
+                )
+        return accumulator
+
+    def fit(self):
+        """
+        Solves the normal equations and computes the inference statistics.
+
+        R-squared is centered if the features contain a constant column and
+        uncentered otherwise, as in statsmodels.
+
+        Returns:
+        - result (dict): "params" (a DataFrame with coef, std err, t, P>|t| and
+          the 95% confidence interval), "nobs", "df_resid", "ssr", "rsquared"
+          and "centered".
+        """
+
+        n = self.n
+        xtx_inv = np.linalg.pinv(self.xtx)
+        coef = xtx_inv @ self.xty
+
+        rank = np.linalg.matrix_rank(self.xtx)
+        df_resid = n - rank
+        ssr = max(self.yty - coef @ self.xty, 0.0)
+        scale = ssr / df_resid
+
+        std_err = np.sqrt(np.maximum(np.diag(xtx_inv) * scale, 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_values = coef / std_err
+        p_values = 2 * stats.t.sf(np.abs(t_values), df_resid)
+        margin = stats.t.ppf(0.975, df_resid) * std_err
+
+        # A non-zero column with zero variance is a constant, as in statsmodels
+        spread = n * np.diag(self.xtx) - self.x_sum**2
+        constant = (self.x_sum != 0) & np.isclose(spread, 0.0, atol=1e-9 * n * n)
+        centered = bool(constant.any())
+        tss = self.yty - self.y_sum**2 / n if centered else self.yty
+
+        params = pd.DataFrame(
+            {
+                "coef": coef,
+                "std err": std_err,
+                "t": t_values,
+                "P>|t|": p_values,
+                "[0.025": coef - margin,
+                "0.975]": coef + margin,
+            },
+            index=self.columns,
+        )
+
+        return {
+            "params": params,
+            "nobs": n,
+            "df_resid": df_resid,
+            "ssr": ssr,
+            "rsquared": 1 - ssr / tss,
+            "centered": centered,
+        }
+
+
+class OLSModel:
+    """
+    The coefficients of a fitted OLS regression, for prediction.
+
+    Parameters:
+    - params (DataFrame): The "params" table returned by `OLSAccumulator.fit`.
+    """
+
+    def __init__(self, params):
+        self.feature_names_in_ = list(params.index)
+        self.coef_ = params["coef"].to_numpy(dtype="float64")
+
+    def predict(self, X):
+        return np.asarray(X, dtype="float64") @ self.coef_
+
+
+def format_summary(result, dep_variable):
+    """
+    Formats a fit result as a plain-text table in the style of the statsmodels summary.
+    """
+
+    r2_label = "R-squared:" if result["centered"] else "R-squared (uncentered):"
+    header = [
+        "OLS Regression Results (accumulated sufficient statistics)",
+        "=" * 78,
+        f"Dep. Variable: {dep_variable:>20}    {r2_label:<24}{result['rsquared']:>10.3f}",
+        f"No. Observations: {result['nobs']:>17}    Df Residuals: {result['df_resid']:>22}",
+        "=" * 78,
+    ]
+    table = result["params"].to_string(float_format=lambda value: f"{value:.4f}")
+    return "\n".join(header + [table, "=" * 78])
@@ -0,0 +1,364 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+UTILS_DIR = os.path.join(REPO_ROOT, "code", "utils")
+STATE_PATH = os.path.join(REPO_ROOT, "artifacts", "pipeline_state.json")
+LOGS_DIR = os.path.join(REPO_ROOT, "artifacts", "logs")
+
+# Every stage is one of the project's scripts, run from the repository root.
+# Inputs and outputs are paths relative to the root; a stage depends on the
+# stages producing its inputs. The scripts' own caches (cv_cache, figure
+# hashes, OLS state) are not listed: they never change the results.
+STAGES = {
+    "fetch": {
+        "script": "code/data/get_spotify_data.py",
+        "inputs": [],
+        "outputs": ["artifacts/spotify_data.csv"],
+    },
+    "clean": {
+        "script": "code/cleaning/data_cleaning.py",
+        "inputs": ["artifacts/spotify_data.csv"],
+        "outputs": ["artifacts/cleaned_data.csv", "artifacts/feature_transform.joblib"],
+    },
+    "distribution": {
+        "script": "code/correlation/distribution.py",
+        "inputs": ["artifacts/spotify_data.csv"],
+        "outputs": ["images/variable_distributions.png"],
+    },
+    "pearson": {
+        "script": "code/correlation/pearson_correlation.py",
+        "inputs": ["artifacts/spotify_data.csv"],
+        "outputs": ["images/pearson correlation.png"],
+    },
+    "spearman": {
+        "script": "code/correlation/spearman_correlation.py",
+        "inputs": ["artifacts/spotify_data.csv"],
+        "outputs": ["images/spearman_correlation.png"],
+    },
+    "lasso": {
+        "script": "code/models/lasso_feature_selection.py",
+        "inputs": ["artifacts/cleaned_data.csv", "artifacts/feature_transform.joblib"],
+        "outputs": [
+            "images/lasso_feature_selection.png",
+            "images/lasso_regularization_path.png",
+            "images/lasso_permutation_importance.png",
+            "artifacts/models/lasso.joblib",
+        ],
+    },
+    "random_forest": {
+        "script": "code/models/random_forest_feature_importance.py",
+        "inputs": ["artifacts/cleaned_data.csv", "artifacts/feature_transform.joblib"],
+        "outputs": [
+            "images/random_forest_feature_importance.png",
+            "images/random_forest_permutation_importance.png",
+            "artifacts/models/random_forest.joblib",
+        ],
+    },
+    "ols": {
+        "script": "code/models/ols_regression_coef_estimation.py",
+        "inputs": ["artifacts/cleaned_data.csv", "artifacts/feature_transform.joblib"],
+        "outputs": ["images/ols_regression_summary.png", "artifacts/models/ols.joblib"],
+    },
+    "top_cohorts": {
+        "script": "code/case/top_10_per_analysis.py",
+        "inputs": ["artifacts/cleaned_data.csv"],
+        "outputs": [
+            "images/avg_audio_features_comparison_top_10per.png",
+            "images/avg_audio_features_comparison_top_cohorts.png",
+        ],
+    },
+    "time_trends": {
+        "script": "code/case/time_based_analysisa_after_1980s.py",
+        "inputs": ["artifacts/spotify_data.csv", "artifacts/feature_transform.joblib"],
+        "outputs": ["images/time_based_analysis.png"],
+    },
+}
+
+
+def dependencies(stages):
+    """
+    Returns the stages each stage depends on, i.e. those producing its inputs.
+    """
+
+    producers = {output: name for name, stage in stages.items() for output in stage["outputs"]}
+    return {
+        name: sorted({producers[path] for path in stage["inputs"] if path in producers} - {name})
+        for name, stage in stages.items()
+    }
+
+
+def local_modules(script):
+    """
+    Returns the script and the project modules it imports, recursively.
+
+    Imports are resolved like the scripts do: next to the importing file,
+    next to the script, then in code/utils. Third-party modules are ignored.
+
+    Parameters:
+    - script (str): Absolute path of the script.
+
+    Returns:
+    - paths (list): Sorted absolute paths of the script and its local modules.
+    """
+
+    search_dirs = [os.path.dirname(script), UTILS_DIR]
+    found, todo = set(), [script]
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path, encoding="utf-8") as file:
+            tree = ast.parse(file.read(), path)
+
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.add(node.module.split(".")[0])
+        for name in names:
+            for directory in [os.path.dirname(path)] + search_dirs:
+                candidate = os.path.join(directory, f"{name}.py")
+                if os.path.exists(candidate):
+                    todo.append(candidate)
+                    break
+    return sorted(found)
+
+
+class FileHasher:
+    """
+    SHA-256 of files, recomputed only for files whose size or modification
+    time changed since they were last hashed.
+
+    Parameters:
+    - known (dict): Path -> [size, mtime_ns, digest] from an earlier run.
+    """
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def __call__(self, path):
+        if not os.path.exists(path):
+            return None
+
+        stat = os.stat(path)
+        key = os.path.relpath(path, REPO_ROOT)
+        cached = self.known.get(key)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        self.known[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return self.known[key][2]
+
+
+def stage_fingerprint(stage, hasher):
+    """
+    Returns the hash of a stage's code and input contents.
+    """
+
+    script = os.path.join(REPO_ROOT, stage["script"])
+    paths = local_modules(script) + [os.path.join(REPO_ROOT, path) for path in stage["inputs"]]
+    parts = [[os.path.relpath(path, REPO_ROOT), hasher(path)] for path in paths]
+    payload = json.dumps(parts)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def output_hashes(stage, hasher):
+    return {path: hasher(os.path.join(REPO_ROOT, path)) for path in stage["outputs"]}
+
+
+def is_up_to_date(stage, record, fingerprint, hasher):
+    """
+    A stage is up to date when its fingerprint matches the last successful run
+    and its outputs are still there, unchanged.
+    """
+
+    if not record or record.get("fingerprint") != fingerprint:
+        return False
+    outputs = output_hashes(stage, hasher)
+    return None not in outputs.values() and outputs == record.get("outputs")
+
+
+def run_stage(name, stage):
+    """
+    Runs a stage's script in its own process, logging its output to
+    artifacts/logs/<name>.log.
+
+    Returns:
+    - returncode (int): The script's exit code.
+    - seconds (float): Wall time of the run.
+    """
+
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    env = dict(os.environ, MPLBACKEND="Agg")  # Figures are written, never shown
+    start = time.perf_counter()
+    with open(os.path.join(LOGS_DIR, f"{name}.log"), "w", encoding="utf-8") as log:
+        process = subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, stage["script"])],
+            cwd=REPO_ROOT,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    return process.returncode, time.perf_counter() - start
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(targets=None, jobs=None, force=False, fetch=False, dry_run=False):
+    """
+    Runs the pipeline stages in dependency order, skipping the up-to-date ones.
+
+    A stage becomes ready once the stages it depends on are finished. Its
+    fingerprint (the content hashes of its script, the project modules the
+    script imports and its inputs) is then compared with the last successful
+    run. Up-to-date stages are skipped; the others run as separate processes,
+    up to `jobs` at a time, so independent stages such as the three models
+    run in parallel. A stage whose upstream output did not change is skipped
+    even if the upstream stage ran.
+
+    The fetch stage calls the Spotify API, so it only runs with `fetch=True`
+    or when artifacts/spotify_data.csv is missing. Its inputs are the API's
+    current answers, which no hash covers, so with `fetch=True` it always runs.
+
+    In a dry run, a stage downstream of one that would run is reported as
+    "would run" too, since its inputs are not produced yet.
+
+    Parameters:
+    - targets (list): Stages to bring up to date, with their upstream stages
+      (default is every stage).
+    - jobs (int): Stages running at the same time (default is the number of CPUs).
+    - force (bool): Run the stages even if up to date (default is False).
+    - fetch (bool): Fetch new tracks from Spotify first (default is False).
+    - dry_run (bool): Only report what would run (default is False).
+
+    Returns:
+    - report (list): Per stage a dict with "stage", "status" ("ran", "skipped",
+      "failed", "blocked" or "would run") and "seconds".
+    """
+
+    depends_on = dependencies(STAGES)
+    selected, todo = set(), list(targets or STAGES)
+    while todo:
+        name = todo.pop()
+        if name not in STAGES:
+            raise Exception(f"Unknown stage {name}; stages are {', '.join(STAGES)}")
+        if name not in selected:
+            selected.add(name)
+            todo.extend(depends_on[name])
+    if not fetch and os.path.exists(os.path.join(REPO_ROOT, STAGES["fetch"]["outputs"][0])):
+        selected.discard("fetch")
+    depends_on = {name: [d for d in depends_on[name] if d in selected] for name in selected}
+
+    state = load_state()
+    hasher = FileHasher(state.get("files"))
+    results, pending, running = {}, set(selected), {}
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        while pending or running:
+            for name in sorted(pending):
+                if any(d not in results for d in depends_on[name]):
+                    continue
+                pending.discard(name)
+                stage = STAGES[name]
+                if any(results[d]["status"] in ("failed", "blocked") for d in depends_on[name]):
+                    results[name] = {"stage": name, "status": "blocked", "seconds": 0.0}
+                    continue
+
+                fingerprint = stage_fingerprint(stage, hasher)
+                record = state["stages"].get(name)
+                upstream_would_run = any(
+                    results[d]["status"] == "would run" for d in depends_on[name]
+                )
+                if (
+                    not force
+                    and not (fetch and name == "fetch")
+                    and not upstream_would_run
+                    and is_up_to_date(stage, record, fingerprint, hasher)
+                ):
+                    results[name] = {"stage": name, "status": "skipped", "seconds": 0.0}
+                elif dry_run:
+                    results[name] = {"stage": name, "status": "would run", "seconds": 0.0}
+                else:
+                    print(f"Running {name}: {stage['script']}", flush=True)
+                    running[executor.submit(run_stage, name, stage)] = (name, fingerprint)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, fingerprint = running.pop(future)
+                returncode, seconds = future.result()
+                status = "ran" if returncode == 0 else "failed"
+                results[name] = {"stage": name, "status": status, "seconds": seconds}
+                if returncode == 0:
+                    state["stages"][name] = {
+                        "fingerprint": fingerprint,
+                        "outputs": output_hashes(STAGES[name], hasher),
+                        "seconds": seconds,
+                    }
+                else:
+                    print(f"Stage {name} failed, see artifacts/logs/{name}.log", flush=True)
+
+    if not dry_run:
+        state["files"] = hasher.known
+        save_state(state)
+    return [results[name] for name in STAGES if name in results]
+
+
+def print_report(report, seconds):
+    """
+    Prints the status and wall time of every stage.
+    """
+
+    width = max(len(row["stage"]) for row in report) if report else 5
+    print(f"\n{'Stage':<{width}}  {'Status':<9}  {'Seconds':>8}")
+    for row in report:
+        print(f"{row['stage']:<{width}}  {row['status']:<9}  {row['seconds']:>8.1f}")
+    stage_seconds = sum(row["seconds"] for row in report)
+    print(f"Total: {seconds:.1f} s wall time, {stage_seconds:.1f} s in stages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the analysis pipeline, skipping stages whose inputs did not change."
+    )
+    parser.add_argument(
+        "stages", nargs="*", help=f"Stages to run with their upstream stages ({', '.join(STAGES)})"
+    )
+    parser.add_argument("--jobs", type=int, default=None, help="Stages running at the same time")
+    parser.add_argument("--force", action="store_true", help="Run the stages even if up to date")
+    parser.add_argument("--fetch", action="store_true", help="Fetch new tracks from Spotify first")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = run_pipeline(args.stages, args.jobs, args.force, args.fetch, args.dry_run)
+    print_report(report, time.perf_counter() - start)
+    if any(row["status"] in ("failed", "blocked") for row in report):
+        sys.exit(1)
@@ -0,0 +1,248 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# SPOTIFY_ARTIFACTS_DIR points every script at another data directory, e.g.
+# a synthetic dataset for benchmarks
+ARTIFACTS_DIR = os.path.abspath(
+    os.environ.get("SPOTIFY_ARTIFACTS_DIR")
+    or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "artifacts")
+)
+
+AUDIO_FEATURES = [
+    "danceability",
+    "energy",
+    "loudness",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "duration_ms",
+]
+
+# Explicit column types of every artifact. Text columns are only read when a
+# script asks for them; audio features are stored as float32 and the small
+# categorical codes as int8. Date columns are parsed once when the columnar
+# copy is built.
+SCHEMAS = {
+    "spotify_data": {
+        "id": "string",
+        "name": "string",
+        "release date": "datetime",
+        "artists": "string",
+        "popularity": "int8",
+        "preview url": "string",
+        **{feature: "float32" for feature in AUDIO_FEATURES},
+        "key": "int8",
+        "mode": "int8",
+        "time_signature": "int8",
+        "type": "string",
+        "uri": "string",
+        "track_href": "string",
+        "analysis_url": "string",
+    },
+    "cleaned_data": {
+        "duration_ms": "float32",
+        "speechiness": "float32",
+        "acousticness": "float32",
+        "instrumentalness": "float32",
+        "danceability": "float32",
+        "liveness": "float32",
+        "tempo": "float32",
+        "loudness": "float32",
+        "key": "float32",
+        "mode": "int8",
+        "popularity": "int8",
+    },
+}
+
+
+def artifact_path(name, extension):
+    """
+    Returns the path of an artifact file, e.g. artifacts/spotify_data.parquet.
+    """
+
+    return os.path.join(ARTIFACTS_DIR, f"{name}.{extension}")
+
+
+def apply_schema(df, name):
+    """
+    Casts the columns of a DataFrame to the types declared for an artifact.
+
+    Parameters:
+    - df (DataFrame): Data read from the artifact, possibly a subset of its columns.
+    - name (str): The artifact name, a key of `SCHEMAS`.
+
+    Returns:
+    - df (DataFrame): The same data with typed columns.
+    """
+
+    schema = SCHEMAS[name]
+    for column in df.columns:
+        dtype = schema.get(column)
+        if dtype == "datetime":
+            df[column] = pd.to_datetime(df[column], format="ISO8601", errors="coerce")
+        elif dtype is not None:
+            if dtype.startswith("int") and df[column].isna().any():
+                dtype = dtype.capitalize()  # nullable integer
+            df[column] = df[column].astype(dtype)
+
+    return df
+
+
+def convert_artifact(name):
+    """
+    Builds the typed Parquet copy of a CSV artifact.
+
+    Parameters:
+    - name (str): The artifact name, a key of `SCHEMAS`.
+
+    Returns:
+    - parquet_path (str): Path of the written Parquet file.
+    """
+
+    parquet_path = artifact_path(name, "parquet")
+    df = apply_schema(pd.read_csv(artifact_path(name, "csv")), name)
+    # Written aside and moved into place so that scripts running at the same
+    # time never read a half-written copy. Row groups of 100,000 rows let
+    # `iter_artifact_chunks` skip to any row without reading the ones before.
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False, row_group_size=100_000)
+    os.replace(tmp_path, parquet_path)
+
+    return parquet_path
+
+
+def _parquet_is_fresh(name):
+    parquet_path = artifact_path(name, "parquet")
+    csv_path = artifact_path(name, "csv")
+    if not os.path.exists(parquet_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def load_artifact(name, columns=None):
+    """
+    Loads an artifact, reading only the requested columns.
+
+    The CSV file stays the source of truth. A typed Parquet copy is built the
+    first time the artifact is loaded and again whenever the CSV is newer, and
+    every load after that reads only the projected columns from it.
+
+    Parameters:
+    - name (str): The artifact name, e.g. "spotify_data" or "cleaned_data".
+    - columns (list): Columns to load (default is every column).
+
+    Returns:
+    - df (DataFrame): The typed artifact data.
+    """
+
+    if not _parquet_is_fresh(name):
+        convert_artifact(name)
+
+    return pd.read_parquet(artifact_path(name, "parquet"), columns=columns)
+
+
+def write_artifact(df, name, formats=("csv", "parquet"), chunksize=100_000):
+    """
+    Writes an artifact in bulk, chunk by chunk, without building per-row
+    Python objects.
+
+    The CSV is formatted by pandas' vectorised writer and the Parquet copy is
+    written as one row group per chunk with the artifact's schema. Writing
+    the Parquet file last keeps it fresh for `load_artifact`.
+
+    Parameters:
+    - df (DataFrame): The data to write.
+    - name (str): The artifact name, a key of `SCHEMAS`.
+    - formats (tuple): Any of "csv" and "parquet" (default is both).
+    - chunksize (int): Rows per chunk (default is 100,000).
+
+    Returns:
+    - paths (list): The written file paths.
+    """
+
+    paths = []
+
+    if "csv" in formats:
+        csv_path = artifact_path(name, "csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            for start in range(0, max(len(df), 1), chunksize):
+                df.iloc[start : start + chunksize].to_csv(
+                    file, header=start == 0, index=False
+                )
+        paths.append(csv_path)
+
+    if "parquet" in formats:
+        parquet_path = artifact_path(name, "parquet")
+        typed = apply_schema(df.copy(), name)
+        schema = pa.Schema.from_pandas(typed, preserve_index=False)
+        with pq.ParquetWriter(parquet_path, schema) as writer:
+            for start in range(0, max(len(typed), 1), chunksize):
+                chunk = typed.iloc[start : start + chunksize]
+                writer.write_table(
+                    pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                )
+        paths.append(parquet_path)
+
+    return paths
+
+
+def artifact_rows(name):
+    """
+    Number of rows of an artifact, read from the Parquet footer.
+    """
+
+    if not _parquet_is_fresh(name):
+        convert_artifact(name)
+
+    return pq.ParquetFile(artifact_path(name, "parquet")).metadata.num_rows
+
+
+def iter_artifact_chunks(name, columns=None, chunksize=100_000, start=0):
+    """
+    Reads an artifact chunk by chunk from its Parquet copy.
+
+    Row groups that end before `start` are skipped using the row counts in the
+    Parquet footer, so reading the tail of an artifact does not read its head.
+
+    Parameters:
+    - name (str): The artifact name, e.g. "spotify_data" or "cleaned_data".
+    - columns (list): Columns to load (default is every column).
+    - chunksize (int): Maximum rows per chunk (default is 100,000).
+    - start (int): First row read (default is 0).
+
+    Yields:
+    - chunk (DataFrame): The typed data of one chunk.
+    """
+
+    if not _parquet_is_fresh(name):
+        convert_artifact(name)
+
+    parquet_file = pq.ParquetFile(artifact_path(name, "parquet"))
+    metadata = parquet_file.metadata
+    first_group, skip = 0, start
+    while first_group < metadata.num_row_groups:
+        group_rows = metadata.row_group(first_group).num_rows
+        if skip < group_rows:
+            break
+        skip -= group_rows
+        first_group += 1
+    row_groups = list(range(first_group, metadata.num_row_groups))
+    if not row_groups:
+        return
+
+    for batch in parquet_file.iter_batches(
+        batch_size=chunksize, columns=columns, row_groups=row_groups
+    ):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        yield batch.slice(skip).to_pandas()
+        skip = 0
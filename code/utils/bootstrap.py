@@ -0,0 +1,331 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class RowSample:
+    """
+    A uniform random sample of at most `size` rows of a stream of chunks.
+
+    Every row gets a random key and the rows with the `size` smallest keys
+    are kept (bottom-k sampling), so only one chunk and the sample are in
+    memory at a time. When the stream has fewer rows, all of them are kept in
+    their original order.
+
+    Parameters:
+    - size (int): Maximum number of rows kept.
+    - seed (int): Seed of the keys (default is 0).
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.rows = pd.DataFrame()
+        self._keys = np.empty(0)
+
+    def update(self, chunk):
+        """
+        Adds the rows of one chunk to the candidates.
+        """
+
+        if self.size <= 0 or chunk.empty:
+            return
+        keys = np.concatenate([self._keys, self.rng.random(len(chunk))])
+        rows = chunk if self.rows.empty else pd.concat([self.rows, chunk])
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size)[: self.size])
+            rows, keys = rows.iloc[keep], keys[keep]
+        self.rows, self._keys = rows, keys
+
+
+def resample_weights(n, size, rng):
+    """
+    Draws bootstrap resamples as counts instead of copies of the data.
+
+    Parameters:
+    - n (int): Number of rows.
+    - size (int): Number of resamples.
+    - rng (Generator): The random generator.
+
+    Returns:
+    - weights (ndarray): A size x n matrix; weights[b, i] is how many times row
+      i appears in resample b.
+    """
+
+    index = rng.integers(0, n, size=(size, n))
+    index += np.arange(size)[:, None] * n
+    return np.bincount(index.ravel(), minlength=size * n).reshape(size, n).astype("float64")
+
+
+def weighted_gram(X, W, block_bytes=32 * 1024**2):
+    """
+    Computes the weighted second moments X'diag(w)X of every resample.
+
+    The products of a block of columns with all columns are formed at a time
+    and summed with one matrix product, so the temporary stays below
+    `block_bytes` instead of holding the n x p^2 products of all pairs.
+
+    Parameters:
+    - X (ndarray): The n x p data.
+    - W (ndarray): A B x n matrix of resample counts.
+    - block_bytes (int): Size bound for the block of products (default is 32 MB).
+
+    Returns:
+    - gram (ndarray): B x p x p matrices.
+    """
+
+    n, p = X.shape
+    block = int(max(1, min(p, block_bytes // (n * p * 8))))
+    gram = np.empty((len(W), p, p))
+    for start in range(0, p, block):
+        stop = min(p, start + block)
+        products = (X[:, start:stop, None] * X[:, None, :]).reshape(n, -1)
+        gram[:, start:stop, :] = (W @ products).reshape(-1, stop - start, p)
+    return gram
+
+
+def weighted_pearson(X, W):
+    """
+    Computes the Pearson correlation matrix of every resample at once.
+
+    Parameters:
+    - X (ndarray): The n x p data, without missing values.
+    - W (ndarray): A B x n matrix of resample counts.
+
+    Returns:
+    - corr (ndarray): B x p x p correlation matrices.
+    """
+
+    X = X - X.mean(axis=0)  # Centred once to avoid cancellation in the sums
+    totals = W.sum(axis=1)[:, None]
+    means = W @ X / totals
+    second = weighted_gram(X, W) / totals[:, :, None]
+    cov = second - means[:, :, None] * means[:, None, :]
+
+    std = np.sqrt(np.maximum(np.diagonal(cov, axis1=1, axis2=2), 0.0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / (std[:, :, None] * std[:, None, :])
+    return np.clip(corr, -1.0, 1.0)
+
+
+def weighted_ranks(X, W):
+    """
+    Returns the average ranks each row would get within every resample.
+
+    A row drawn c times among tied values preceded by b drawn rows gets the
+    average rank b + (c + 1) / 2, as `rankdata` gives on the resampled data;
+    the data only needs to be sorted once per column.
+
+    Parameters:
+    - X (ndarray): The n x p data, without missing values.
+    - W (ndarray): A B x n matrix of resample counts.
+
+    Returns:
+    - ranks (ndarray): B x n x p ranks.
+    """
+
+    B, n = W.shape
+    ranks = np.empty((B, n, X.shape[1]))
+    for j in range(X.shape[1]):
+        order = np.argsort(X[:, j], kind="stable")
+        values = X[order, j]
+        new_group = np.r_[True, values[1:] != values[:-1]]
+        starts = np.flatnonzero(new_group)
+        group = np.cumsum(new_group) - 1
+
+        group_counts = np.add.reduceat(W[:, order], starts, axis=1)
+        before = np.cumsum(group_counts, axis=1) - group_counts
+        ranks[:, order, j] = (before + (group_counts + 1) / 2)[:, group]
+    return ranks
+
+
+def weighted_spearman(X, W):
+    """
+    Computes the Spearman correlation matrix of every resample at once.
+    """
+
+    ranks = weighted_ranks(X, W)
+    totals = W.sum(axis=1)[:, None]
+    # Centred in place and multiplied one column at a time, so the B x n x p
+    # ranks are the only large array
+    ranks -= (W[:, None, :] @ ranks) / totals[:, :, None]
+    p = ranks.shape[2]
+    cov = np.empty((len(W), p, p))
+    for j in range(p):
+        cov[:, j, :] = ((W * ranks[:, :, j])[:, None, :] @ ranks)[:, 0, :]
+
+    std = np.sqrt(np.maximum(np.diagonal(cov, axis1=1, axis2=2), 0.0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / (std[:, :, None] * std[:, None, :])
+    return np.clip(corr, -1.0, 1.0)
+
+
+def weighted_ols(X, y, W):
+    """
+    Solves the normal equations (X'WX) b = X'Wy of every resample at once.
+
+    Parameters:
+    - X (ndarray): The n x p design matrix.
+    - y (ndarray): The n labels.
+    - W (ndarray): A B x n matrix of resample counts.
+
+    Returns:
+    - coefs (ndarray): B x p coefficients; NaN for a resample whose design
+      matrix is singular, e.g. one that misses every row of a dummy.
+    """
+
+    xtx = weighted_gram(X, W)
+    xty = W @ (X * y[:, None])
+    try:
+        return np.linalg.solve(xtx, xty[:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        pass
+
+    coefs = np.full(xty.shape, np.nan)
+    for b in range(len(W)):
+        try:
+            coefs[b] = np.linalg.solve(xtx[b], xty[b])
+        except np.linalg.LinAlgError:
+            pass  # Dropped by the NaN-aware percentiles
+    return coefs
+
+
+STATISTICS = {
+    "pearson": weighted_pearson,
+    "spearman": weighted_spearman,
+    "ols": weighted_ols,
+}
+
+
+def resample_bytes(statistic, n, p):
+    """
+    Estimates the peak memory of one resample of a batch, in bytes: the
+    index, count and weight rows and a product row, plus the ranks of every
+    column for "spearman".
+    """
+
+    per_resample = 5 * n * 8
+    if statistic == "spearman":
+        per_resample += n * p * 8
+    return per_resample
+
+
+def _bootstrap_batch(task):
+    statistic, arrays, size, seed = task
+    rng = np.random.default_rng(seed)
+    W = resample_weights(len(arrays[0]), size, rng)
+    return STATISTICS[statistic](*arrays, W)
+
+
+def bootstrap(
+    statistic,
+    arrays,
+    n_boot=2000,
+    batch_size=None,
+    seed=0,
+    processes=None,
+    memory_budget=256 * 1024**2,
+):
+    """
+    Computes a statistic on `n_boot` bootstrap resamples, batch by batch.
+
+    Each batch draws its resample index matrix, turns it into counts and
+    computes the statistic of all its resamples with a few matrix products.
+    Batches are seeded from one `SeedSequence`, so the result only depends on
+    `seed` and `batch_size`, not on the number of processes. They run on a
+    forked process pool when possible, otherwise in this process. Unless set,
+    the batch size is the number of resamples that fit in `memory_budget`,
+    at most 100; every worker process holds one batch.
+
+    Parameters:
+    - statistic (str): "pearson", "spearman" or "ols".
+    - arrays (tuple): The statistic's data, (X,) or (X, y) for "ols".
+    - n_boot (int): Number of resamples (default is 2,000).
+    - batch_size (int): Resamples per batch (default is from `memory_budget`).
+    - seed (int): Seed of the resamples (default is 0).
+    - processes (int): Worker processes (default is the number of CPUs).
+    - memory_budget (int): Bytes one batch may use (default is 256 MB).
+
+    Returns:
+    - samples (ndarray): The statistic of every resample, stacked on the first axis.
+    """
+
+    arrays = tuple(np.ascontiguousarray(array, dtype="float64") for array in arrays)
+    if batch_size is None:
+        n, p = arrays[0].shape
+        batch_size = int(min(100, max(1, memory_budget // resample_bytes(statistic, n, p))))
+    sizes = [batch_size] * (n_boot // batch_size)
+    if n_boot % batch_size:
+        sizes.append(n_boot % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(statistic, arrays, size, s) for size, s in zip(sizes, seeds)]
+
+    processes = processes or os.cpu_count()
+    if processes > 1 and len(tasks) > 1 and "fork" in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the data instead of re-running the calling script
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            batches = pool.map(_bootstrap_batch, tasks)
+    else:
+        batches = [_bootstrap_batch(task) for task in tasks]
+    return np.concatenate(batches)
+
+
+def percentile_interval(samples, ci=0.95):
+    """
+    Returns the lower and upper percentile bounds over the first axis.
+    """
+
+    alpha = (1 - ci) / 2
+    return np.nanquantile(samples, [alpha, 1 - alpha], axis=0)
+
+
+def bootstrap_correlation(df, method="pearson", n_boot=2000, ci=0.95, seed=0, **kwargs):
+    """
+    Percentile confidence intervals for every cell of a correlation matrix.
+
+    Rows with a missing value are dropped first, so the intervals are for the
+    complete-case correlations.
+
+    Parameters:
+    - df (DataFrame): The variables to correlate.
+    - method (str): "pearson" or "spearman" (default is "pearson").
+    - n_boot (int): Number of resamples (default is 2,000).
+    - ci (float): Coverage of the intervals (default is 0.95).
+    - seed (int): Seed of the resamples (default is 0).
+    - kwargs: Passed to `bootstrap` (batch_size, processes, memory_budget).
+
+    Returns:
+    - lower (DataFrame): The lower bound of every cell.
+    - upper (DataFrame): The upper bound of every cell.
+    """
+
+    df = df.dropna()
+    samples = bootstrap(method, (df.to_numpy(),), n_boot=n_boot, seed=seed, **kwargs)
+    lower, upper = percentile_interval(samples, ci)
+    return (
+        pd.DataFrame(lower, index=df.columns, columns=df.columns),
+        pd.DataFrame(upper, index=df.columns, columns=df.columns),
+    )
+
+
+def bootstrap_ols(X, y, n_boot=2000, ci=0.95, seed=0, **kwargs):
+    """
+    Percentile confidence intervals for the OLS coefficients, from pairs bootstrap.
+
+    Parameters:
+    - X (DataFrame): The design matrix (a constant column is not added).
+    - y (Series): The labels.
+    - n_boot (int): Number of resamples (default is 2,000).
+    - ci (float): Coverage of the intervals (default is 0.95).
+    - seed (int): Seed of the resamples (default is 0).
+    - kwargs: Passed to `bootstrap` (batch_size, processes, memory_budget).
+
+    Returns:
+    - intervals (DataFrame): "lower" and "upper" bounds, one row per coefficient.
+    """
+
+    samples = bootstrap("ols", (X.to_numpy(), y.to_numpy()), n_boot=n_boot, seed=seed, **kwargs)
+    lower, upper = percentile_interval(samples, ci)
+    return pd.DataFrame({"lower": lower, "upper": upper}, index=X.columns)
@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+
+
+class TDigest:
+    """
+    A mergeable t-digest sketch of a numeric column's distribution.
+
+    Values are kept as weighted centroids. Centroids near the median may
+    hold many values while those in the tails hold few, following the k1
+    scale function k(q) = delta / (2 pi) * asin(2q - 1), so quantiles near 0
+    and 1 have a small error. Memory is about `delta` centroids whatever the
+    number of values.
+
+    Parameters:
+    - delta (float): Compression; more centroids give smaller errors (default is 200).
+    """
+
+    def __init__(self, delta=200):
+        self.delta = delta
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.lows = np.zeros(0)
+        self.highs = np.zeros(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return self.weights.sum()
+
+    def _compress(self, means, weights, lows, highs):
+        """
+        Merges sorted centroids whose middle falls in the same unit of k.
+        """
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        middle = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(self.delta / (2 * np.pi) * np.arcsin(2 * middle - 1))
+
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        self.lows = np.minimum.reduceat(lows[order], starts)
+        self.highs = np.maximum.reduceat(highs[order], starts)
+
+    def update(self, values):
+        """
+        Adds a batch of values; NaN values are skipped.
+
+        Returns:
+        - self (TDigest): The updated sketch.
+        """
+
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))]),
+            np.concatenate([self.lows, values]),
+            np.concatenate([self.highs, values]),
+        )
+        return self
+
+    def merge(self, other):
+        """
+        Adds the values summarised by another sketch.
+        """
+
+        if len(other.means) == 0:
+            return self
+
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+            np.concatenate([self.lows, other.lows]),
+            np.concatenate([self.highs, other.highs]),
+        )
+        return self
+
+    def quantile(self, q):
+        """
+        Estimates quantiles by interpolating between the centroids.
+
+        The quantile is placed at position q * (n - 1) of the sorted values, as
+        pandas' linear `quantile`. A centroid of distinct values stands at the
+        middle of its positions; one holding a single repeated value covers
+        all of them, so ties such as integer popularity scores are answered
+        exactly.
+
+        Parameters:
+        - q (float or array): Quantiles in [0, 1].
+
+        Returns:
+        - values (float or ndarray): The estimated quantiles.
+        """
+
+        if len(self.means) == 0:
+            raise Exception("Cannot compute quantiles of an empty sketch")
+
+        last = np.cumsum(self.weights) - 1
+        first = last - self.weights + 1
+        tied = self.lows == self.highs
+        positions = np.where(tied, first, (first + last) / 2)
+
+        positions = np.r_[0.0, positions, last[tied], last[-1]]
+        points = np.r_[self.min, self.means, self.means[tied], self.max]
+        order = np.argsort(positions, kind="stable")
+        return np.interp(np.asarray(q) * last[-1], positions[order], points[order])
+
+
+class CohortStats:
+    """
+    One-pass statistics for comparing the features of top popularity cohorts.
+
+    In one pass over the data it fills a t-digest of the popularity and the
+    count, range and feature sums of every popularity bucket. The mean
+    features of the tracks above any number of popularity cutoffs then come
+    from the bucket sums, without sorting or reading the data again. Buckets
+    are [edge, next edge); with the default unit buckets and integer
+    popularity the thresholds and cohort means are exact.
+
+    Parameters:
+    - features (list): The feature columns.
+    - edges (array): Bucket edges of the popularity (default is 0, 1, ..., 101).
+    - delta (float): Compression of the t-digest (default is 200).
+    """
+
+    def __init__(self, features, edges=None, delta=200):
+        self.features = list(features)
+        self.edges = np.arange(0, 102) if edges is None else np.asarray(edges)
+        self.digest = TDigest(delta)
+        self.counts = np.zeros(len(self.edges) - 1)
+        self.sums = np.zeros((len(self.edges) - 1, len(self.features)))
+        self.lows = np.full(len(self.edges) - 1, np.inf)
+        self.highs = np.full(len(self.edges) - 1, -np.inf)
+
+    def update(self, popularity, values):
+        """
+        Adds one chunk of tracks.
+
+        Parameters:
+        - popularity (array): The popularity of every track.
+        - values (DataFrame): The features of every track; rows with a missing
+          popularity or feature are skipped.
+
+        Returns:
+        - self (CohortStats): The updated statistics.
+        """
+
+        popularity = np.asarray(popularity, dtype="float64")
+        values = np.asarray(values[self.features], dtype="float64")
+        complete = ~np.isnan(popularity) & ~np.isnan(values).any(axis=1)
+        popularity, values = popularity[complete], values[complete]
+
+        bucket = np.searchsorted(self.edges, popularity, side="right") - 1
+        if bucket.min(initial=0) < 0 or bucket.max(initial=0) >= len(self.counts):
+            raise Exception(
+                f"Popularity outside the bucket edges [{self.edges[0]}, {self.edges[-1]})"
+            )
+
+        self.digest.update(popularity)
+        n_buckets = len(self.counts)
+        self.counts += np.bincount(bucket, minlength=n_buckets)
+        np.minimum.at(self.lows, bucket, popularity)
+        np.maximum.at(self.highs, bucket, popularity)
+        for j in range(len(self.features)):
+            self.sums[:, j] += np.bincount(bucket, values[:, j], minlength=n_buckets)
+        return self
+
+    def merge(self, other):
+        """
+        Adds the statistics of another chunk of the data, e.g. from another process.
+        """
+
+        if other.features != self.features or not np.array_equal(other.edges, self.edges):
+            raise ValueError("Cannot merge cohort statistics with different features or buckets")
+        self.digest.merge(other.digest)
+        self.counts += other.counts
+        self.sums += other.sums
+        self.lows = np.minimum(self.lows, other.lows)
+        self.highs = np.maximum(self.highs, other.highs)
+        return self
+
+    def threshold(self, q):
+        """
+        The q quantile of the popularity, with pandas' linear interpolation.
+
+        The exact bucket counts tell which bucket holds each of the two
+        sorted values around position q * (n - 1). A bucket holding a single
+        value gives it exactly; within the others the t-digest estimate is
+        used, clipped to the bucket's range.
+
+        Parameters:
+        - q (float): The quantile, in [0, 1].
+
+        Returns:
+        - threshold (float): The estimated quantile.
+        """
+
+        n = self.counts.sum()
+        if n == 0:
+            raise Exception("Cannot compute quantiles without any track")
+
+        position = q * (n - 1)
+        below = np.floor(position)
+        values = []
+        for rank in (below, min(below + 1, n - 1)):
+            bucket = np.searchsorted(np.cumsum(self.counts), rank, side="right")
+            if self.lows[bucket] == self.highs[bucket]:
+                values.append(self.lows[bucket])
+            else:
+                estimate = self.digest.quantile(rank / max(n - 1, 1))
+                values.append(np.clip(estimate, self.lows[bucket], self.highs[bucket]))
+        return float(values[0] + (position - below) * (values[1] - values[0]))
+
+    def cohort_means(self, top_percents):
+        """
+        Mean features of the top cohorts and of the remaining tracks.
+
+        A track is in the top p% when its popularity is at least the (100 - p)th
+        percentile from `threshold`. A bucket is counted in the top cohort when
+        its lowest value reaches the threshold.
+
+        Parameters:
+        - top_percents (list): Cohort sizes in percent, e.g. [1, 5, 10, 25].
+
+        Returns:
+        - means (DataFrame): One row per cohort ("Top p%" and "Others p%") with the
+          popularity threshold, the number of tracks and the mean of every feature.
+        """
+
+        rows = {}
+        for percent in top_percents:
+            threshold = self.threshold(1 - percent / 100)
+            top = self.lows >= threshold
+            for name, mask in ((f"Top {percent:g}%", top), (f"Others {percent:g}%", ~top)):
+                count = self.counts[mask].sum()
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    means = self.sums[mask].sum(axis=0) / count
+                rows[name] = {"threshold": threshold, "count": count, **dict(zip(self.features, means))}
+        return pd.DataFrame.from_dict(rows, orient="index")
@@ -0,0 +1,208 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from artifact_store import ARTIFACTS_DIR
+
+TRANSFORM_PATH = os.path.join(ARTIFACTS_DIR, "feature_transform.joblib")
+
+# Skewed features are log transformed, roughly normal ones standardised and
+# the key rescaled to [0, 1]. Energy and valence are left out because of their
+# multicollinearity in the correlation analysis.
+LOG_FEATURES = ["duration_ms", "speechiness", "acousticness", "instrumentalness"]
+STANDARD_FEATURES = ["danceability", "liveness", "tempo", "loudness"]
+MIN_MAX_FEATURES = ["key"]
+PASSTHROUGH_FEATURES = ["mode"]
+
+INPUT_FEATURES = (
+    LOG_FEATURES + STANDARD_FEATURES + MIN_MAX_FEATURES + PASSTHROUGH_FEATURES
+)
+
+
+class FeatureTransform:
+    """
+    The feature transform applied to raw tracks before any analysis or model.
+
+    1. log1p of the skewed features,
+    2. standard scaling of the roughly normal features,
+    3. min-max scaling of the key,
+    4. the mode passed through unchanged.
+
+    The scalers are fitted once, either on a whole DataFrame with `fit` or
+    chunk by chunk with `partial_fit`, then saved with `save`. `transform`
+    works on any batch of new tracks without refitting.
+    """
+
+    def __init__(self):
+        self.standard_scaler = StandardScaler()
+        self.min_max_scaler = MinMaxScaler()
+        self.fingerprint = None
+
+    def fit(self, df):
+        """
+        Fits the scalers on a DataFrame of raw tracks.
+
+        Parameters:
+        - df (DataFrame): Raw tracks with at least the `INPUT_FEATURES` columns.
+
+        Returns:
+        - self (FeatureTransform): The fitted transform.
+        """
+
+        self.standard_scaler.fit(df[STANDARD_FEATURES])
+        self.min_max_scaler.fit(df[MIN_MAX_FEATURES])
+        self.fingerprint = data_fingerprint(df)
+        return self
+
+    def partial_fit(self, df):
+        """
+        Updates the scalers with one chunk of raw tracks.
+
+        Parameters:
+        - df (DataFrame): One chunk of raw tracks.
+
+        Returns:
+        - self (FeatureTransform): The updated transform.
+        """
+
+        self.standard_scaler.partial_fit(df[STANDARD_FEATURES])
+        self.min_max_scaler.partial_fit(df[MIN_MAX_FEATURES])
+        self.fingerprint = None
+        return self
+
+    def transform(self, df):
+        """
+        Applies the fitted transform to raw tracks.
+
+        Parameters:
+        - df (DataFrame): Raw tracks with at least the `INPUT_FEATURES` columns.
+
+        Returns:
+        - df_transformed (DataFrame): The transformed features, in `INPUT_FEATURES`
+          order and with the index of `df`.
+        """
+
+        df_transformed = pd.DataFrame(index=df.index)
+
+        # 1. Log transform of features
+        for feature in LOG_FEATURES:
+            df_transformed[feature] = np.log1p(df[feature])
+
+        # 2. Standard scaling of features
+        df_transformed[STANDARD_FEATURES] = self.standard_scaler.transform(
+            df[STANDARD_FEATURES]
+        )
+
+        # 3. Min Max scaling of features
+        df_transformed[MIN_MAX_FEATURES] = self.min_max_scaler.transform(
+            df[MIN_MAX_FEATURES]
+        )
+
+        # 4. Add other features
+        for feature in PASSTHROUGH_FEATURES:
+            df_transformed[feature] = df[feature]
+
+        return df_transformed
+
+    @staticmethod
+    def pre_scaling(df):
+        """
+        Returns the features before the fitted scaling: log1p of the skewed
+        features and the others unchanged, in `INPUT_FEATURES` order.
+
+        `transform(df)` equals `pre_scaling(df) * scale + offset` with the
+        values of `scaling()`, so statistics of the pre-scaling values, which
+        do not depend on the fit, can be converted to transformed units later.
+        """
+
+        df_pre = df[INPUT_FEATURES].astype("float64")
+        df_pre[LOG_FEATURES] = np.log1p(df_pre[LOG_FEATURES])
+        return df_pre
+
+    def scaling(self):
+        """
+        Returns the fitted per-feature affine scaling applied after `pre_scaling`.
+
+        Returns:
+        - scale (Series): Multiplier per feature in `INPUT_FEATURES`.
+        - offset (Series): Offset per feature in `INPUT_FEATURES`.
+        """
+
+        scale = pd.Series(1.0, index=INPUT_FEATURES)
+        offset = pd.Series(0.0, index=INPUT_FEATURES)
+        scale[STANDARD_FEATURES] = 1 / self.standard_scaler.scale_
+        offset[STANDARD_FEATURES] = -self.standard_scaler.mean_ / self.standard_scaler.scale_
+        scale[MIN_MAX_FEATURES] = self.min_max_scaler.scale_
+        offset[MIN_MAX_FEATURES] = self.min_max_scaler.min_
+        return scale, offset
+
+    def transform_chunks(self, chunks):
+        """
+        Transforms an iterable of DataFrame chunks lazily.
+
+        Parameters:
+        - chunks (iterable): DataFrames of raw tracks, e.g. from `pd.read_csv(..., chunksize=...)`.
+
+        Yields:
+        - df_transformed (DataFrame): The transformed features of each chunk.
+        """
+
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def save(self, path=TRANSFORM_PATH):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=TRANSFORM_PATH):
+        return joblib.load(path)
+
+
+def row_hash_sum(df):
+    """
+    Sum of the row hashes of the columns the transform is fitted on, modulo 2^64.
+
+    Sums of disjoint sets of rows add up, so a fingerprint can be kept up to
+    date chunk by chunk (see `YearFeatureCube`).
+    """
+
+    hashed = pd.util.hash_pandas_object(df[INPUT_FEATURES], index=False)
+    return int(hashed.sum()) & 0xFFFFFFFFFFFFFFFF
+
+
+def format_fingerprint(rows, hash_sum):
+    return f"{rows}-{hash_sum & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+def data_fingerprint(df):
+    """
+    Returns a hash of the columns the transform is fitted on.
+    """
+
+    return format_fingerprint(len(df), row_hash_sum(df))
+
+
+def load_or_fit_transform(df, path=TRANSFORM_PATH):
+    """
+    Loads the saved transform, refitting and saving it only if it was fitted
+    on different data.
+
+    Parameters:
+    - df (DataFrame): The raw tracks the transform should be fitted on.
+    - path (str): Location of the saved transform.
+
+    Returns:
+    - transform (FeatureTransform): A transform fitted on `df`.
+    """
+
+    if os.path.exists(path):
+        transform = FeatureTransform.load(path)
+        if transform.fingerprint == data_fingerprint(df):
+            return transform
+
+    transform = FeatureTransform().fit(df)
+    transform.save(path)
+    return transform
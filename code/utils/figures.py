@@ -0,0 +1,243 @@
+import inspect
+import json
+import multiprocessing
+import os
+
+import joblib
+import matplotlib
+
+matplotlib.use("Agg")  # Figures are only written to files, never shown
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from artifact_store import ARTIFACTS_DIR
+
+FIGURE_HASHES_PATH = os.path.join(ARTIFACTS_DIR, "figure_hashes.json")
+
+
+def draw_distributions(data):
+    """
+    Draws the histogram and KDE of every variable from precomputed bins.
+
+    Parameters:
+    - data (dict): "variables" (list) and "distributions" (dict from
+      `binned_distributions`).
+    """
+
+    sns.set_theme(style="whitegrid")
+    fig = plt.figure(figsize=(15, 20))
+
+    for i, var in enumerate(data["variables"], 1):
+        distribution = data["distributions"][var]
+        ax = fig.add_subplot(7, 2, i)
+        edges = distribution["edges"]
+        ax.bar(
+            edges[:-1],
+            distribution["counts"],
+            width=np.diff(edges),
+            align="edge",
+            color="C0",
+            alpha=0.75,
+            edgecolor="white",
+            linewidth=0.5,
+        )
+        if distribution["kde"] is not None:
+            ax.plot(distribution["grid"], distribution["kde"], color="C0")
+        ax.set_title(f"Distribution of {var}", fontsize=12)
+        ax.set_xlabel(var)
+        ax.set_ylabel("Frequency")
+
+    fig.tight_layout()
+    return fig
+
+
+def draw_heatmap(data):
+    """
+    Draws an annotated correlation heatmap.
+
+    Parameters:
+    - data (dict): "matrix" (DataFrame) and "title" (str).
+    """
+
+    fig = plt.figure(figsize=(12, 10))
+    variables = list(data["matrix"].columns)
+    sns.heatmap(
+        data["matrix"],
+        annot=True,
+        cmap="coolwarm",
+        fmt=".2f",
+        annot_kws={"size": 10},
+        xticklabels=variables,
+        yticklabels=variables,
+        cbar_kws={"shrink": 0.8},
+    )
+    plt.xticks(rotation=45, ha="right", fontsize=10)
+    plt.yticks(fontsize=10)
+    plt.title(data["title"])
+    return fig
+
+
+def draw_barh(data):
+    """
+    Draws a horizontal bar chart, e.g. of feature importances.
+
+    Parameters:
+    - data (dict): "labels" and "values" (lists), optional "errors" (list),
+      "xlabel", "ylabel", "title" (str) and "figsize" (tuple).
+    """
+
+    fig = plt.figure(figsize=data.get("figsize", (10, 6)))
+    plt.barh(data["labels"], data["values"], xerr=data.get("errors"))
+    plt.xlabel(data["xlabel"])
+    plt.ylabel(data["ylabel"])
+    plt.title(data["title"])
+    return fig
+
+
+def draw_lasso_path(data):
+    """
+    Draws the Lasso coefficients along the regularization path.
+
+    Parameters:
+    - data (dict): "features" (list), "alphas" (ndarray), "coef_path"
+      (features x alphas ndarray) and "optimal_alpha" (float).
+    """
+
+    fig = plt.figure(figsize=(10, 5))
+    for feature, path in zip(data["features"], data["coef_path"]):
+        plt.plot(data["alphas"], path, label=feature)
+    plt.axvline(data["optimal_alpha"], color="black", linestyle="--", linewidth=1)
+    plt.xlabel("Alpha")
+    plt.ylabel("Coefficient")
+    plt.title("Lasso Regularization Path")
+    plt.legend(fontsize=8)
+    return fig
+
+
+def draw_grouped_bars(data):
+    """
+    Draws one group of bars per row of a table, one bar per column.
+
+    Parameters:
+    - data (dict): "table" (DataFrame), "title", "xlabel" and "ylabel" (str).
+    """
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    data["table"].plot(kind="bar", ax=ax)
+    ax.set_title(data["title"])
+    ax.set_xlabel(data["xlabel"])
+    ax.set_ylabel(data["ylabel"])
+    plt.xticks(rotation=45)
+    return fig
+
+
+def draw_trends(data):
+    """
+    Draws the yearly mean of every feature.
+
+    Parameters:
+    - data (dict): "trends" (DataFrame indexed by year) and "features" (list).
+    """
+
+    fig = plt.figure(figsize=(10, 6))
+    for feature in data["features"]:
+        plt.plot(data["trends"].index, data["trends"][feature], label=feature)
+    plt.title("Trends in Audio Features Over Time")
+    plt.xlabel("Release Year")
+    plt.ylabel("Mean Value")
+    plt.legend()
+    plt.xticks(rotation=45)
+    plt.grid(True)
+    return fig
+
+
+def draw_text(data):
+    """
+    Draws a block of monospace text, e.g. a regression summary.
+
+    Parameters:
+    - data (dict): "text" (str) and "dpi" (int).
+    """
+
+    fig, ax = plt.subplots(figsize=(10, 6), dpi=data.get("dpi", 100))
+    ax.axis("off")
+    ax.text(0.01, 1, data["text"], fontsize=12, va="top", ha="left", family="monospace")
+    return fig
+
+
+def figure_hash(draw, data):
+    """
+    Returns a hash of a figure's input data and of the code that draws it.
+    """
+
+    return joblib.hash((inspect.getsource(draw), data))
+
+
+def _render(task):
+    path, draw, data = task
+    fig = draw(data)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    return path
+
+
+def render_figures(figures, processes=None, force=False):
+    """
+    Renders figures to files headlessly, skipping those whose inputs did not change.
+
+    The hash of each figure's data and drawing function is kept in
+    artifacts/figure_hashes.json with the modification time of its file; a
+    figure whose hash matches and whose file was not replaced is not drawn
+    again. The others are drawn with the Agg backend on a forked process
+    pool, one figure per worker, so a script should pass all its figures in
+    one call.
+
+    Parameters:
+    - figures (list): (path, draw, data) tuples; `draw(data)` is a module-level
+      function returning a matplotlib figure.
+    - processes (int): Worker processes (default is the number of CPUs).
+    - force (bool): Render every figure even if unchanged (default is False).
+
+    Returns:
+    - rendered (list): The paths that were drawn.
+    """
+
+    hashes = {}
+    if os.path.exists(FIGURE_HASHES_PATH):
+        with open(FIGURE_HASHES_PATH, encoding="utf-8") as file:
+            hashes = json.load(file)
+
+    todo, new_hashes = [], {}
+    for path, draw, data in figures:
+        key = os.path.abspath(path)
+        new_hashes[key] = figure_hash(draw, data)
+        # A file replaced since it was rendered, e.g. by a checkout, is redrawn too
+        unchanged = os.path.exists(path) and hashes.get(key) == [
+            new_hashes[key],
+            os.stat(path).st_mtime_ns,
+        ]
+        if force or not unchanged:
+            todo.append((path, draw, data))
+
+    processes = min(processes or os.cpu_count(), len(todo))
+    if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            rendered = pool.map(_render, todo)
+    else:
+        rendered = [_render(task) for task in todo]
+
+    # Re-read before writing so figures rendered by other scripts meanwhile are kept
+    if os.path.exists(FIGURE_HASHES_PATH):
+        with open(FIGURE_HASHES_PATH, encoding="utf-8") as file:
+            hashes = json.load(file)
+    hashes.update(
+        {key: [value, os.stat(key).st_mtime_ns] for key, value in new_hashes.items()}
+    )
+    tmp_path = FIGURE_HASHES_PATH + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(hashes, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, FIGURE_HASHES_PATH)
+
+    return rendered
@@ -0,0 +1,279 @@
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+# Setting SPOTIFY_METRICS_DIR turns the metrics on; each script then writes
+# <script>.json and <script>.prom there when it exits. Otherwise every call
+# below returns immediately.
+METRICS_DIR = os.environ.get("SPOTIFY_METRICS_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _peak_rss_mb():
+    """
+    Peak resident memory of this process and of its largest finished child, in MB.
+
+    This is the high-water mark over the whole life of the process so far, not
+    of any one stage: a stage after a heavier one reports the earlier peak.
+    """
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak / 1024  # kilobytes on Linux
+
+
+def _cpu_seconds():
+    """
+    CPU time of this process and of its finished children, e.g. pool workers.
+    """
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class Stage:
+    """
+    Measures one stage of a script: wall time, CPU time and rows, plus the
+    process's peak RSS so far when the stage ends.
+
+    Used as a context manager from `Metrics.stage`; call `add_rows` inside the
+    block to count rows as they are processed. Each record gets a `seq`
+    number in order of completion, so a stage name used twice in one process
+    still gives distinct records.
+    """
+
+    def __init__(self, metrics, name, rows=0):
+        self.metrics = metrics
+        self.name = name
+        self.rows = rows
+
+    def add_rows(self, rows):
+        self.rows += rows
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._cpu_start = _cpu_seconds()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        record = {
+            "stage": self.name,
+            "seconds": time.perf_counter() - self._start,
+            "cpu_seconds": _cpu_seconds() - self._cpu_start,
+            "process_max_rss_mb": _peak_rss_mb(),
+            "rows": self.rows,
+            "failed": exc_type is not None,
+        }
+        with self.metrics._lock:
+            record["seq"] = len(self.metrics.stages)
+            self.metrics.stages.append(record)
+        return False
+
+
+class _DisabledStage:
+    rows = 0
+
+    def add_rows(self, rows):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+
+class Metrics:
+    """
+    Stage timings, counters and latency histograms of one process.
+
+    All methods are thread-safe. When the metrics are disabled, `stage`
+    returns a shared do-nothing context manager and `inc` and `observe`
+    return at once, so the calls can stay in hot paths.
+
+    Parameters:
+    - enabled (bool): Record anything at all (default is False).
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name, rows=0):
+        """
+        Returns a context manager measuring the enclosed block as a stage.
+
+        Parameters:
+        - name (str): The stage name, e.g. "transform".
+        - rows (int): Rows processed, if known upfront (default is 0).
+        """
+
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return Stage(self, name, rows)
+
+    def inc(self, name, value=1, **labels):
+        """
+        Adds `value` to the counter `name` with the given labels.
+        """
+
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Records one observation, e.g. a request latency in seconds, in the
+        histogram `name` with the given labels.
+        """
+
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                }
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["max"] = max(histogram["max"], value)
+
+    def snapshot(self):
+        """
+        Returns every metric as a JSON-serialisable dict.
+        """
+
+        with self._lock:
+            return {
+                "script": os.path.basename(sys.argv[0]),
+                "pid": os.getpid(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "max_rss_mb": _peak_rss_mb(),
+                "stages": [dict(record) for record in self.stages],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "bucket_bounds": list(LATENCY_BUCKETS),
+                        **{k: (list(v) if k == "buckets" else v) for k, v in histogram.items()},
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def to_prometheus(self, prefix="spotify"):
+        """
+        Formats the metrics in the Prometheus text exposition format, e.g. for
+        the node exporter's textfile collector.
+
+        Stage gauges are labelled by `stage` and `seq`, so a stage name
+        repeated in one process does not give duplicate series, which the
+        textfile collector rejects.
+        """
+
+        snapshot = self.snapshot()
+        script = snapshot["script"]
+        lines = []
+
+        def labels(**values):
+            values = {"script": script, **values}
+            inner = ",".join(
+                '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                for k, v in values.items()
+            )
+            return "{" + inner + "}"
+
+        stage_fields = [
+            ("stage_seconds", "seconds", "Wall time of the stage."),
+            ("stage_cpu_seconds", "cpu_seconds", "CPU time of the stage and its finished child processes."),
+            (
+                "stage_process_max_rss_megabytes",
+                "process_max_rss_mb",
+                "Lifetime peak resident memory of the process when the stage ended, not the stage's own peak.",
+            ),
+            ("stage_rows", "rows", "Rows processed by the stage."),
+        ]
+        for metric, field, help_text in stage_fields:
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} gauge"]
+            for record in snapshot["stages"]:
+                lines.append(
+                    f"{prefix}_{metric}{labels(stage=record['stage'], seq=record['seq'])} {record[field]}"
+                )
+
+        for name in sorted({counter["name"] for counter in snapshot["counters"]}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for counter in snapshot["counters"]:
+                if counter["name"] == name:
+                    lines.append(f"{prefix}_{name}_total{labels(**counter['labels'])} {counter['value']}")
+
+        for name in sorted({histogram["name"] for histogram in snapshot["histograms"]}):
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for histogram in snapshot["histograms"]:
+                if histogram["name"] != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f"{prefix}_{name}_bucket{labels(**histogram['labels'], le=bound)} {cumulative}")
+                lines.append(f"{prefix}_{name}_bucket{labels(**histogram['labels'], le='+Inf')} {histogram['count']}")
+                lines.append(f"{prefix}_{name}_sum{labels(**histogram['labels'])} {histogram['sum']}")
+                lines.append(f"{prefix}_{name}_count{labels(**histogram['labels'])} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory, name=None):
+        """
+        Writes <name>.json and <name>.prom into `directory`.
+
+        Parameters:
+        - directory (str): Output directory, created if needed.
+        - name (str): File name without extension (default is the script name).
+
+        Returns:
+        - paths (tuple): The JSON and Prometheus file paths.
+        """
+
+        name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python"
+        os.makedirs(directory, exist_ok=True)
+        paths = (os.path.join(directory, f"{name}.json"), os.path.join(directory, f"{name}.prom"))
+        for path, text in zip(paths, (json.dumps(self.snapshot(), indent=2), self.to_prometheus())):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(text)
+            os.replace(tmp_path, path)
+        return paths
+
+
+metrics = Metrics(enabled=bool(METRICS_DIR))
+
+if metrics.enabled:
+    # Forked pool workers leave with os._exit, so only the main process writes
+    atexit.register(metrics.write, METRICS_DIR)
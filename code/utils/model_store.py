@@ -0,0 +1,98 @@
+import os
+import time
+
+import joblib
+import numpy as np
+
+from artifact_store import ARTIFACTS_DIR
+from feature_transform import INPUT_FEATURES, TRANSFORM_PATH, FeatureTransform
+
+MODELS_DIR = os.path.join(ARTIFACTS_DIR, "models")
+
+
+def model_path(name):
+    return os.path.join(MODELS_DIR, f"{name}.joblib")
+
+
+def save_model(model, name, metrics=None, transform_path=TRANSFORM_PATH):
+    """
+    Saves a fitted model together with the feature transform it was trained behind.
+
+    Bundling the transform makes the saved model self-contained: raw tracks can
+    be scored later without the cleaning step or retraining.
+
+    Parameters:
+    - model (object): A fitted model with a `predict` method taking transformed
+      features in `INPUT_FEATURES` order.
+    - name (str): The model name, e.g. "lasso", "random_forest" or "ols".
+    - metrics (dict): Scores to keep with the model, e.g. the test MSE (default is None).
+    - transform_path (str): Location of the fitted feature transform.
+
+    Returns:
+    - path (str): Where the bundle was written.
+    """
+
+    if not os.path.exists(transform_path):
+        raise Exception(
+            f"No fitted feature transform at {transform_path}; run code/cleaning/data_cleaning.py first"
+        )
+    transform = FeatureTransform.load(transform_path)
+    bundle = {
+        "name": name,
+        "model": model,
+        "transform": transform,
+        "features": list(INPUT_FEATURES),
+        "transform_fingerprint": transform.fingerprint,
+        "metrics": dict(metrics or {}),
+        "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    path = model_path(name)
+    tmp_path = path + ".tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_model(name):
+    """
+    Loads a bundle written by `save_model`.
+
+    The module defining the model class (e.g. `lasso_path_engine`) must be
+    importable, which is the case for scripts in code/models.
+
+    Parameters:
+    - name (str): The model name.
+
+    Returns:
+    - bundle (dict): "model", "transform", "features", "metrics" and metadata.
+    """
+
+    path = model_path(name)
+    if not os.path.exists(path):
+        raise Exception(
+            f"No saved model {name!r} at {path}; run its training script first"
+        )
+    return joblib.load(path)
+
+
+def predict_tracks(bundle, tracks):
+    """
+    Predicts the popularity of raw tracks with a saved bundle.
+
+    Parameters:
+    - bundle (dict): A bundle from `load_model`.
+    - tracks (DataFrame): Raw tracks with at least the `INPUT_FEATURES` columns.
+
+    Returns:
+    - predictions (ndarray): One prediction per row; NaN for rows with a missing feature.
+    """
+
+    raw = tracks[bundle["features"]]
+    complete = raw.notna().all(axis=1).to_numpy()
+    predictions = np.full(len(raw), np.nan)
+    if complete.any():
+        features = bundle["transform"].transform(raw[complete])[bundle["features"]]
+        predictions[complete] = bundle["model"].predict(features)
+    return predictions
@@ -0,0 +1,329 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from artifact_store import ARTIFACTS_DIR, artifact_rows, iter_artifact_chunks
+from feature_transform import (
+    INPUT_FEATURES,
+    FeatureTransform,
+    format_fingerprint,
+    row_hash_sum,
+)
+
+CUBE_PATH = os.path.join(ARTIFACTS_DIR, "year_feature_cube.npz")
+
+# Rows at the end of the data already in the cube whose ids are hashed to tell
+# an append from a rewrite
+TAIL_ROWS = 1_000
+
+
+class YearFeatureCube:
+    """
+    Per-year count, sum and sum of squares of every feature.
+
+    The cube holds one row per release year and one column per feature. It
+    answers the count, mean and variance of any feature over any year range in
+    O(1) from prefix sums, without touching row-level data. Tracks can be
+    added chunk by chunk, and cubes built on different data merged. The cube
+    also keeps the `data_fingerprint` of the tracks it holds, so a saved
+    `FeatureTransform` can be checked against them without reading them.
+
+    Parameters:
+    - features (list): The feature names.
+    - min_popularity (int): Popularity threshold of the tracks added (default is None).
+    """
+
+    def __init__(self, features, min_popularity=None):
+        self.features = list(features)
+        self.min_popularity = min_popularity
+        self.first_year = 0
+        self.count = np.zeros((0, len(self.features)))
+        self.sum = np.zeros((0, len(self.features)))
+        self.sum_sq = np.zeros((0, len(self.features)))
+        self.source_rows = 0
+        self.source_fingerprint = ""
+        self.tracks = 0
+        self.hash_sum = 0
+        self._prefix = None
+
+    @property
+    def years(self):
+        return np.arange(self.first_year, self.first_year + len(self.count))
+
+    def _extend(self, low, high):
+        """
+        Grows the year axis to cover [low, high].
+        """
+
+        if len(self.count) == 0:
+            self.first_year = low
+            shape = (high - low + 1, len(self.features))
+            self.count, self.sum, self.sum_sq = (np.zeros(shape) for _ in range(3))
+            return
+
+        last_year = self.first_year + len(self.count) - 1
+        before = max(self.first_year - low, 0)
+        after = max(high - last_year, 0)
+        if before or after:
+            pad = ((before, after), (0, 0))
+            self.count = np.pad(self.count, pad)
+            self.sum = np.pad(self.sum, pad)
+            self.sum_sq = np.pad(self.sum_sq, pad)
+            self.first_year -= before
+
+    @property
+    def data_fingerprint(self):
+        """
+        The `data_fingerprint` of every track added, with or without a year.
+        """
+
+        return format_fingerprint(self.tracks, self.hash_sum)
+
+    def update(self, years, values, raw=None):
+        """
+        Adds tracks to the cube.
+
+        Parameters:
+        - years (array): The release year of every track; tracks without a year are skipped.
+        - values (DataFrame or ndarray): The features of every track, in `features`
+          order; NaN marks a missing value.
+        - raw (DataFrame): The raw features of the same tracks, added to the
+          fingerprint (default is None, which leaves it unchanged).
+
+        Returns:
+        - self (YearFeatureCube): The updated cube.
+        """
+
+        if raw is not None:
+            self.tracks += len(raw)
+            self.hash_sum = (self.hash_sum + row_hash_sum(raw)) & 0xFFFFFFFFFFFFFFFF
+
+        if isinstance(values, pd.DataFrame):
+            values = values[self.features]
+        values = np.asarray(values, dtype="float64")
+        years = np.asarray(years, dtype="float64")
+        known = ~np.isnan(years)
+        years, values = years[known].astype("int64"), values[known]
+        if len(years) == 0:
+            return self
+
+        self._extend(int(years.min()), int(years.max()))
+        n_features = len(self.features)
+        cells = (years - self.first_year)[:, None] * n_features + np.arange(n_features)
+        present = ~np.isnan(values)
+        size = self.count.size
+
+        def add(weights):
+            return np.bincount(cells[present], weights[present], minlength=size).reshape(
+                self.count.shape
+            )
+
+        self.count += add(np.ones_like(values))
+        self.sum += add(values)
+        self.sum_sq += add(values**2)
+        self._prefix = None
+        return self
+
+    def merge(self, other):
+        """
+        Adds the aggregates of another cube over the same features.
+        """
+
+        if other.features != self.features:
+            raise ValueError("Cannot merge cubes over different features")
+        if len(other.count) == 0:
+            return self
+
+        self._extend(other.first_year, other.first_year + len(other.count) - 1)
+        start = other.first_year - self.first_year
+        rows = slice(start, start + len(other.count))
+        self.count[rows] += other.count
+        self.sum[rows] += other.sum
+        self.sum_sq[rows] += other.sum_sq
+        self.tracks += other.tracks
+        self.hash_sum = (self.hash_sum + other.hash_sum) & 0xFFFFFFFFFFFFFFFF
+        self._prefix = None
+        return self
+
+    def _prefix_sums(self):
+        if self._prefix is None:
+            self._prefix = tuple(
+                np.vstack([np.zeros((1, len(self.features))), np.cumsum(a, axis=0)])
+                for a in (self.count, self.sum, self.sum_sq)
+            )
+        return self._prefix
+
+    def range_stats(self, start=None, end=None):
+        """
+        Count, mean and sample variance of every feature over the years [start, end].
+
+        Parameters:
+        - start (int): First year included (default is the first year of the cube).
+        - end (int): Last year included (default is the last year of the cube).
+
+        Returns:
+        - stats (DataFrame): One row per feature with "count", "mean" and "var".
+        """
+
+        last_year = self.first_year + len(self.count) - 1
+        start = self.first_year if start is None else max(start, self.first_year)
+        end = last_year if end is None else min(end, last_year)
+        i, j = start - self.first_year, max(end - self.first_year + 1, start - self.first_year)
+
+        count, total, total_sq = (prefix[j] - prefix[i] for prefix in self._prefix_sums())
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            var = (total_sq - total * mean) / (count - 1)
+        return pd.DataFrame(
+            {"count": count, "mean": mean, "var": np.maximum(var, 0.0)},
+            index=self.features,
+        )
+
+    def yearly_means(self, start=None, end=None):
+        """
+        Mean of every feature for each year in [start, end]; NaN for years without tracks.
+
+        Returns:
+        - means (DataFrame): One row per year, one column per feature.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = pd.DataFrame(self.sum / self.count, index=self.years, columns=self.features)
+        means.index.name = "release_year"
+        start = self.first_year if start is None else start
+        end = self.years[-1] if end is None else end
+        return means.loc[start:end]
+
+    def save(self, path=CUBE_PATH):
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            features=np.array(self.features),
+            first_year=self.first_year,
+            count=self.count,
+            sum=self.sum,
+            sum_sq=self.sum_sq,
+            source_rows=self.source_rows,
+            source_fingerprint=self.source_fingerprint,
+            min_popularity=-1 if self.min_popularity is None else self.min_popularity,
+            tracks=self.tracks,
+            hash_sum=np.uint64(self.hash_sum),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        with np.load(path) as data:
+            cube = cls(data["features"].tolist())
+            cube.first_year = int(data["first_year"])
+            cube.count = data["count"]
+            cube.sum = data["sum"]
+            cube.sum_sq = data["sum_sq"]
+            cube.source_rows = int(data["source_rows"])
+            cube.source_fingerprint = str(data["source_fingerprint"])
+            if "min_popularity" in data and int(data["min_popularity"]) >= 0:
+                cube.min_popularity = int(data["min_popularity"])
+            if "hash_sum" in data:
+                cube.tracks = int(data["tracks"])
+                cube.hash_sum = int(data["hash_sum"])
+            else:
+                # Saved before the fingerprint was kept; rebuilt on load
+                cube.source_fingerprint = ""
+        return cube
+
+
+def _tail_fingerprint(rows):
+    """
+    Hash of the ids of the last `TAIL_ROWS` of the first `rows` rows of
+    spotify_data, read from the row groups holding them only.
+    """
+
+    start = max(rows - TAIL_ROWS, 0)
+    ids = []
+    for chunk in iter_artifact_chunks("spotify_data", ["id"], TAIL_ROWS, start=start):
+        ids.extend(chunk["id"].tolist())
+        if len(ids) >= rows - start:
+            break
+    return f"{rows}-{joblib.hash(ids[: rows - start])}"
+
+
+def load_or_update_cube(path=CUBE_PATH, min_popularity=5, chunksize=100_000):
+    """
+    Loads the year x feature cube of spotify_data, adding only the tracks
+    appended since it was built.
+
+    The cube stores the features before the fitted scaling (see
+    `FeatureTransform.pre_scaling`), so it stays valid when the scalers are
+    refitted. It remembers how many rows of spotify_data it has seen and a
+    hash of the ids of the last of them. If the data still has at least that
+    many rows and the same ids there, the data was appended to and only the
+    rows after them are read; otherwise, or when the cube was built with
+    another `min_popularity`, it is rebuilt.
+
+    Parameters:
+    - path (str): Location of the saved cube.
+    - min_popularity (int): Tracks below this popularity are left out (default is 5).
+    - chunksize (int): Rows per chunk when reading new tracks (default is 100,000).
+
+    Returns:
+    - cube (YearFeatureCube): The up-to-date cube.
+    """
+
+    rows = artifact_rows("spotify_data")
+
+    cube = None
+    if os.path.exists(path):
+        cube = YearFeatureCube.load(path)
+        if (
+            cube.min_popularity != min_popularity
+            or cube.source_rows > rows
+            or cube.source_fingerprint != _tail_fingerprint(cube.source_rows)
+        ):
+            cube = None
+    if cube is None:
+        cube = YearFeatureCube(INPUT_FEATURES, min_popularity)
+
+    if cube.source_rows < rows:
+        columns = ["popularity", "release date"] + INPUT_FEATURES
+        for chunk in iter_artifact_chunks(
+            "spotify_data", columns, chunksize, start=cube.source_rows
+        ):
+            chunk = chunk[chunk["popularity"] >= min_popularity]
+            cube.update(
+                chunk["release date"].dt.year,
+                FeatureTransform.pre_scaling(chunk),
+                raw=chunk,
+            )
+        cube.source_rows = rows
+        cube.source_fingerprint = _tail_fingerprint(rows)
+        cube.save(path)
+
+    return cube
+
+
+def scale_stats(stats, transform):
+    """
+    Converts range statistics of pre-scaling values into transformed units.
+
+    Parameters:
+    - stats (DataFrame): From `YearFeatureCube.range_stats`.
+    - transform (FeatureTransform): The fitted transform.
+
+    Returns:
+    - stats (DataFrame): The same statistics of the transformed features.
+    """
+
+    scale, offset = transform.scaling()
+    scale, offset = scale[stats.index], offset[stats.index]
+    return stats.assign(mean=stats["mean"] * scale + offset, var=stats["var"] * scale**2)
+
+
+def scale_means(means, transform):
+    """
+    Converts yearly means of pre-scaling values into transformed units.
+    """
+
+    scale, offset = transform.scaling()
+    return means * scale[means.columns] + offset[means.columns]